@@ -0,0 +1,410 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+"""
+mcp-base 压测工具
+
+按配置的操作比例与文件大小分布并发请求 /upload、/files/{id}、/files/{id}/info 与 /files/{id}/exists，
+报告各操作的吞吐量、数据量与延迟分位数，并采样服务进程的 RSS，用于评估存储节点容量、
+验证流式传输与缓存等改动的效果。
+
+服务进程：
+- 默认压测 --url 指定的已运行服务，本机服务通过监听端口自动找到进程以采样内存（也可用 --server-pid 指定）
+- --spawn 在临时目录中启动一个独立的 mcp-base（独立端口与存储目录），压测结束后停止并清理
+
+用法（在 mcp-base 目录下）：
+    uv run python benchmarks/load_test.py --spawn --duration 30 --concurrency 32
+    uv run python benchmarks/load_test.py --url http://localhost:9001 --mix upload:1,download:6,info:2,exists:1 \\
+        --sizes 16k:40,256k:40,4m:15,32m:5 --json result.json
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import shutil
+import signal
+import socket
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+import yaml
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+OPERATIONS = ("upload", "download", "info", "exists")
+RSS_SAMPLE_INTERVAL = 0.5
+READY_TIMEOUT = 30
+SIZE_UNITS = {"": 1, "b": 1, "k": 1024, "kb": 1024, "m": 1024 ** 2, "mb": 1024 ** 2, "g": 1024 ** 3, "gb": 1024 ** 3}
+
+
+def parse_size(value: str) -> int:
+    value = value.strip().lower()
+    digits = value.rstrip("bkmg")
+    return int(float(digits) * SIZE_UNITS[value[len(digits):]])
+
+
+def parse_weights(value: str, parse_key=str) -> List[Tuple[Any, float]]:
+    """解析 "key:weight,key:weight" 格式，省略权重时为 1"""
+    weights = []
+    for item in value.split(","):
+        if not item.strip():
+            continue
+        key, _, weight = item.partition(":")
+        weights.append((parse_key(key.strip()), float(weight) if weight else 1.0))
+    return weights
+
+
+def format_bytes(size: float) -> str:
+    for unit in ("B", "KB", "MB"):
+        if size < 1024:
+            return f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GB"
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def process_rss(pid: int) -> int:
+    """进程 RSS（字节），仅支持 Linux /proc"""
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return 0
+
+
+def find_listening_pid(port: int) -> Optional[int]:
+    """通过 /proc 找到监听指定端口的进程，找不到（非 Linux 或无权限）时返回 None"""
+    inodes = set()
+    for table in ("/proc/net/tcp", "/proc/net/tcp6"):
+        try:
+            with open(table, "r") as f:
+                next(f)
+                for line in f:
+                    fields = line.split()
+                    # 状态 0A 为 LISTEN
+                    if fields[3] == "0A" and int(fields[1].rsplit(":", 1)[1], 16) == port:
+                        inodes.add(fields[9])
+        except OSError:
+            continue
+    if not inodes:
+        return None
+    targets = {f"socket:[{inode}]" for inode in inodes}
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        try:
+            for fd in os.listdir(f"/proc/{pid}/fd"):
+                if os.readlink(f"/proc/{pid}/fd/{fd}") in targets:
+                    return int(pid)
+        except OSError:
+            continue
+    return None
+
+
+class SpawnedServer:
+    """在临时目录中启动的独立 mcp-base"""
+
+    def __init__(self, python: str):
+        self.python = python
+        self.run_dir = tempfile.mkdtemp(prefix="pixelle-base-load-")
+        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.log_path = os.path.join(self.run_dir, "mcp-base.log")
+        self.proc: Optional[subprocess.Popen] = None
+
+    def start(self):
+        config_path = os.path.join(self.run_dir, "config.yml")
+        with open(config_path, "w", encoding="utf-8") as f:
+            yaml.safe_dump({"base": {
+                "server_host": "127.0.0.1",
+                "server_port": self.port,
+                "public_read_url": self.url,
+                "local_storage_path": os.path.join(self.run_dir, "files"),
+            }}, f)
+        env = {**os.environ, "PIXELLE_CONFIG": config_path}
+        with open(self.log_path, "wb") as log:
+            self.proc = subprocess.Popen([self.python, "main.py"], cwd=BASE_DIR, env=env, stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+
+    async def wait_ready(self, client: httpx.AsyncClient):
+        deadline = time.monotonic() + READY_TIMEOUT
+        while True:
+            if self.proc.poll() is not None or time.monotonic() > deadline:
+                with open(self.log_path, "r", encoding="utf-8", errors="replace") as f:
+                    raise SystemExit(f"mcp-base did not start:\n{''.join(f.readlines()[-20:])}")
+            try:
+                if (await client.get(f"{self.url}/health")).status_code == 200:
+                    return
+            except httpx.TransportError:
+                pass
+            await asyncio.sleep(0.2)
+
+    def stop(self):
+        if self.proc and self.proc.poll() is None:
+            os.killpg(self.proc.pid, signal.SIGINT)
+            try:
+                self.proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                os.killpg(self.proc.pid, signal.SIGKILL)
+                self.proc.wait()
+
+    def storage_bytes(self) -> int:
+        total = 0
+        for root, _, files in os.walk(os.path.join(self.run_dir, "files")):
+            total += sum(os.path.getsize(os.path.join(root, name)) for name in files)
+        return total
+
+
+class LoadTest:
+    """并发压测，所有 worker 共享已上传文件的 ID 池"""
+
+    def __init__(self, args: argparse.Namespace, url: str):
+        self.args = args
+        self.url = url.rstrip("/")
+        self.rng = random.Random(args.seed)
+        self.operations = parse_weights(args.mix)
+        self.sizes = parse_weights(args.sizes, parse_size)
+        unknown = {op for op, _ in self.operations} - set(OPERATIONS)
+        if unknown:
+            raise SystemExit(f"Unknown operations {sorted(unknown)}, supported: {', '.join(OPERATIONS)}")
+        # 每种大小准备一块随机数据，上传时替换前缀保证每个文件内容不同
+        self.payloads = {size: os.urandom(size) for size, _ in self.sizes}
+        self.file_ids: List[str] = []
+        self.latencies: Dict[str, List[float]] = {op: [] for op in OPERATIONS}
+        self.bytes: Dict[str, int] = {op: 0 for op in OPERATIONS}
+        self.errors: Dict[str, int] = {op: 0 for op in OPERATIONS}
+        self.error_samples: List[str] = []
+        self.rss_samples: List[int] = []
+
+    def pick(self, weights: List[Tuple[Any, float]]) -> Any:
+        return self.rng.choices([key for key, _ in weights], [weight for _, weight in weights])[0]
+
+    def target_id(self) -> str:
+        if not self.file_ids or self.rng.random() < self.args.miss_rate:
+            return uuid.uuid4().hex
+        return self.rng.choice(self.file_ids)
+
+    async def upload(self, client: httpx.AsyncClient) -> int:
+        size = self.pick(self.sizes)
+        data = uuid.uuid4().bytes + self.payloads[size][16:]
+        response = await client.post(f"{self.url}/upload", files={"file": (f"load_{size}.png", data, "image/png")})
+        response.raise_for_status()
+        self.file_ids.append(response.json()["file_id"])
+        return size
+
+    async def download(self, client: httpx.AsyncClient) -> int:
+        received = 0
+        async with client.stream("GET", f"{self.url}/files/{self.target_id()}") as response:
+            if response.status_code == 404:
+                return 0
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes(256 * 1024):
+                received += len(chunk)
+        return received
+
+    async def info(self, client: httpx.AsyncClient) -> int:
+        response = await client.get(f"{self.url}/files/{self.target_id()}/info")
+        if response.status_code != 404:
+            response.raise_for_status()
+        return len(response.content)
+
+    async def exists(self, client: httpx.AsyncClient) -> int:
+        response = await client.get(f"{self.url}/files/{self.target_id()}/exists")
+        response.raise_for_status()
+        return len(response.content)
+
+    async def run_operation(self, client: httpx.AsyncClient, operation: str, record: bool = True):
+        started = time.perf_counter()
+        try:
+            size = await getattr(self, operation)(client)
+        except (httpx.HTTPError, KeyError, ValueError) as e:
+            if record:
+                self.errors[operation] += 1
+                if len(self.error_samples) < 10:
+                    self.error_samples.append(f"{operation}: {type(e).__name__}: {e}")
+            return
+        if record:
+            self.latencies[operation].append(time.perf_counter() - started)
+            self.bytes[operation] += size
+
+    async def preload(self, client: httpx.AsyncClient):
+        """先上传一批文件，保证读操作从一开始就有目标"""
+        semaphore = asyncio.Semaphore(self.args.concurrency)
+
+        async def one():
+            async with semaphore:
+                await self.run_operation(client, "upload", record=False)
+
+        await asyncio.gather(*(one() for _ in range(self.args.preload)))
+        if not self.file_ids and any(op != "upload" for op, _ in self.operations):
+            raise SystemExit(f"Preloading files to {self.url} failed")
+
+    async def worker(self, client: httpx.AsyncClient, deadline: float, counter: List[int]):
+        while time.monotonic() < deadline:
+            if self.args.requests:
+                if counter[0] >= self.args.requests:
+                    return
+                counter[0] += 1
+            await self.run_operation(client, self.pick(self.operations))
+
+    async def sample_memory(self, pid: int, stop: asyncio.Event):
+        while not stop.is_set():
+            rss = process_rss(pid)
+            if rss:
+                self.rss_samples.append(rss)
+            try:
+                await asyncio.wait_for(stop.wait(), RSS_SAMPLE_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def run(self, client: httpx.AsyncClient, server_pid: Optional[int]) -> float:
+        await self.preload(client)
+        stop = asyncio.Event()
+        sampler = asyncio.create_task(self.sample_memory(server_pid, stop)) if server_pid else None
+        started = time.monotonic()
+        deadline = started + (self.args.duration if not self.args.requests else float("inf"))
+        counter = [0]
+        await asyncio.gather(*(self.worker(client, deadline, counter) for _ in range(self.args.concurrency)))
+        duration = time.monotonic() - started
+        stop.set()
+        if sampler:
+            await sampler
+        return duration
+
+    def report(self, duration: float) -> Dict[str, Any]:
+        operations = {}
+        for op in OPERATIONS:
+            latencies = sorted(self.latencies[op])
+            if not latencies and not self.errors[op]:
+                continue
+            operations[op] = {
+                "requests": len(latencies),
+                "errors": self.errors[op],
+                "throughput": round(len(latencies) / duration, 2),
+                "bytes_per_second": round(self.bytes[op] / duration),
+                "latency": {
+                    "mean": round(sum(latencies) / len(latencies), 5) if latencies else 0,
+                    **{name: round(percentile(latencies, q), 5) for name, q in (("p50", 0.5), ("p90", 0.9), ("p95", 0.95), ("p99", 0.99))},
+                    "max": round(latencies[-1], 5) if latencies else 0,
+                },
+            }
+        total = sum(len(values) for values in self.latencies.values())
+        return {
+            "meta": {
+                "url": self.url,
+                "mix": self.args.mix,
+                "sizes": self.args.sizes,
+                "concurrency": self.args.concurrency,
+                "miss_rate": self.args.miss_rate,
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+            },
+            "duration": round(duration, 3),
+            "requests": total,
+            "errors": sum(self.errors.values()),
+            "throughput": round(total / duration, 2),
+            "operations": operations,
+            "server_rss": {
+                "start_mb": round(self.rss_samples[0] / 2**20, 1),
+                "peak_mb": round(max(self.rss_samples) / 2**20, 1),
+                "end_mb": round(self.rss_samples[-1] / 2**20, 1),
+            } if self.rss_samples else {},
+            "error_samples": self.error_samples,
+        }
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"\n{report['requests']} requests in {report['duration']:.1f}s against {report['meta']['url']} "
+          f"({report['meta']['concurrency']} concurrent): {report['throughput']:.1f} req/s, {report['errors']} errors")
+    print(f"\n  {'operation':<10} {'req/s':>9} {'data/s':>10} {'p50':>9} {'p90':>9} {'p95':>9} {'p99':>9} {'max':>9} {'errors':>7}")
+    for op, stats in report["operations"].items():
+        latency = {key: f"{value * 1000:.1f}ms" for key, value in stats["latency"].items()}
+        print(f"  {op:<10} {stats['throughput']:>9.1f} {format_bytes(stats['bytes_per_second']) + '/s':>10} "
+              f"{latency['p50']:>9} {latency['p90']:>9} {latency['p95']:>9} {latency['p99']:>9} {latency['max']:>9} {stats['errors']:>7}")
+    rss = report["server_rss"]
+    if rss:
+        print(f"\n  server RSS: start {rss['start_mb']:.1f} MB, peak {rss['peak_mb']:.1f} MB, end {rss['end_mb']:.1f} MB")
+    else:
+        print("\n  server RSS: not sampled (server process not found, use --server-pid)")
+    for sample in report["error_samples"][:5]:
+        print(f"  ! {sample}")
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    server = SpawnedServer(args.python) if args.spawn else None
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as client:
+        try:
+            if server:
+                server.start()
+                await server.wait_ready(client)
+                url, pid = server.url, server.proc.pid
+            else:
+                url = args.url
+                port = httpx.URL(url).port or 80
+                pid = args.server_pid or (find_listening_pid(port) if httpx.URL(url).host in ("localhost", "127.0.0.1", "0.0.0.0") else None)
+            test = LoadTest(args, url)
+            print(f"Load testing {url} for {f'{args.requests} requests' if args.requests else f'{args.duration}s'} "
+                  f"with {args.concurrency} workers, server pid {pid or 'unknown'}")
+            duration = await test.run(client, pid)
+            report = test.report(duration)
+            if server:
+                report["storage_bytes"] = server.storage_bytes()
+            return report
+        finally:
+            if server:
+                server.stop()
+                if not args.keep_run_dir:
+                    shutil.rmtree(server.run_dir, ignore_errors=True)
+                else:
+                    print(f"Run directory kept: {server.run_dir}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:9001", help="mcp-base to load test")
+    parser.add_argument("--spawn", action="store_true", help="start a throwaway mcp-base with its own port and storage directory")
+    parser.add_argument("--python", default=sys.executable, help="interpreter used to start mcp-base with --spawn")
+    parser.add_argument("--server-pid", type=int, help="process whose RSS is sampled, found by listening port for local servers")
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent requests")
+    parser.add_argument("--duration", type=float, default=30, help="seconds to run")
+    parser.add_argument("--requests", type=int, default=0, help="stop after this many requests instead of --duration")
+    parser.add_argument("--mix", default="upload:1,download:4,info:2,exists:2", help="operation weights: upload, download, info, exists")
+    parser.add_argument("--sizes", default="16k:40,256k:40,2m:15,16m:5", help="upload size weights, e.g. 16k:40,4m:10")
+    parser.add_argument("--preload", type=int, default=50, help="files uploaded before measuring so reads have targets")
+    parser.add_argument("--miss-rate", type=float, default=0.0, help="share of reads of unknown file ids (404)")
+    parser.add_argument("--timeout", type=float, default=60, help="per-request timeout in seconds")
+    parser.add_argument("--seed", type=int, default=None, help="seed of operation, size and target choice")
+    parser.add_argument("--json", help="also write the report to this JSON file")
+    parser.add_argument("--keep-run-dir", action="store_true", help="keep the storage and log of a --spawn server")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nReport saved to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -53,6 +53,9 @@ class Settings(BaseSettings):
     # API配置
     cors_origins: list[str] = ["*"]
     
+    # 指标配置，开启后在 /metrics 暴露 Prometheus 指标（需安装 prometheus-client）
+    metrics_enabled: bool = True
+    
     def get_base_url(self) -> str:
         """获取基础URL，优先使用PUBLIC_READ_URL，否则根据host:port构建"""
         if self.public_read_url:
@@ -10,23 +10,29 @@ import uvicorn
 import logging
 from pathlib import Path
 from fastapi import FastAPI, HTTPException, UploadFile, File
-from fastapi.responses import Response, StreamingResponse
+from fastapi.responses import Response, StreamingResponse, JSONResponse, ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 
 from config.settings import settings
 from services.file_service import file_service
+from services.metrics_service import setup_metrics
 from storage import FileInfo
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
-# 配置日志 - 过滤健康检查的访问日志
+
+# 配置日志 - 过滤健康检查与指标抓取的访问日志
 class HealthCheckFilter(logging.Filter):
-    """过滤健康检查的访问日志"""
+    """过滤健康检查与指标抓取的访问日志"""
     def filter(self, record):
         if hasattr(record, 'getMessage'):
             message = record.getMessage()
-            # 过滤掉健康检查的访问日志
-            if 'GET /health HTTP/1.1' in message:
+            # 过滤掉健康检查与指标抓取的访问日志
+            if 'GET /health HTTP/1.1' in message or 'GET /metrics HTTP/1.1' in message:
                 return False
         return True
 
@@ -38,9 +44,14 @@ access_logger.addFilter(HealthCheckFilter())
 app = FastAPI(
     title=settings.app_name,
     version=settings.app_version,
-    description="基础服务，提供文件存储和共用服务能力"
+    description="基础服务，提供文件存储和共用服务能力",
+    # 安装 orjson 时使用更快的JSON响应序列化 (uv sync --extra fast-json)
+    default_response_class=ORJSONResponse if orjson is not None else JSONResponse,
 )
 
+# 注册 /metrics 与请求统计
+setup_metrics(app)
+
 # 配置CORS
 app.add_middleware(
     CORSMiddleware,
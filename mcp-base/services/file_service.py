@@ -13,6 +13,7 @@ from fastapi import HTTPException, UploadFile
 
 from storage import storage, FileInfo
 from config.settings import settings
+from services import metrics_service
 
 
 class FileService:
@@ -73,6 +74,7 @@ class FileService:
                 filename=filename,
                 content_type=content_type
             )
+            metrics_service.record_upload(file_info.size)
             
             return file_info
         except Exception as e:
@@ -92,7 +94,10 @@ class FileService:
             bytes: 文件内容，如果文件不存在返回None
         """
         try:
-            return await self.storage.download(file_id)
+            content = await self.storage.download(file_id)
+            if content:
+                metrics_service.record_download(len(content))
+            return content
         except Exception as e:
             print(f"Error downloading file {file_id}: {e}")
             return None
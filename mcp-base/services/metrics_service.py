@@ -0,0 +1,119 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+"""
+指标服务
+提供 Prometheus 格式的请求、传输与存储用量指标
+未开启或未安装 prometheus_client 时所有指标退化为空操作
+"""
+
+import time
+from typing import Any, List, Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import Response
+
+from config.settings import settings
+from storage import storage
+
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+
+
+class _NoopMetric:
+    """未开启指标时使用的空指标"""
+
+    def labels(self, *args, **kwargs) -> "_NoopMetric":
+        return self
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+    def dec(self, amount: float = 1) -> None:
+        pass
+
+    def set(self, value: float) -> None:
+        pass
+
+    def observe(self, amount: float) -> None:
+        pass
+
+
+def is_enabled() -> bool:
+    return settings.metrics_enabled and prometheus_client is not None
+
+
+def _metric(kind: str, name: str, documentation: str, labelnames: List[str], **kwargs) -> Any:
+    if not is_enabled():
+        return _NoopMetric()
+    return getattr(prometheus_client, kind)(name, documentation, labelnames, **kwargs)
+
+
+SIZE_BUCKETS = (1024, 16 * 1024, 128 * 1024, 1024 ** 2, 4 * 1024 ** 2, 16 * 1024 ** 2, 64 * 1024 ** 2, 256 * 1024 ** 2)
+
+HTTP_REQUESTS = _metric("Counter", "pixelle_base_http_requests_total", "HTTP requests", ["method", "route", "status"])
+HTTP_REQUEST_DURATION = _metric("Histogram", "pixelle_base_http_request_duration_seconds", "HTTP request latency", ["method", "route"])
+HTTP_IN_FLIGHT = _metric("Gauge", "pixelle_base_http_requests_in_flight", "HTTP requests in progress", [])
+TRANSFER_BYTES = _metric("Counter", "pixelle_base_transfer_bytes_total", "Bytes uploaded to and served from storage", ["direction"])
+UPLOAD_SIZE = _metric("Histogram", "pixelle_base_upload_size_bytes", "Uploaded file sizes", [], buckets=SIZE_BUCKETS)
+STORAGE_BYTES = _metric("Gauge", "pixelle_base_storage_bytes", "Bytes stored in the storage backend", ["storage_type"])
+STORAGE_FILES = _metric("Gauge", "pixelle_base_storage_files", "Files stored in the storage backend", ["storage_type"])
+
+# 存储用量需要扫描目录，按抓取间隔缓存
+STORAGE_USAGE_TTL = 60
+_storage_usage_updated_at: Optional[float] = None
+
+
+def record_upload(size: int) -> None:
+    TRANSFER_BYTES.labels(direction="upload").inc(size)
+    UPLOAD_SIZE.observe(size)
+
+
+def record_download(size: int) -> None:
+    TRANSFER_BYTES.labels(direction="download").inc(size)
+
+
+async def _refresh_storage_usage() -> None:
+    global _storage_usage_updated_at
+    now = time.time()
+    if _storage_usage_updated_at and now - _storage_usage_updated_at < STORAGE_USAGE_TTL:
+        return
+    usage = await storage.get_usage()
+    if usage is not None:
+        total_bytes, total_files = usage
+        STORAGE_BYTES.labels(storage_type=settings.storage_type.value).set(total_bytes)
+        STORAGE_FILES.labels(storage_type=settings.storage_type.value).set(total_files)
+    _storage_usage_updated_at = now
+
+
+def setup_metrics(app: FastAPI) -> None:
+    """注册请求统计中间件与 /metrics 路由"""
+    if not is_enabled():
+        return
+
+    @app.middleware("http")
+    async def metrics_middleware(request: Request, call_next):
+        if request.url.path == "/metrics":
+            return await call_next(request)
+
+        start_time = time.perf_counter()
+        status = 500
+        HTTP_IN_FLIGHT.inc()
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            HTTP_IN_FLIGHT.dec()
+            # 使用路由模板作为标签，避免 file_id 导致标签基数爆炸
+            route = request.scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            HTTP_REQUESTS.labels(method=request.method, route=route_path, status=str(status)).inc()
+            HTTP_REQUEST_DURATION.labels(method=request.method, route=route_path).observe(time.perf_counter() - start_time)
+
+    @app.get("/metrics", include_in_schema=False)
+    async def metrics():
+        await _refresh_storage_usage()
+        return Response(prometheus_client.generate_latest(), media_type=prometheus_client.CONTENT_TYPE_LATEST)
@@ -7,7 +7,7 @@
 """
 
 from abc import ABC, abstractmethod
-from typing import BinaryIO, Optional
+from typing import BinaryIO, Optional, Tuple
 from dataclasses import dataclass
 
 
@@ -94,4 +94,13 @@ class StorageBackend(ABC):
         Returns:
             FileInfo: 文件信息，如果文件不存在返回None
         """
-        pass 
\ No newline at end of file
+        pass
+    
+    async def get_usage(self) -> Optional[Tuple[int, int]]:
+        """
+        获取存储用量
+        
+        Returns:
+            (总字节数, 文件数)，后端不支持统计时返回None
+        """
+        return None
@@ -8,9 +8,10 @@
 
 import os
 import uuid
+import asyncio
 import aiofiles
 from pathlib import Path
-from typing import BinaryIO, Optional
+from typing import BinaryIO, Optional, Tuple
 
 from .base import StorageBackend, FileInfo
 from config.settings import settings
@@ -118,4 +119,18 @@ class LocalStorage(StorageBackend):
                 url=self._get_file_url(file_id)
             )
         except Exception:
-            return None 
\ No newline at end of file
+            return None
+    
+    async def get_usage(self) -> Optional[Tuple[int, int]]:
+        """统计本地存储目录的用量"""
+        def scan() -> Tuple[int, int]:
+            total_bytes = 0
+            total_files = 0
+            with os.scandir(self.storage_path) as entries:
+                for entry in entries:
+                    if entry.is_file(follow_symlinks=False):
+                        total_bytes += entry.stat(follow_symlinks=False).st_size
+                        total_files += 1
+            return total_bytes, total_files
+        
+        return await asyncio.to_thread(scan)
@@ -8,6 +8,7 @@ from pathlib import Path
 def load_yml_and_set_env(service_key: str, config_filename: str = "config.yml"):
     """
     First load config.yml from current directory, then fallback to config.yml from project root directory.
+    If the PIXELLE_CONFIG environment variable is set, only the file it points to is loaded.
     Only need to pass service_key (like base/server/client), automatically inject all configurations under that key to os.environ (variable names in uppercase).
     :param service_key: Service configuration key
     :param config_filename: Configuration filename, default config.yml
@@ -16,6 +17,8 @@ def load_yml_and_set_env(service_key: str, config_filename: str = "config.yml"):
     root = cwd.parent.resolve()
 
     config_paths = [cwd / config_filename, root / config_filename]
+    if os.getenv("PIXELLE_CONFIG"):
+        config_paths = [Path(os.environ["PIXELLE_CONFIG"])]
     loaded = False
     for config_path in config_paths:
         if config_path.exists():
@@ -2,12 +2,14 @@
 # This project is licensed under the MIT License (SPDX-License-identifier: MIT).
 
 from datetime import timedelta
+import asyncio
 import json
 import os
 import time
 import chainlit as cl
-from typing import Any, Dict, List
-from mcp import ClientSession
+from typing import Any, Dict, List, Optional
+from mcp import ClientSession, types
+from mcp.shared.session import ProgressFnT
 import re
 from utils.llm_util import ModelInfo, ModelType
 
@@ -16,10 +18,26 @@ import litellm
 
 from chat.starters import build_save_action
 from utils.time_util import format_duration
+from utils import trace_util, metrics_util
 from core.core import logger
 
 save_starter_enabled = os.getenv("CHAINLIT_SAVE_STARTER_ENABLED", "false").lower() == "true"
 
+# Separator used by mcp-server to attach a preview image URL to a progress message
+PREVIEW_MARKER = " | preview: "
+
+
+# Providers whose streaming API accepts stream_options.include_usage; other OpenAI-compatible endpoints may reject it
+STREAM_USAGE_MODEL_TYPES = {ModelType.DEEPSEEK, ModelType.CLAUDE, ModelType.QWEN}
+
+
+def supports_stream_usage(model_info: ModelInfo) -> bool:
+    """Whether to ask the provider for a usage chunk at the end of the stream"""
+    if model_info.type == ModelType.OPENAI:
+        # OPENAI_BASE_URL may point to any OpenAI-compatible server, only the official API is known to support it
+        return (model_info.base_url or "").rstrip("/").startswith("https://api.openai.com")
+    return model_info.type in STREAM_USAGE_MODEL_TYPES
+
 
 def format_llm_error_message(model_name: str, error_str: str) -> str:
     """Unified LLM error message formatting function"""
@@ -81,15 +99,101 @@ def _extract_content(content_list):
     return text_parts[0] if len(text_parts) == 1 else text_parts
 
 
+def _get_user_id() -> Optional[str]:
+    """Identifier of the current chat user, falling back to the chat session id"""
+    user = cl.user_session.get("user")
+    if user is not None and getattr(user, "identifier", None):
+        return user.identifier
+    return cl.user_session.get("id")
+
+
+async def _call_mcp_tool(
+    mcp_session: ClientSession,
+    tool_name: str,
+    tool_input: Dict[str, Any],
+    progress_callback: Optional[ProgressFnT] = None,
+) -> types.CallToolResult:
+    """
+    Call MCP tool, propagating the current trace context and user id through the request _meta.
+    If the call is cancelled (e.g. the user stops the chat), the server is notified so it can
+    stop the running workflow.
+    """
+    read_timeout = timedelta(hours=1)
+    meta = trace_util.inject_carrier()
+    user_id = _get_user_id()
+    if user_id:
+        # Lets the server queue executions fairly per user
+        meta["user_id"] = user_id
+    
+    request = types.ClientRequest(
+        types.CallToolRequest(
+            method="tools/call",
+            params=types.CallToolRequestParams(
+                name=tool_name,
+                arguments=tool_input,
+                _meta=types.RequestParams.Meta(**meta) if meta else None,
+            ),
+        )
+    )
+    request_id = _next_request_id(mcp_session)
+    try:
+        return await mcp_session.send_request(request, types.CallToolResult, request_read_timeout_seconds=read_timeout, progress_callback=progress_callback)
+    except asyncio.CancelledError:
+        if request_id is not None:
+            await _notify_cancelled(mcp_session, request_id, f"Tool call {tool_name} was cancelled by the client")
+        else:
+            logger.warning(f"Tool call {tool_name} was cancelled, but its request id is unknown, the server keeps running it")
+        raise
+
+
+def _next_request_id(mcp_session: ClientSession) -> Optional[types.RequestId]:
+    """
+    The id send_request will assign to the next request, or None when it can't be determined.
+    The SDK has no public API for it: BaseSession (mcp 1.11, pinned in pyproject.toml) takes the
+    next id from the _request_id counter before its first await.
+    """
+    request_id = getattr(mcp_session, "_request_id", None)
+    if isinstance(request_id, int) and not isinstance(request_id, bool):
+        return request_id
+    return None
+
+
+async def _notify_cancelled(mcp_session: ClientSession, request_id: types.RequestId, reason: str):
+    """Tell the server to stop processing a request the client no longer waits for"""
+    notification = types.ClientNotification(
+        types.CancelledNotification(
+            method="notifications/cancelled",
+            params=types.CancelledNotificationParams(requestId=request_id, reason=reason),
+        )
+    )
+    try:
+        await asyncio.wait_for(mcp_session.send_notification(notification), timeout=5)
+        logger.info(f"Sent cancellation for MCP request {request_id}")
+    except Exception as e:
+        logger.warning(f"Failed to send cancellation for MCP request {request_id}: {e}")
+
+
+def _render_progress(progress: float, total: Optional[float], message: Optional[str]) -> str:
+    """Render a progress notification as a text progress bar"""
+    text = message or ""
+    if not total:
+        return f"⏳ {text}".rstrip()
+    ratio = max(0.0, min(progress / total, 1.0))
+    filled = int(ratio * 20)
+    return f"⏳ {'█' * filled}{'░' * (20 - filled)} {ratio * 100:.0f}% {text}".rstrip()
+
+
 @cl.step(type="tool")
 async def execute_tool(tool_name: str, tool_input: Dict[str, Any]) -> str:
     """Execute MCP tool call"""
     # Record start time
     start_time = time.time()
     
-    def _format_result_with_duration(content: str) -> str:
+    def _format_result_with_duration(content: str, status: str = "error") -> str:
         """Unified formatting of results with duration"""
         duration = time.time() - start_time
+        metrics_util.TOOL_CALLS.labels(tool=tool_name, status=status).inc()
+        metrics_util.TOOL_CALL_DURATION.labels(tool=tool_name).observe(duration)
         return f"[Took {format_duration(duration)}] {content}"
     
     current_step = cl.context.current_step
@@ -122,10 +226,32 @@ async def execute_tool(tool_name: str, tool_input: Dict[str, Any]) -> str:
         record_step()
         return result_with_duration
     
+    preview_element = None
+    
+    async def on_progress(progress: float, total: Optional[float], message: Optional[str]):
+        """Render progress notifications of the running tool live in the step"""
+        nonlocal preview_element
+        text, _, preview_url = (message or "").partition(PREVIEW_MARKER)
+        current_step.output = _render_progress(progress, total, text)
+        if preview_url and (preview_element is None or preview_element.url != preview_url):
+            if preview_element is not None:
+                await preview_element.remove()
+            preview_element = cl.Image(url=preview_url, name="preview", display="inline")
+            current_step.elements = [preview_element]
+        await current_step.update()
+    
     try:
         # Call MCP tool, returns CallToolResult object
         logger.info(f"Calling MCP tool: {tool_name} with input: {tool_input}")
-        result = await mcp_session.call_tool(tool_name, tool_input, read_timeout_seconds=timedelta(hours=1))
+        with trace_util.start_span("mcp.call_tool", {"mcp.server": mcp_name, "tool.name": tool_name}) as span:
+            try:
+                result = await _call_mcp_tool(mcp_session, tool_name, tool_input, progress_callback=on_progress)
+            finally:
+                # Previews are only meaningful while the tool is running
+                if preview_element is not None:
+                    await preview_element.remove()
+                    current_step.elements = []
+            span.set_attribute("tool.is_error", bool(result.isError))
         
         # Check if there's an error
         if result.isError:
@@ -139,11 +265,16 @@ async def execute_tool(tool_name: str, tool_input: Dict[str, Any]) -> str:
         # Extract content text
         content = _extract_content(result.content)
         logger.info(f"Tool execution succeeded: {content}")
-        result_with_duration = _format_result_with_duration(str(content))
+        result_with_duration = _format_result_with_duration(str(content), status="success")
         current_step.output = result_with_duration
         record_step()
         return result_with_duration
         
+    except asyncio.CancelledError:
+        # Chat stopped by the user, the MCP call has been cancelled on the server as well
+        logger.info(f"Tool execution cancelled: {tool_name}")
+        current_step.output = _format_result_with_duration("Cancelled", status="cancelled")
+        raise
     except Exception as e:
         logger.error(f"Tool execution failed: {e}")
         error_msg = json.dumps({"error": str(e)})
@@ -306,7 +437,8 @@ async def _execute_tool_calls(
             tool_args = json.loads(tool_args_str)
             
             # Execute tool call
-            tool_response = await execute_tool(tool_name, tool_args)
+            with trace_util.start_span("tool.call", {"tool.name": tool_name}):
+                tool_response = await execute_tool(tool_name, tool_args)
             
             # Add tool response to message history
             messages.append({
@@ -359,6 +491,31 @@ async def _handle_response(model_info, api_params, enhanced_messages, messages):
     current_args = {}
     has_tool_call = False
     
+    # LLM span covers request -> first token -> last token, tool execution is excluded
+    llm_span = trace_util.start_detached_span("llm.completion", {
+        "llm.provider": model_info.provider,
+        "llm.model": model_info.model,
+    })
+    request_time = time.time()
+    first_token_time = None
+    llm_span_ended = False
+    
+    def end_llm_span(finish_reason: str = None, status: str = "success"):
+        nonlocal llm_span_ended
+        if llm_span_ended:
+            return
+        llm_span_ended = True
+        end_time = time.time()
+        if first_token_time is not None:
+            llm_span.set_attribute("llm.time_to_first_token", first_token_time - request_time)
+            metrics_util.LLM_LATENCY.labels(model=model_info.name, stage="first_token").observe(first_token_time - request_time)
+        llm_span.set_attribute("llm.duration", end_time - request_time)
+        if finish_reason:
+            llm_span.set_attribute("llm.finish_reason", finish_reason)
+        llm_span.end()
+        metrics_util.LLM_LATENCY.labels(model=model_info.name, stage="total").observe(end_time - request_time)
+        metrics_util.LLM_REQUESTS.labels(model=model_info.name, status=status).inc()
+    
     try:
         # Prepare LiteLLM parameters - directly pass all necessary parameters
         litellm_params = {
@@ -368,14 +525,28 @@ async def _handle_response(model_info, api_params, enhanced_messages, messages):
             "timeout": 30,
             "api_key": model_info.api_key,
             "base_url": model_info.base_url or None,
+            # Let LiteLLM drop parameters a known provider does not support instead of failing the request
+            "drop_params": True,
             **api_params,
         }
+        if supports_stream_usage(model_info):
+            litellm_params["stream_options"] = {"include_usage": True}
         
         logger.info(f"Call LLM: {model_info.provider}/{model_info.model}")
         response = await acompletion(**litellm_params)
         
+        finish_reason = None
         try:
             async for chunk in response:
+                # The usage chunk requested by include_usage may carry no choices, providers without it report no usage
+                metrics_util.record_llm_usage(model_info.name, getattr(chunk, "usage", None))
+                if not chunk.choices:
+                    continue
+                
+                if first_token_time is None:
+                    first_token_time = time.time()
+                    llm_span.add_event("first_token")
+                
                 chunk_has_tool_call, finish_reason = await _handle_stream_chunk(
                     chunk, msg, current_tool_calls, current_args
                 )
@@ -385,6 +556,7 @@ async def _handle_response(model_info, api_params, enhanced_messages, messages):
                 
                 # Check completion status
                 if finish_reason == 'tool_calls':
+                    end_llm_span(finish_reason)
                     try:
                         # First send the current round's message (if there's content)
                         if msg.content and msg.content.strip():
@@ -408,6 +580,8 @@ async def _handle_response(model_info, api_params, enhanced_messages, messages):
                     # Other completion reasons, end streaming processing
                     break
             
+            end_llm_span(finish_reason)
+            
             # Process media markers and send message
             if not has_tool_call:
                 await _process_media_markers(msg)
@@ -432,6 +606,8 @@ async def _handle_response(model_info, api_params, enhanced_messages, messages):
             return enhanced_messages, False  # End processing
             
         except Exception as e:
+            llm_span.record_exception(e)
+            end_llm_span(status="error")
             error_str = str(e)
             error_message = format_llm_error_message(model_info.name, error_str)
             logger.error(f"Stream processing error: {error_str}")
@@ -442,6 +618,8 @@ async def _handle_response(model_info, api_params, enhanced_messages, messages):
             return messages, False
             
     except Exception as e:
+        llm_span.record_exception(e)
+        end_llm_span(status="error")
         error_str = str(e)
         error_message = format_llm_error_message(model_info.name, error_str)
         logger.error(f"LiteLLM call failed: {error_str}")
@@ -490,7 +668,9 @@ async def process_streaming_response(
     # Inject media display system instructions
     enhanced_messages = messages.copy()
     
+    round_index = 0
     while True:  # Loop to handle tool calls
+        round_index += 1
         # Prepare API parameters
         api_params = {
             "messages": enhanced_messages,
@@ -504,9 +684,10 @@ async def process_streaming_response(
         
         # All parameters are passed through LiteLLM function parameters, not using environment variables
         try:
-            enhanced_messages, should_continue = await _handle_response(
-                model_info, api_params, enhanced_messages, messages
-            )
+            with trace_util.start_span("chat.round", {"chat.round": round_index, "llm.model": model_info.name}):
+                enhanced_messages, should_continue = await _handle_response(
+                    model_info, api_params, enhanced_messages, messages
+                )
             
             if not should_continue:
                 return enhanced_messages
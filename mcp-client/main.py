@@ -16,6 +16,11 @@ from chat.chat_handler import handle_mcp_connect, handle_mcp_disconnect
 from chat.chat_settings import setup_chat_settings, setup_settings_update
 import chat.chat_handler as tool_handler
 from utils.file_uploader import upload
+from utils import trace_util
+from utils.metrics_util import setup_metrics
+
+# 注册 /metrics 与请求统计
+setup_metrics()
 
 
 @cl.set_chat_profiles
@@ -80,7 +85,8 @@ async def on_message(message: cl.Message):
             or isinstance(element, cl.Video)
         if is_media and element.path and not element.url:
             element.size = "small"
-            element.url = upload(element.path, filename=element.name)
+            with trace_util.start_span("file.upload", {"file.name": element.name}):
+                element.url = upload(element.path, filename=element.name)
             need_update = True
     if need_update:
         await message.update()
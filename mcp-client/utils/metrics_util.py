@@ -0,0 +1,113 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+"""
+Prometheus 指标
+未开启或未安装 prometheus_client 时所有指标退化为空操作
+"""
+
+import os
+import time
+from typing import Any, List
+
+from core.core import logger
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+    if METRICS_ENABLED:
+        logger.info("未安装 prometheus_client，/metrics 不可用 (uv sync --extra metrics)")
+
+
+class _NoopMetric:
+    """未开启指标时使用的空指标"""
+
+    def labels(self, *args, **kwargs) -> "_NoopMetric":
+        return self
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+    def dec(self, amount: float = 1) -> None:
+        pass
+
+    def set(self, value: float) -> None:
+        pass
+
+    def observe(self, amount: float) -> None:
+        pass
+
+
+def is_enabled() -> bool:
+    return METRICS_ENABLED and prometheus_client is not None
+
+
+def _metric(kind: str, name: str, documentation: str, labelnames: List[str], **kwargs) -> Any:
+    if not is_enabled():
+        return _NoopMetric()
+    return getattr(prometheus_client, kind)(name, documentation, labelnames, **kwargs)
+
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120, 300, 600, 1800, 3600)
+
+HTTP_REQUESTS = _metric("Counter", "pixelle_client_http_requests_total", "HTTP requests", ["method", "route", "status"])
+HTTP_REQUEST_DURATION = _metric("Histogram", "pixelle_client_http_request_duration_seconds", "HTTP request latency", ["method", "route"])
+LLM_REQUESTS = _metric("Counter", "pixelle_client_llm_requests_total", "LLM completion requests", ["model", "status"])
+LLM_LATENCY = _metric("Histogram", "pixelle_client_llm_latency_seconds", "LLM latency by stage (first_token / total)", ["model", "stage"], buckets=LATENCY_BUCKETS)
+LLM_TOKENS = _metric("Counter", "pixelle_client_llm_tokens_total", "LLM tokens consumed", ["model", "type"])
+TOOL_CALLS = _metric("Counter", "pixelle_client_tool_calls_total", "MCP tool calls", ["tool", "status"])
+TOOL_CALL_DURATION = _metric("Histogram", "pixelle_client_tool_call_duration_seconds", "MCP tool call latency", ["tool"], buckets=LATENCY_BUCKETS)
+
+
+def record_llm_usage(model: str, usage: Any) -> None:
+    """记录流式响应最后一个 chunk 中携带的 token 用量"""
+    if usage is None:
+        return
+    for token_type in ("prompt_tokens", "completion_tokens"):
+        count = getattr(usage, token_type, None)
+        if count:
+            LLM_TOKENS.labels(model=model, type=token_type.replace("_tokens", "")).inc(count)
+
+
+_setup_done = False
+
+
+def setup_metrics() -> None:
+    """在 Chainlit 的 FastAPI 应用上注册请求统计中间件与 /metrics 路由"""
+    global _setup_done
+    # Chainlit 启动时会以 __main__ 与应用模块两种身份加载 main.py，这里需要保证只注册一次
+    if not is_enabled() or _setup_done:
+        return
+    _setup_done = True
+
+    from chainlit.server import app
+    from fastapi import Request
+    from fastapi.responses import Response
+
+    @app.middleware("http")
+    async def metrics_middleware(request: Request, call_next):
+        if request.url.path == "/metrics":
+            return await call_next(request)
+
+        start_time = time.perf_counter()
+        status = 500
+        try:
+            response = await call_next(request)
+            status = response.status_code
+            return response
+        finally:
+            # 使用路由模板作为标签，避免路径参数导致标签基数爆炸
+            route = request.scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            HTTP_REQUESTS.labels(method=request.method, route=route_path, status=str(status)).inc()
+            HTTP_REQUEST_DURATION.labels(method=request.method, route=route_path).observe(time.perf_counter() - start_time)
+
+    async def metrics():
+        return Response(prometheus_client.generate_latest(), media_type=prometheus_client.CONTENT_TYPE_LATEST)
+
+    # Chainlit 注册了兜底的前端路由 /{full_path:path}，需要把 /metrics 插到它之前
+    app.add_api_route("/metrics", metrics, methods=["GET"], include_in_schema=False)
+    app.router.routes.insert(0, app.router.routes.pop())
@@ -0,0 +1,118 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+"""
+OpenTelemetry 链路追踪工具
+未开启或未安装 opentelemetry 时所有接口退化为空操作
+"""
+
+import os
+from contextlib import contextmanager
+from typing import Any, Dict, Generator, Optional
+
+from core.core import logger
+from utils.os_util import get_data_path
+
+OTEL_ENABLED = os.getenv("OTEL_ENABLED", "false").lower() == "true"
+OTEL_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "pixelle-mcp-client")
+# 导出方式: otlp / console / file
+OTEL_EXPORTER = os.getenv("OTEL_EXPORTER", "otlp").lower()
+OTEL_EXPORTER_OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318")
+OTEL_EXPORTER_FILE = os.getenv("OTEL_EXPORTER_FILE")
+
+
+class _NoopSpan:
+    """未开启追踪时使用的空 span"""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        pass
+
+    def add_event(self, name: str, attributes: Optional[Dict[str, Any]] = None) -> None:
+        pass
+
+    def record_exception(self, exception: BaseException) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def _init_tracer():
+    """根据配置初始化 tracer，未开启或缺少依赖时返回 None"""
+    if not OTEL_ENABLED:
+        return None
+
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    except ImportError:
+        logger.warning("OTEL_ENABLED=true 但未安装 opentelemetry，链路追踪已禁用 (uv sync --extra otel)")
+        return None
+
+    provider = TracerProvider(resource=Resource.create({"service.name": OTEL_SERVICE_NAME}))
+    if OTEL_EXPORTER == "console":
+        exporter = ConsoleSpanExporter()
+    elif OTEL_EXPORTER == "file":
+        file_path = OTEL_EXPORTER_FILE or get_data_path("traces.jsonl")
+        exporter = ConsoleSpanExporter(
+            out=open(file_path, "a", encoding="utf-8"),
+            formatter=lambda span: span.to_json(indent=None) + os.linesep,
+        )
+    else:
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        exporter = OTLPSpanExporter(endpoint=f"{OTEL_EXPORTER_OTLP_ENDPOINT.rstrip('/')}/v1/traces")
+
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    logger.info(f"链路追踪已开启: exporter={OTEL_EXPORTER}, service={OTEL_SERVICE_NAME}")
+    return trace.get_tracer("pixelle.mcp-client")
+
+
+_tracer = _init_tracer()
+
+
+def is_enabled() -> bool:
+    return _tracer is not None
+
+
+@contextmanager
+def start_span(name: str, attributes: Optional[Dict[str, Any]] = None) -> Generator[Any, None, None]:
+    """创建并激活一个 span，期间创建的 span 与 MCP 调用都会挂在其下"""
+    if _tracer is None:
+        yield NOOP_SPAN
+        return
+
+    with _tracer.start_as_current_span(name, attributes=_clean_attributes(attributes)) as span:
+        yield span
+
+
+def start_detached_span(name: str, attributes: Optional[Dict[str, Any]] = None) -> Any:
+    """创建一个不激活的 span，调用方负责 end()，用于生命周期跨越多个分支的阶段（如 LLM 流式输出）"""
+    if _tracer is None:
+        return NOOP_SPAN
+    return _tracer.start_span(name, attributes=_clean_attributes(attributes))
+
+
+def inject_carrier() -> Dict[str, str]:
+    """导出当前 trace context，随 MCP 请求的 _meta 传递给服务端"""
+    if _tracer is None:
+        return {}
+    from opentelemetry.propagate import inject
+    carrier: Dict[str, str] = {}
+    inject(carrier)
+    return carrier
+
+
+def _clean_attributes(attributes: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """过滤掉 OpenTelemetry 不支持的属性值"""
+    if not attributes:
+        return None
+    return {k: v for k, v in attributes.items() if isinstance(v, (str, bool, int, float))}
@@ -0,0 +1,730 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+"""
+端到端基准测试
+
+在隔离的临时目录中启动模拟 ComfyUI（benchmarks/fake_comfyui.py）、mcp-base 与 mcp-server，
+由 N 个并发 MCP 客户端通过 SSE 调用 workflows/ 中自带的工作流，覆盖完整的工具调用链路：
+参数解析、参数应用、媒体上传、提交、排队与执行等待、结果转存。
+
+报告内容：
+- 吞吐量与客户端视角的延迟（p50/p95/p99），按工作流细分
+- 各阶段耗时，来自 mcp-server 写出的 OpenTelemetry span（需安装 otel 扩展依赖）
+- 各服务进程树的内存占用（RSS 峰值与均值）
+- 模拟 ComfyUI 的统计信息
+
+结果保存为 JSON（默认 benchmarks/results/），可通过 --compare 与之前提交的结果对比。
+
+用法（在 mcp-server 目录下）：
+    uv run python benchmarks/bench_e2e.py --scenario smoke
+    uv run python benchmarks/bench_e2e.py --scenario mixed --clients 16 --compare benchmarks/results/mixed-1f7183f.json
+    uv run python benchmarks/bench_e2e.py --scenario my_scenario.yml --base-python ../mcp-base/.venv/bin/python
+
+场景文件（YAML）字段与内置场景一致，参数中的 {image} 会替换为上传到 mcp-base 的示例图片地址，
+{request} 与 {client} 替换为请求序号与客户端序号：
+    name: custom
+    clients: 8
+    requests_per_client: 20
+    workflows:
+      - workflow: t2i_by_local_flux
+        weight: 3
+        params: {prompt: "a cat, variation {request}", width: 512, height: 512}
+    simulator: {delays: {SamplerCustomAdvanced: 1.5}, workers: 2}
+    server: {comfyui_max_concurrent_prompts: 2}
+"""
+
+import os
+import sys
+import json
+import time
+import zlib
+import socket
+import signal
+import struct
+import random
+import shutil
+import asyncio
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import yaml
+import aiohttp
+from mcp import ClientSession
+from mcp.client.sse import sse_client
+from pydantic import BaseModel, Field
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_DIR = os.path.dirname(BENCHMARK_DIR)
+BASE_DIR = os.path.join(os.path.dirname(SERVER_DIR), "mcp-base")
+WORKFLOWS_DIR = os.path.join(SERVER_DIR, "workflows")
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, "results")
+
+sys.path.insert(0, BENCHMARK_DIR)
+
+from fake_comfyui import SimulatorConfig  # noqa: E402
+
+# 报告中的阶段名 -> mcp-server 的 span 名称
+PHASE_SPANS = {
+    "parse": "workflow.parse",
+    "apply_params": "workflow.apply_params",
+    "upload_media": "comfyui.upload_media",
+    "submit": "comfyui.queue_prompt",
+    "queue_wait": "comfyui.queue_wait",
+    "execution": "comfyui.execution",
+    "wait": "comfyui.wait",
+    "transfer": "comfyui.transfer",
+    "server_total": "workflow.execute",
+}
+# 对比时使用的指标，(路径, 数值越大越好)
+COMPARE_METRICS = [
+    ("summary.throughput", True),
+    ("summary.latency.p50", False),
+    ("summary.latency.p95", False),
+    ("summary.latency.p99", False),
+    ("summary.error_rate", False),
+]
+RSS_SAMPLE_INTERVAL = 0.5
+READY_TIMEOUT = 60
+
+
+class WorkloadItem(BaseModel):
+    """场景中的一类请求"""
+    workflow: str = Field(description="Workflow file name in workflows/ without .json, also the tool name")
+    weight: float = Field(1.0, description="Relative share of requests")
+    params: Dict[str, Any] = Field(default_factory=dict, description="Tool arguments, {image}/{request}/{client} are substituted")
+
+
+class Scenario(BaseModel):
+    """基准测试场景"""
+    name: str
+    description: str = ""
+    clients: int = Field(4, description="Concurrent MCP clients, each with its own SSE session")
+    requests_per_client: int = Field(10, description="Tool calls issued one after another by each client")
+    warmup: int = Field(1, description="Calls per workflow before measuring (template compilation, node cache)")
+    think_time: float = Field(0.0, description="Seconds a client waits between two calls")
+    executor: str = Field("http", description="comfyui_executor_type of mcp-server: http or websocket")
+    seed: int = 42
+    workflows: List[WorkloadItem]
+    simulator: SimulatorConfig = Field(default_factory=SimulatorConfig)
+    server: Dict[str, Any] = Field(default_factory=dict, description="Extra server section entries of config.yml")
+
+
+SCENARIOS: Dict[str, Scenario] = {
+    "smoke": Scenario(
+        name="smoke",
+        description="Single text-to-image workflow with fast nodes, checks the whole path works",
+        clients=2,
+        requests_per_client=5,
+        workflows=[
+            WorkloadItem(workflow="t2i_by_local_flux", params={"prompt": "a lighthouse at dawn, variation {request}", "width": 512, "height": 512}),
+        ],
+        simulator=SimulatorConfig(default_delay=0.01, delays={"SamplerCustomAdvanced": 0.2}),
+    ),
+    "images": Scenario(
+        name="images",
+        description="Image generation and editing, includes media input upload",
+        clients=8,
+        requests_per_client=10,
+        workflows=[
+            WorkloadItem(workflow="t2i_by_local_flux", weight=3, params={"prompt": "a lighthouse at dawn, variation {request}", "width": 1024, "height": 1024}),
+            WorkloadItem(workflow="t2i_qwen_image", weight=2, params={"prompt": "a poster with the text 'bench {request}'", "width": 1024, "height": 1024}),
+            WorkloadItem(workflow="i2i_by_flux_kontext_pro", weight=1, params={"image": "{image}", "prompt": "make it snow, variation {request}"}),
+        ],
+        simulator=SimulatorConfig(
+            default_delay=0.01,
+            delays={"SamplerCustomAdvanced": 1.0, "KSampler": 1.0, "FluxKontextProImageNode": 0.8},
+            jitter=0.1,
+            workers=2,
+            seed=42,
+        ),
+    ),
+    "mixed": Scenario(
+        name="mixed",
+        description="Images, captioning, audio and video with realistic relative durations and large outputs",
+        clients=8,
+        requests_per_client=8,
+        workflows=[
+            WorkloadItem(workflow="t2i_by_local_flux", weight=4, params={"prompt": "a lighthouse at dawn, variation {request}", "width": 1024, "height": 1024}),
+            WorkloadItem(workflow="i2i_by_flux_kontext_pro", weight=2, params={"image": "{image}", "prompt": "make it snow, variation {request}"}),
+            WorkloadItem(workflow="i2t_by_local_florence", weight=2, params={"image": "{image}", "use_cache": False}),
+            WorkloadItem(workflow="s_generate_audio_by_prompt", weight=1, params={"prompt": "rain on a tin roof, take {request}"}),
+            WorkloadItem(workflow="t2v_by_local_wan_fusionx", weight=1, params={"prompt": "waves rolling on a beach, take {request}"}),
+        ],
+        simulator=SimulatorConfig(
+            default_delay=0.01,
+            delays={"SamplerCustomAdvanced": 1.0, "KSampler": 2.0, "FluxKontextProImageNode": 0.8, "Florence2Run": 0.3, "VHS_VideoCombine": 0.5},
+            jitter=0.1,
+            output_sizes={"image": 1_500_000, "video": 8_000_000, "audio": 1_000_000},
+            workers=2,
+            seed=42,
+        ),
+    ),
+    "cached": Scenario(
+        name="cached",
+        description="Identical calls, measures the result cache and request coalescing path",
+        clients=8,
+        requests_per_client=10,
+        workflows=[
+            WorkloadItem(workflow="t2i_by_local_flux", params={"prompt": "a lighthouse at dawn", "width": 1024, "height": 1024}),
+        ],
+        simulator=SimulatorConfig(default_delay=0.01, delays={"SamplerCustomAdvanced": 1.0}),
+    ),
+}
+
+
+def load_scenario(value: str) -> Scenario:
+    if value in SCENARIOS:
+        return SCENARIOS[value].model_copy(deep=True)
+    if not os.path.exists(value):
+        raise SystemExit(f"Unknown scenario {value!r}, built-in scenarios: {', '.join(SCENARIOS)}")
+    with open(value, "r", encoding="utf-8") as f:
+        data = yaml.safe_load(f)
+    data.setdefault("name", os.path.splitext(os.path.basename(value))[0])
+    return Scenario(**data)
+
+
+def simulator_args(config: SimulatorConfig) -> List[str]:
+    """把模拟器配置转换为 fake_comfyui.py 的命令行参数"""
+    args = [
+        "--default-delay", str(config.default_delay),
+        "--jitter", str(config.jitter),
+        "--progress-steps", str(config.progress_steps),
+        "--files-per-output", str(config.files_per_output),
+        "--queue-capacity", str(config.queue_capacity),
+        "--workers", str(config.workers),
+        "--failure-rate", str(config.failure_rate),
+        "--reject-rate", str(config.reject_rate),
+    ]
+    for class_type, delay in config.delays.items():
+        args += ["--delay", f"{class_type}={delay}"]
+    for kind, size in config.output_sizes.items():
+        args += ["--output-size", f"{kind}={size}"]
+    for class_type in config.fail_classes:
+        args += ["--fail-class", class_type]
+    if not config.node_cache:
+        args.append("--no-node-cache")
+    if config.preview:
+        args.append("--preview")
+    if config.seed is not None:
+        args += ["--seed", str(config.seed)]
+    return args
+
+
+def free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def sample_png(size: int = 64) -> bytes:
+    """生成一张渐变色 PNG 作为媒体输入，模拟 ComfyUI 不解码图片，无需依赖 Pillow"""
+    rows = b"".join(b"\x00" + bytes(v for x in range(size) for v in (x * 4 % 256, y * 4 % 256, 128)) for y in range(size))
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", size, size, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(rows)) + chunk(b"IEND", b"")
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """线性插值的分位数，sorted_values 需已排序"""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * q
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    return sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * (position - lower)
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    ordered = sorted(values)
+    if not ordered:
+        return {"count": 0}
+    return {
+        "count": len(ordered),
+        "mean": round(sum(ordered) / len(ordered), 4),
+        "p50": round(percentile(ordered, 0.50), 4),
+        "p95": round(percentile(ordered, 0.95), 4),
+        "p99": round(percentile(ordered, 0.99), 4),
+        "max": round(ordered[-1], 4),
+    }
+
+
+class Service:
+    """以独立进程组启动的被测服务，便于统计整个进程树的内存并整体停止"""
+
+    def __init__(self, name: str, cmd: List[str], cwd: str, env: Dict[str, str], log_dir: str):
+        self.name = name
+        self.cmd = cmd
+        self.cwd = cwd
+        self.env = env
+        self.log_path = os.path.join(log_dir, f"{name}.log")
+        self.proc: Optional[subprocess.Popen] = None
+        self.rss_samples: List[int] = []
+
+    def start(self):
+        log = open(self.log_path, "wb")
+        self.proc = subprocess.Popen(self.cmd, cwd=self.cwd, env=self.env, stdout=log, stderr=subprocess.STDOUT, start_new_session=True)
+        log.close()
+
+    def alive(self) -> bool:
+        return self.proc is not None and self.proc.poll() is None
+
+    def log_tail(self, lines: int = 20) -> str:
+        try:
+            with open(self.log_path, "r", encoding="utf-8", errors="replace") as f:
+                return "".join(f.readlines()[-lines:])
+        except OSError:
+            return ""
+
+    def rss(self) -> int:
+        """进程组内所有进程的 RSS 之和（字节），仅支持 Linux /proc"""
+        if not self.alive():
+            return 0
+        total = 0
+        for pid in os.listdir("/proc"):
+            if not pid.isdigit():
+                continue
+            try:
+                with open(f"/proc/{pid}/stat", "r") as f:
+                    fields = f.read().rsplit(")", 1)[1].split()
+                if int(fields[2]) != self.proc.pid:
+                    continue
+                with open(f"/proc/{pid}/status", "r") as f:
+                    for line in f:
+                        if line.startswith("VmRSS:"):
+                            total += int(line.split()[1]) * 1024
+                            break
+            except (OSError, IndexError, ValueError):
+                continue
+        return total
+
+    def stop(self, timeout: float = 15):
+        """先发送 SIGINT 让服务正常退出（mcp-server 退出时才会写出剩余的 span），超时后强制结束"""
+        if not self.alive():
+            return
+        try:
+            os.killpg(self.proc.pid, signal.SIGINT)
+            self.proc.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            os.killpg(self.proc.pid, signal.SIGKILL)
+            self.proc.wait()
+        except ProcessLookupError:
+            pass
+
+    def memory_stats(self) -> Dict[str, float]:
+        if not self.rss_samples:
+            return {}
+        return {
+            "peak_mb": round(max(self.rss_samples) / 2**20, 1),
+            "mean_mb": round(sum(self.rss_samples) / len(self.rss_samples) / 2**20, 1),
+        }
+
+
+class E2EBenchmark:
+    """准备运行目录、启动服务、发压并收集结果"""
+
+    def __init__(self, scenario: Scenario, base_cmd: List[str], call_timeout: float, keep_run_dir: bool):
+        self.scenario = scenario
+        self.base_cmd = base_cmd
+        self.call_timeout = call_timeout
+        self.keep_run_dir = keep_run_dir
+        self.run_dir = tempfile.mkdtemp(prefix="pixelle-bench-")
+        self.trace_file = os.path.join(self.run_dir, "traces.jsonl")
+        self.ports = {"comfyui": free_port(), "base": free_port(), "server": free_port()}
+        self.services: List[Service] = []
+        self.image_url = ""
+
+    @property
+    def sse_url(self) -> str:
+        return f"http://127.0.0.1:{self.ports['server']}/sse"
+
+    def prepare(self) -> str:
+        """复制场景用到的工作流并生成只属于本次运行的 config.yml"""
+        workflow_dir = os.path.join(self.run_dir, "workflows")
+        os.makedirs(workflow_dir)
+        os.makedirs(os.path.join(self.run_dir, "logs"))
+        for item in self.scenario.workflows:
+            source = os.path.join(WORKFLOWS_DIR, f"{item.workflow}.json")
+            if not os.path.exists(source):
+                raise SystemExit(f"Workflow not found: {source}")
+            shutil.copy(source, workflow_dir)
+
+        base_url = f"http://127.0.0.1:{self.ports['base']}"
+        config = {
+            "base": {
+                "server_host": "127.0.0.1",
+                "server_port": self.ports["base"],
+                "public_read_url": base_url,
+                "local_storage_path": os.path.join(self.run_dir, "files"),
+            },
+            "server": {
+                "mcp_host": "127.0.0.1",
+                "mcp_port": self.ports["server"],
+                "mcp_base_url": base_url,
+                "comfyui_base_url": f"http://127.0.0.1:{self.ports['comfyui']}",
+                "comfyui_executor_type": self.scenario.executor,
+                "custom_workflow_dir": workflow_dir,
+                "job_db_path": os.path.join(self.run_dir, "jobs.db"),
+                "otel_enabled": "true",
+                "otel_exporter": "file",
+                "otel_exporter_file": self.trace_file,
+                **self.scenario.server,
+            },
+        }
+        config_path = os.path.join(self.run_dir, "config.yml")
+        with open(config_path, "w", encoding="utf-8") as f:
+            yaml.safe_dump(config, f, sort_keys=False)
+        return config_path
+
+    def start_services(self, config_path: str):
+        env = {**os.environ, "PIXELLE_CONFIG": config_path, "PYTHONUNBUFFERED": "1"}
+        log_dir = os.path.join(self.run_dir, "logs")
+        fake_cmd = [sys.executable, os.path.join(BENCHMARK_DIR, "fake_comfyui.py"), "--host", "127.0.0.1", "--port", str(self.ports["comfyui"])]
+        self.services = [
+            Service("comfyui", fake_cmd + simulator_args(self.scenario.simulator), SERVER_DIR, env, log_dir),
+            Service("mcp-base", self.base_cmd, BASE_DIR, env, log_dir),
+            Service("mcp-server", [sys.executable, "main.py"], SERVER_DIR, env, log_dir),
+        ]
+        for service in self.services:
+            service.start()
+
+    async def wait_ready(self):
+        checks = [
+            (self.services[0], f"http://127.0.0.1:{self.ports['comfyui']}/system_stats"),
+            (self.services[1], f"http://127.0.0.1:{self.ports['base']}/health"),
+            # 工作流在后台注册，就绪后才能调用
+            (self.services[2], f"http://127.0.0.1:{self.ports['server']}/health/ready"),
+        ]
+        deadline = time.monotonic() + READY_TIMEOUT
+        async with aiohttp.ClientSession() as session:
+            for service, url in checks:
+                while True:
+                    self._check_alive(service, deadline)
+                    try:
+                        async with session.get(url) as response:
+                            if response.status == 200:
+                                break
+                    except aiohttp.ClientError:
+                        pass
+                    await asyncio.sleep(0.2)
+
+        expected = {item.workflow for item in self.scenario.workflows}
+        while True:
+            self._check_alive(self.services[2], deadline)
+            try:
+                async with sse_client(self.sse_url) as (read, write):
+                    async with ClientSession(read, write) as session:
+                        await session.initialize()
+                        tools = {tool.name for tool in (await session.list_tools()).tools}
+                missing = expected - tools
+                if not missing:
+                    return
+                raise SystemExit(f"mcp-server did not register workflows {sorted(missing)}, see {self.services[2].log_path}")
+            except (OSError, aiohttp.ClientError, asyncio.TimeoutError):
+                await asyncio.sleep(0.5)
+            except Exception as e:
+                # sse_client 连接失败时抛出的是 ExceptionGroup
+                if "Connect" not in repr(e):
+                    raise
+                await asyncio.sleep(0.5)
+
+    def _check_alive(self, service: Service, deadline: float):
+        if not service.alive():
+            raise SystemExit(f"{service.name} exited during startup:\n{service.log_tail()}")
+        if time.monotonic() > deadline:
+            raise SystemExit(f"{service.name} not ready after {READY_TIMEOUT}s:\n{service.log_tail()}")
+
+    async def upload_sample_image(self):
+        form = aiohttp.FormData()
+        form.add_field("file", sample_png(), filename="bench_input.png", content_type="image/png")
+        async with aiohttp.ClientSession() as session:
+            async with session.post(f"http://127.0.0.1:{self.ports['base']}/upload", data=form) as response:
+                response.raise_for_status()
+                self.image_url = (await response.json())["url"]
+
+    def render_params(self, params: Dict[str, Any], client: int, request: int) -> Dict[str, Any]:
+        rendered = {}
+        for key, value in params.items():
+            if isinstance(value, str):
+                value = value.replace("{image}", self.image_url).replace("{client}", str(client)).replace("{request}", f"{client}-{request}")
+            rendered[key] = value
+        return rendered
+
+    async def call(self, session: ClientSession, item: WorkloadItem, client: int, request: int) -> Dict[str, Any]:
+        arguments = self.render_params(item.params, client, request)
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(session.call_tool(item.workflow, arguments), self.call_timeout)
+            text = "".join(getattr(content, "text", "") for content in result.content)
+            if result.isError:
+                outcome = "error"
+            elif text.startswith("Generated successfully"):
+                outcome = "ok"
+            elif text.startswith("ComfyUI is busy"):
+                outcome = "rejected"
+            else:
+                outcome = "error"
+        except asyncio.TimeoutError:
+            outcome, text = "error", f"timeout after {self.call_timeout}s"
+        except Exception as e:
+            outcome, text = "error", f"{type(e).__name__}: {e}"
+        return {"workflow": item.workflow, "outcome": outcome, "latency": time.perf_counter() - started, "message": text[:300]}
+
+    async def run_client(self, client: int) -> List[Dict[str, Any]]:
+        rng = random.Random(self.scenario.seed + client)
+        items = self.scenario.workflows
+        weights = [item.weight for item in items]
+        records = []
+        async with sse_client(self.sse_url, sse_read_timeout=self.call_timeout + 60) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                for request in range(self.scenario.requests_per_client):
+                    item = rng.choices(items, weights)[0]
+                    records.append(await self.call(session, item, client, request))
+                    if self.scenario.think_time:
+                        await asyncio.sleep(self.scenario.think_time)
+        return records
+
+    async def warmup(self):
+        if self.scenario.warmup <= 0:
+            return
+        async with sse_client(self.sse_url) as (read, write):
+            async with ClientSession(read, write) as session:
+                await session.initialize()
+                for item in self.scenario.workflows:
+                    for request in range(self.scenario.warmup):
+                        record = await self.call(session, item, -1, request)
+                        if record["outcome"] != "ok":
+                            print(f"  warmup {item.workflow}: {record['outcome']} {record['message']}")
+        async with aiohttp.ClientSession() as session:
+            await session.post(f"http://127.0.0.1:{self.ports['comfyui']}/fake/reset")
+
+    async def sample_memory(self, stop: asyncio.Event):
+        while not stop.is_set():
+            for service in self.services:
+                rss = service.rss()
+                if rss:
+                    service.rss_samples.append(rss)
+            try:
+                await asyncio.wait_for(stop.wait(), RSS_SAMPLE_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def fetch_comfyui_stats(self) -> Dict[str, Any]:
+        try:
+            async with aiohttp.ClientSession() as session:
+                async with session.get(f"http://127.0.0.1:{self.ports['comfyui']}/fake/stats") as response:
+                    return await response.json()
+        except aiohttp.ClientError:
+            return {}
+
+    async def measure(self) -> Tuple[List[Dict[str, Any]], float, float, float]:
+        warmup_started = time.time()
+        await self.warmup()
+        stop = asyncio.Event()
+        sampler = asyncio.create_task(self.sample_memory(stop))
+        started = time.time()
+        results = await asyncio.gather(*(self.run_client(client) for client in range(self.scenario.clients)))
+        duration = time.time() - started
+        stop.set()
+        await sampler
+        return [record for records in results for record in records], warmup_started, started, duration
+
+    def run(self) -> Dict[str, Any]:
+        config_path = self.prepare()
+        print(f"Run directory: {self.run_dir}")
+        try:
+            self.start_services(config_path)
+
+            async def session():
+                await self.wait_ready()
+                await self.upload_sample_image()
+                measured = await self.measure()
+                return measured, await self.fetch_comfyui_stats()
+
+            (records, warmup_started, started, duration), comfyui_stats = asyncio.run(session())
+        finally:
+            for service in reversed(self.services):
+                service.stop()
+        report = self.build_report(records, warmup_started, started, duration, comfyui_stats)
+        if self.keep_run_dir:
+            print(f"Run directory kept: {self.run_dir}")
+        else:
+            shutil.rmtree(self.run_dir, ignore_errors=True)
+        return report
+
+    def load_phases(self, since: float, until: Optional[float]) -> Dict[str, Dict[str, float]]:
+        """从 span 文件中汇总 [since, until) 内开始的各阶段耗时"""
+        durations: Dict[str, List[float]] = {phase: [] for phase in PHASE_SPANS}
+        span_phase = {span: phase for phase, span in PHASE_SPANS.items()}
+        if not os.path.exists(self.trace_file):
+            return {}
+        with open(self.trace_file, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    span = json.loads(line)
+                except ValueError:
+                    continue
+                phase = span_phase.get(span.get("name"))
+                if not phase:
+                    continue
+                start = datetime.fromisoformat(span["start_time"]).timestamp()
+                end = datetime.fromisoformat(span["end_time"]).timestamp()
+                if start < since or (until is not None and start >= until):
+                    continue
+                durations[phase].append(end - start)
+        return {phase: summarize(values) for phase, values in durations.items() if values}
+
+    def build_report(self, records: List[Dict[str, Any]], warmup_started: float, started: float, duration: float, comfyui_stats: Dict[str, Any]) -> Dict[str, Any]:
+        outcomes = {"ok": 0, "rejected": 0, "error": 0}
+        for record in records:
+            outcomes[record["outcome"]] += 1
+        by_workflow = {}
+        for item in self.scenario.workflows:
+            workflow_records = [record for record in records if record["workflow"] == item.workflow]
+            by_workflow[item.workflow] = {
+                "requests": len(workflow_records),
+                "ok": sum(1 for record in workflow_records if record["outcome"] == "ok"),
+                "latency": summarize([record["latency"] for record in workflow_records if record["outcome"] == "ok"]),
+            }
+        if not os.path.exists(self.trace_file):
+            print("No spans were written, install the otel extra of mcp-server to get phase timings (uv sync --extra otel)")
+        return {
+            "meta": {
+                "scenario": self.scenario.model_dump(mode="json"),
+                "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                **git_info(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpu_count": os.cpu_count(),
+            },
+            "summary": {
+                "requests": len(records),
+                **outcomes,
+                "error_rate": round(outcomes["error"] / len(records), 4) if records else 0,
+                "duration": round(duration, 3),
+                "throughput": round(outcomes["ok"] / duration, 4) if duration else 0,
+                "latency": summarize([record["latency"] for record in records if record["outcome"] == "ok"]),
+            },
+            "by_workflow": by_workflow,
+            "phases": self.load_phases(started, None),
+            "warmup_phases": self.load_phases(warmup_started, started),
+            "memory": {service.name: service.memory_stats() for service in self.services},
+            "comfyui": comfyui_stats,
+            "errors": [record["message"] for record in records if record["outcome"] != "ok"][:20],
+        }
+
+
+def git_info() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SERVER_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=SERVER_DIR, capture_output=True, text=True).stdout.strip())
+        return {"commit": commit, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def lookup(report: Dict[str, Any], path: str) -> Optional[float]:
+    value: Any = report
+    for key in path.split("."):
+        if not isinstance(value, dict) or key not in value:
+            return None
+        value = value[key]
+    return value if isinstance(value, (int, float)) else None
+
+
+def print_report(report: Dict[str, Any]):
+    summary = report["summary"]
+    latency = summary["latency"]
+    print(f"\nScenario {report['meta']['scenario']['name']} @ {report['meta']['commit']}{' (dirty)' if report['meta']['dirty'] else ''}")
+    print(f"  {summary['requests']} requests in {summary['duration']:.1f}s: {summary['ok']} ok, {summary['rejected']} rejected, {summary['error']} errors")
+    print(f"  throughput {summary['throughput']:.2f} req/s")
+    if latency.get("count"):
+        print(f"  latency    p50 {latency['p50']:.3f}s  p95 {latency['p95']:.3f}s  p99 {latency['p99']:.3f}s  max {latency['max']:.3f}s")
+    for name, stats in report["by_workflow"].items():
+        if stats["latency"].get("count"):
+            print(f"  {name:<32} {stats['ok']:>4}/{stats['requests']:<4} p50 {stats['latency']['p50']:.3f}s  p95 {stats['latency']['p95']:.3f}s")
+    if report["phases"]:
+        print("\n  phase           count      p50      p95      p99")
+        for phase, stats in report["phases"].items():
+            print(f"  {phase:<14} {stats['count']:>6} {stats['p50']:>8.4f} {stats['p95']:>8.4f} {stats['p99']:>8.4f}")
+    print("\n  memory (RSS)")
+    for name, stats in report["memory"].items():
+        if stats:
+            print(f"  {name:<14} peak {stats['peak_mb']:>8.1f} MB  mean {stats['mean_mb']:>8.1f} MB")
+    for message in report["errors"][:5]:
+        print(f"  ! {message}")
+
+
+def compare_metrics(report: Dict[str, Any]) -> List[Tuple[str, bool]]:
+    metrics = list(COMPARE_METRICS)
+    for phase in report.get("phases", {}):
+        metrics += [(f"phases.{phase}.p50", False), (f"phases.{phase}.p95", False)]
+    for name in report.get("memory", {}):
+        metrics.append((f"memory.{name}.peak_mb", False))
+    return metrics
+
+
+def print_comparison(report: Dict[str, Any], baseline: Dict[str, Any]):
+    print(f"\nCompared with {baseline['meta'].get('commit')} ({baseline['meta'].get('timestamp')})")
+    if baseline["meta"]["scenario"] != report["meta"]["scenario"]:
+        print("  warning: the scenarios differ, deltas are not comparable")
+    print(f"  {'metric':<32} {'baseline':>10} {'current':>10} {'delta':>8}")
+    for path, higher_is_better in compare_metrics(report):
+        old, new = lookup(baseline, path), lookup(report, path)
+        if old is None or new is None:
+            continue
+        delta = (new - old) / old * 100 if old else 0.0
+        better = (delta > 0) == higher_is_better
+        mark = "" if abs(delta) < 5 else (" +" if better else " -")
+        print(f"  {path:<32} {old:>10.4f} {new:>10.4f} {delta:>7.1f}%{mark}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", default="smoke", help=f"built-in scenario ({', '.join(SCENARIOS)}) or path of a YAML scenario file")
+    parser.add_argument("--clients", type=int, help="override the number of concurrent MCP clients")
+    parser.add_argument("--requests", type=int, help="override the number of calls per client")
+    parser.add_argument("--executor", choices=["http", "websocket"], help="override the ComfyUI executor of mcp-server")
+    parser.add_argument("--base-python", help="python interpreter of mcp-base, defaults to 'uv run python' in mcp-base")
+    parser.add_argument("--timeout", type=float, default=600, help="seconds after which a single tool call counts as failed")
+    parser.add_argument("--output", help="result JSON path, defaults to benchmarks/results/<scenario>-<commit>-<time>.json")
+    parser.add_argument("--compare", help="result JSON of a previous run to compare with")
+    parser.add_argument("--keep-run-dir", action="store_true", help="keep configuration, logs and spans of the run")
+    args = parser.parse_args()
+
+    scenario = load_scenario(args.scenario)
+    if args.clients:
+        scenario.clients = args.clients
+    if args.requests:
+        scenario.requests_per_client = args.requests
+    if args.executor:
+        scenario.executor = args.executor
+    base_cmd = [args.base_python, "main.py"] if args.base_python else ["uv", "run", "python", "main.py"]
+
+    report = E2EBenchmark(scenario, base_cmd, args.timeout, args.keep_run_dir).run()
+    print_report(report)
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        output = os.path.join(RESULTS_DIR, f"{scenario.name}-{report['meta']['commit'] or 'nogit'}-{stamp}.json")
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"\nResult saved to {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            print_comparison(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+"""
+JSON 编解码基准测试
+
+对比 /prompt 请求体序列化与 WebSocket 消息处理在不同实现下的耗时：
+- 序列化：标准库 json.dumps（深拷贝后整体序列化） / json_util.dumps / 模板预序列化片段拼接
+- WebSocket：逐条完整解析 / 先按 prompt_id 子串预过滤再解析
+
+用法（在 mcp-server 目录下）：
+    uv run python benchmarks/bench_json_codec.py [--workflow workflows/i2v_by_wan2_2.json] [--number 2000]
+"""
+
+import os
+import sys
+import copy
+import json
+import uuid
+import random
+import timeit
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import json_util  # noqa: E402
+from comfyui.workflow_parser import WorkflowParser  # noqa: E402
+from comfyui.workflow_template import WorkflowTemplate, dumps_prompt  # noqa: E402
+
+
+def build_ws_stream(prompt_id: str, size: int, target_ratio: float) -> list:
+    """构造模拟的WebSocket消息流，大部分为其他客户端任务的进度与队列状态广播"""
+    messages = []
+    other_ids = [str(uuid.uuid4()) for _ in range(8)]
+    for i in range(size):
+        if random.random() < target_ratio:
+            pid = prompt_id
+        else:
+            pid = random.choice(other_ids)
+        kind = i % 3
+        if kind == 0:
+            message = {"type": "progress", "data": {"value": i % 20, "max": 20, "prompt_id": pid, "node": "3"}}
+        elif kind == 1:
+            message = {"type": "status", "data": {"status": {"exec_info": {"queue_remaining": i % 7}}}}
+        else:
+            message = {"type": "executing", "data": {"node": str(i % 30), "display_node": str(i % 30), "prompt_id": pid}}
+        messages.append(json.dumps(message))
+    return messages
+
+
+def parse_all(messages: list, prompt_id: str, loads) -> int:
+    count = 0
+    for message_str in messages:
+        message = loads(message_str)
+        if message.get("data", {}).get("prompt_id") == prompt_id:
+            count += 1
+    return count
+
+
+def parse_prefiltered(messages: list, prompt_id: str, loads) -> int:
+    count = 0
+    for message_str in messages:
+        if prompt_id not in message_str:
+            continue
+        message = loads(message_str)
+        if message.get("data", {}).get("prompt_id") == prompt_id:
+            count += 1
+    return count
+
+
+def report(name: str, seconds: float, number: int, baseline: float = None):
+    per_call = seconds / number * 1e6
+    speedup = f"  x{baseline / seconds:.1f}" if baseline else ""
+    print(f"  {name:<42} {per_call:>10.1f} us{speedup}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workflow", default="workflows/i2v_by_wan2_2.json", help="workflow file used for prompt serialization")
+    parser.add_argument("--number", type=int, default=2000, help="iterations per case")
+    parser.add_argument("--ws-messages", type=int, default=1000, help="messages per simulated WebSocket stream")
+    parser.add_argument("--target-ratio", type=float, default=0.1, help="share of messages belonging to the awaited prompt")
+    args = parser.parse_args()
+
+    print(f"JSON backend: {json_util.JSON_BACKEND}")
+
+    with open(args.workflow, "r", encoding="utf-8") as f:
+        workflow_data = json.load(f)
+    metadata = WorkflowParser().parse_workflow(workflow_data, os.path.splitext(os.path.basename(args.workflow))[0])
+    template = WorkflowTemplate(workflow_data, metadata)
+    client_id = str(uuid.uuid4())
+
+    def instantiate():
+        graph = template.instantiate()
+        for mapping in metadata.mapping_info.param_mappings:
+            if mapping.node_id in graph:
+                graph[mapping.node_id]["inputs"][mapping.input_field] = "value"
+        return graph
+
+    print(f"\nPrompt serialization ({args.workflow}, {len(workflow_data)} nodes)")
+    baseline = timeit.timeit(lambda: json.dumps({"prompt": copy.deepcopy(workflow_data), "client_id": client_id}), number=args.number)
+    report("json.dumps + deepcopy", baseline, args.number)
+    seconds = timeit.timeit(lambda: json_util.dumps({"prompt": copy.deepcopy(workflow_data), "client_id": client_id}), number=args.number)
+    report("json_util.dumps + deepcopy", seconds, args.number, baseline)
+    seconds = timeit.timeit(lambda: dumps_prompt({"prompt": instantiate(), "client_id": client_id}), number=args.number)
+    report("template instantiate + dumps_prompt", seconds, args.number, baseline)
+
+    prompt_id = str(uuid.uuid4())
+    messages = build_ws_stream(prompt_id, args.ws_messages, args.target_ratio)
+    number = max(1, args.number // 20)
+    print(f"\nWebSocket stream ({len(messages)} messages, {args.target_ratio:.0%} for the awaited prompt)")
+    baseline = timeit.timeit(lambda: parse_all(messages, prompt_id, json.loads), number=number)
+    report("json.loads every message", baseline, number)
+    seconds = timeit.timeit(lambda: parse_all(messages, prompt_id, json_util.loads), number=number)
+    report("json_util.loads every message", seconds, number, baseline)
+    seconds = timeit.timeit(lambda: parse_prefiltered(messages, prompt_id, json_util.loads), number=number)
+    report("prompt_id prefilter + json_util.loads", seconds, number, baseline)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+"""
+热点函数微基准测试
+
+覆盖每次工具调用都会经过的纯计算路径：
+- WorkflowParser.parse_workflow：由自带工作流平铺得到的 1k~10k 节点大图
+- _apply_params_to_workflow：大图上的模板实例化与参数应用（不含媒体上传）
+- _split_media_by_suffix / _build_result_from_collected_outputs：包含数百张图片的输出
+- ExecuteResult.to_llm_result：数百个媒体地址的结果
+- transfer_result_files：images 与 images_by_var 中重复地址的去重，下载与上传替换为内存实现，只统计调用次数
+
+输出格式与 pytest-benchmark 类似（min/median/mean/stddev/rounds），结果可保存为基线并与之后的提交对比，
+超过阈值的退化会使进程以非零状态退出，便于在 CI 中跟踪。
+
+用法（在 mcp-server 目录下）：
+    uv run python benchmarks/bench_micro.py --save
+    uv run python benchmarks/bench_micro.py -k parse --compare benchmarks/results/micro-1f7183f.json --fail-threshold 15
+"""
+
+import os
+import sys
+import copy
+import json
+import time
+import asyncio
+import logging
+import argparse
+import platform
+import statistics
+import subprocess
+import contextlib
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import logger  # noqa: E402
+from comfyui import base_executor  # noqa: E402
+from comfyui.models import ExecuteResult  # noqa: E402
+from comfyui.http_executor import HttpExecutor  # noqa: E402
+from comfyui.websocket_executor import WebSocketExecutor  # noqa: E402
+from comfyui.workflow_parser import WorkflowParser  # noqa: E402
+from comfyui.workflow_template import WorkflowTemplate  # noqa: E402
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+SERVER_DIR = os.path.dirname(BENCHMARK_DIR)
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, "results")
+COMFYUI_URL = "http://127.0.0.1:8188"
+
+
+class Case:
+    """一个基准用例，is_async 为 True 时 func 返回协程"""
+
+    def __init__(self, name: str, func: Callable[[], Any], group: str, is_async: bool = False):
+        self.name = name
+        self.func = func
+        self.group = group
+        self.is_async = is_async
+
+
+def tile_workflow(workflow: Dict[str, Any], node_count: int) -> Dict[str, Any]:
+    """平铺工作流直到达到指定节点数，每份副本重新编号节点并给参数与输出变量名加上副本序号"""
+    tiled = {}
+    copies = (node_count + len(workflow) - 1) // len(workflow)
+    for index in range(copies):
+        offset = index * 100_000
+        for node_id, node in workflow.items():
+            node = copy.deepcopy(node)
+            for name, value in node.get("inputs", {}).items():
+                if isinstance(value, list) and len(value) == 2 and isinstance(value[0], str) and value[0] in workflow:
+                    node["inputs"][name] = [str(int(value[0]) + offset), value[1]]
+            title = node.get("_meta", {}).get("title", "")
+            if index and title == "MCP":
+                # 一个工作流只允许一个MCP描述节点
+                node["_meta"]["title"] = "Note"
+            elif index and title.startswith("$"):
+                name, _, rest = title[1:].partition(".")
+                if name == "output":
+                    node["_meta"]["title"] = f"$output.{rest}_{index}"
+                else:
+                    node["_meta"]["title"] = f"${name}_{index}.{rest}"
+            tiled[str(int(node_id) + offset)] = node
+            if len(tiled) >= node_count:
+                return tiled
+    return tiled
+
+
+def build_node_outputs(node_count: int, files_per_node: int) -> Dict[str, Any]:
+    """构造 ComfyUI 的输出，混合图片、视频、音频与文本"""
+    outputs = {}
+    for node in range(node_count):
+        kind = node % 10
+        if kind < 7:
+            outputs[str(node)] = {"images": [{"filename": f"ComfyUI_{node:05d}_{i:05d}_.png", "subfolder": "bench", "type": "output"} for i in range(files_per_node)]}
+        elif kind < 8:
+            outputs[str(node)] = {"gifs": [{"filename": f"ComfyUI_{node:05d}_{i:05d}.mp4", "subfolder": "", "type": "output", "format": "video/h264-mp4"} for i in range(files_per_node)]}
+        elif kind < 9:
+            outputs[str(node)] = {"audio": [{"filename": f"ComfyUI_{node:05d}_{i:05d}_.flac", "subfolder": "", "type": "output"} for i in range(files_per_node)]}
+        else:
+            outputs[str(node)] = {"text": [f"caption {node} {i}" for i in range(files_per_node)]}
+    return outputs
+
+
+@contextlib.contextmanager
+def in_memory_transfer(temp_file: str, counters: Dict[str, int]):
+    """把转存用到的下载与上传替换为内存实现，只保留去重、缓存与结果重建的开销"""
+
+    @contextlib.contextmanager
+    def download_files(urls, **kwargs):
+        counters["downloads"] += len(urls)
+        yield [temp_file] * len(urls)
+
+    def upload(path, filename=None):
+        counters["uploads"] += 1
+        return f"http://127.0.0.1:9001/files/{counters['uploads']}.png"
+
+    saved = base_executor.download_files, base_executor.upload
+    base_executor.download_files, base_executor.upload = download_files, upload
+    try:
+        yield
+    finally:
+        base_executor.download_files, base_executor.upload = saved
+
+
+def build_cases(workflow_file: str, sizes: List[int], media_count: int, temp_file: str, counters: Dict[str, int]) -> List[Case]:
+    with open(workflow_file, "r", encoding="utf-8") as f:
+        workflow = json.load(f)
+    parser = WorkflowParser()
+    http_executor = HttpExecutor(COMFYUI_URL)
+    ws_executor = WebSocketExecutor(COMFYUI_URL)
+    cases = []
+
+    graphs = {size: tile_workflow(workflow, size) for size in sizes}
+    for size, graph in graphs.items():
+        cases.append(Case(f"parse_workflow[{size}]", lambda graph=graph: parser.parse_workflow(graph, "bench"), "parse"))
+    for size, graph in graphs.items():
+        metadata = parser.parse_workflow(graph, "bench")
+        template = WorkflowTemplate(graph, metadata)
+        params = {
+            name: f"value of {name}" if param.type == "str" else 512
+            for name, param in metadata.params.items()
+            if param.type in ("str", "int")
+        }
+        cases.append(Case(
+            f"apply_params[{size}, {len(metadata.mapping_info.param_mappings)} mappings]",
+            lambda template=template, metadata=metadata, params=params: http_executor._apply_params_to_workflow(template, metadata, params),
+            "apply_params",
+            is_async=True,
+        ))
+
+    node_output = build_node_outputs(1, media_count)["0"]
+    collected = build_node_outputs(max(1, media_count // 10), 10)
+    output_id_2_var = {node_id: f"var_{node_id}" for node_id in list(collected)[::2]}
+    cases.append(Case(f"split_media_by_suffix[{media_count}]", lambda: http_executor._split_media_by_suffix(node_output, COMFYUI_URL), "result"))
+    cases.append(Case(
+        f"build_result_from_collected_outputs[{len(collected)}x10]",
+        lambda: ws_executor._build_result_from_collected_outputs(collected, "bench", output_id_2_var),
+        "result",
+    ))
+
+    result = ws_executor._build_result_from_collected_outputs(collected, "bench", output_id_2_var)
+    cases.append(Case(f"to_llm_result[{len(result.images) + len(result.videos) + len(result.audios)} media]", result.to_llm_result, "result"))
+
+    # images 中每个地址出现两次，images_by_var 再引用一遍，与 ComfyUI 重复返回同一文件的情况一致
+    images = [f"{COMFYUI_URL}/view?filename=ComfyUI_{i:05d}_.png&type=output" for i in range(media_count // 2)]
+    duplicated = ExecuteResult(status="completed", images=images + images, images_by_var={"image": images})
+
+    async def transfer():
+        with in_memory_transfer(temp_file, counters):
+            return await http_executor.transfer_result_files(duplicated)
+
+    cases.append(Case(f"transfer_result_files_dedup[{len(duplicated.images)} urls, {len(images)} unique]", transfer, "transfer", is_async=True))
+    return cases
+
+
+def run_case(case: Case, min_time: float, min_rounds: int, max_rounds: int) -> Dict[str, float]:
+    """重复执行直到累计耗时达到 min_time（至少 min_rounds 轮），返回每轮耗时的统计"""
+    def done(timings: List[float]) -> bool:
+        return len(timings) >= max_rounds or (len(timings) >= min_rounds and sum(timings) >= min_time)
+
+    async def measure_async() -> List[float]:
+        # 首次调用用于预热，不计入统计
+        await case.func()
+        timings = []
+        while not done(timings):
+            started = time.perf_counter()
+            await case.func()
+            timings.append(time.perf_counter() - started)
+        return timings
+
+    if case.is_async:
+        timings = asyncio.run(measure_async())
+    else:
+        case.func()
+        timings = []
+        while not done(timings):
+            started = time.perf_counter()
+            case.func()
+            timings.append(time.perf_counter() - started)
+    return {
+        "rounds": len(timings),
+        "min": min(timings),
+        "max": max(timings),
+        "mean": statistics.mean(timings),
+        "median": statistics.median(timings),
+        "stddev": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+    }
+
+
+def format_time(seconds: float) -> str:
+    if seconds >= 1:
+        return f"{seconds:.3f}s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.3f}ms"
+    return f"{seconds * 1e6:.1f}us"
+
+
+def git_info() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SERVER_DIR, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=SERVER_DIR, capture_output=True, text=True).stdout.strip())
+        return {"commit": commit, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Any], threshold: Optional[float]) -> List[str]:
+    """按 median 对比，返回超过阈值的退化用例"""
+    print(f"\nCompared with {baseline['meta'].get('commit')} ({baseline['meta'].get('timestamp')})")
+    regressions = []
+    for name, stats in results.items():
+        old = baseline["benchmarks"].get(name)
+        if not old:
+            print(f"  {name:<58} (new)")
+            continue
+        delta = (stats["median"] - old["median"]) / old["median"] * 100
+        mark = ""
+        if threshold is not None and delta > threshold:
+            mark = "  REGRESSION"
+            regressions.append(name)
+        print(f"  {name:<58} {format_time(old['median']):>10} -> {format_time(stats['median']):>10} {delta:>+7.1f}%{mark}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-k", dest="keyword", help="only run cases whose name contains this substring")
+    parser.add_argument("--workflow", default="workflows/t2i_by_local_flux.json", help="workflow tiled into the large synthetic graphs")
+    parser.add_argument("--sizes", default="1000,5000,10000", help="node counts of the synthetic graphs, comma separated")
+    parser.add_argument("--media", type=int, default=500, help="media files in the result building cases")
+    parser.add_argument("--min-time", type=float, default=1.0, help="minimum measured seconds per case")
+    parser.add_argument("--min-rounds", type=int, default=5)
+    parser.add_argument("--max-rounds", type=int, default=100_000)
+    parser.add_argument("--save", nargs="?", const="", help="save the results as a baseline, defaults to benchmarks/results/micro-<commit>.json")
+    parser.add_argument("--compare", help="baseline JSON to compare medians with")
+    parser.add_argument("--fail-threshold", type=float, help="exit with status 1 when a median regresses by more than this percentage")
+    args = parser.parse_args()
+
+    # 执行器的逐次调用日志会主导耗时
+    logger.setLevel(logging.WARNING)
+    counters = {"downloads": 0, "uploads": 0}
+    temp_file = os.path.join(RESULTS_DIR, ".transfer.bin")
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    with open(temp_file, "wb") as f:
+        f.write(b"\0" * 1024)
+
+    try:
+        sizes = [int(size) for size in args.sizes.split(",") if size]
+        cases = build_cases(args.workflow, sizes, args.media, temp_file, counters)
+        if args.keyword:
+            cases = [case for case in cases if args.keyword in case.name]
+
+        results = {}
+        print(f"{'name':<58} {'min':>10} {'median':>10} {'mean':>10} {'stddev':>10} {'rounds':>7}")
+        group = None
+        for case in cases:
+            if case.group != group:
+                group = case.group
+                print(f"-- {group}")
+            stats = run_case(case, args.min_time, args.min_rounds, args.max_rounds)
+            results[case.name] = stats
+            print(f"{case.name:<58} {format_time(stats['min']):>10} {format_time(stats['median']):>10} "
+                  f"{format_time(stats['mean']):>10} {format_time(stats['stddev']):>10} {stats['rounds']:>7}")
+        if counters["uploads"]:
+            # 每个用例额外执行了一次预热
+            calls = next(stats["rounds"] for name, stats in results.items() if name.startswith("transfer_result_files")) + 1
+            print(f"\ntransfer dedup: {counters['downloads'] / calls:.0f} downloads and {counters['uploads'] / calls:.0f} uploads per call")
+    finally:
+        os.remove(temp_file)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            **git_info(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "sizes": sizes,
+            "media": args.media,
+        },
+        "benchmarks": results,
+    }
+    if args.save is not None:
+        output = args.save or os.path.join(RESULTS_DIR, f"micro-{report['meta']['commit'] or 'nogit'}.json")
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline saved to {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.fail_threshold)
+        if regressions:
+            print(f"\n{len(regressions)} case(s) regressed by more than {args.fail_threshold}%")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
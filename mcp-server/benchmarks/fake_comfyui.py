@@ -0,0 +1,602 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+"""
+模拟 ComfyUI 服务
+
+不需要GPU即可端到端运行 HttpExecutor 与 WebSocketExecutor，用于压测与延迟基准测试。
+实现了执行器用到的接口：/prompt、/history、/view、/upload/image、/queue、/interrupt 与 /ws 事件流，
+并可配置：
+- 按 class_type 的节点执行耗时（KSampler 等耗时节点会发送 progress 事件）
+- 各类输出（图片 / 视频 / 音频）的文件大小与每个输出节点的文件数量
+- 队列容量（超出时 /prompt 返回 503）
+- 故障注入：按概率执行失败、指定 class_type 必定失败、按概率拒绝提交
+- 与 ComfyUI 一致的节点缓存：输入未变化的节点记为 execution_cached，不再耗时
+
+统计信息可通过 GET /fake/stats 查询，POST /fake/reset 清空。
+
+用法（在 mcp-server 目录下）：
+    uv run python benchmarks/fake_comfyui.py --port 8188 --delay KSampler=2 --delay VHS_VideoCombine=1
+也可以在基准测试中直接启动：
+    simulator = FakeComfyUI(SimulatorConfig(default_delay=0.01))
+    await simulator.start("127.0.0.1", 8188)
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import hashlib
+import argparse
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from aiohttp import web, WSMsgType
+from pydantic import BaseModel, Field
+
+# 输出节点类型 -> (输出字段, 输出类别, 文件扩展名)
+OUTPUT_NODE_TYPES: Dict[str, Tuple[str, str, str]] = {
+    "SaveImage": ("images", "image", ".png"),
+    "PreviewImage": ("images", "image", ".png"),
+    "SaveAnimatedWEBP": ("images", "image", ".webp"),
+    "SaveVideo": ("images", "video", ".mp4"),
+    "VHS_VideoCombine": ("gifs", "video", ".mp4"),
+    "VHS_SaveVideo": ("gifs", "video", ".mp4"),
+    "SaveAudio": ("audio", "audio", ".flac"),
+    "SaveAudioMP3": ("audio", "audio", ".mp3"),
+    "SaveAudioOpus": ("audio", "audio", ".opus"),
+    "PreviewAudio": ("audio", "audio", ".flac"),
+    "VHS_SaveAudio": ("audio", "audio", ".mp3"),
+}
+# 文本输出节点类型
+TEXT_NODE_TYPES = {"easy showAnything", "ShowText|pysssss", "PreviewAny"}
+
+CONTENT_TYPES = {
+    ".png": "image/png",
+    ".webp": "image/webp",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".mp4": "video/mp4",
+    ".flac": "audio/flac",
+    ".mp3": "audio/mpeg",
+    ".opus": "audio/opus",
+}
+# 二进制预览帧事件类型，与 ComfyUI 一致
+BINARY_EVENT_PREVIEW_IMAGE = 1
+
+
+class SimulatorConfig(BaseModel):
+    """模拟器配置"""
+    default_delay: float = Field(0.0, description="Seconds spent on nodes without a configured delay")
+    delays: Dict[str, float] = Field(default_factory=dict, description="Seconds spent per node, by class_type")
+    jitter: float = Field(0.0, description="Random relative deviation of node delays, e.g. 0.1 for +-10%")
+    progress_steps: int = Field(10, description="Progress events sent by nodes with a configured delay")
+    output_sizes: Dict[str, int] = Field(
+        default_factory=lambda: {"image": 200_000, "video": 2_000_000, "audio": 500_000},
+        description="Size in bytes of generated files, by output kind",
+    )
+    files_per_output: int = Field(1, description="Files produced by each output node")
+    queue_capacity: int = Field(0, description="Maximum number of pending prompts, 0 means unlimited")
+    workers: int = Field(1, description="Prompts executed at the same time (ComfyUI executes one)")
+    failure_rate: float = Field(0.0, description="Probability that a prompt fails during execution")
+    fail_classes: Set[str] = Field(default_factory=set, description="class_types that always fail when executed")
+    reject_rate: float = Field(0.0, description="Probability that /prompt rejects a prompt as invalid")
+    node_cache: bool = Field(True, description="Skip nodes whose inputs are unchanged since a previous prompt, like ComfyUI")
+    preview: bool = Field(False, description="Send binary preview frames with progress events")
+    seed: Optional[int] = Field(None, description="Seed of the random generator for reproducible runs")
+
+
+class _Prompt:
+    """队列中的一个任务"""
+
+    def __init__(self, number: int, prompt_id: str, prompt: Dict[str, Any], client_id: Optional[str], extra_data: Dict[str, Any]):
+        self.number = number
+        self.prompt_id = prompt_id
+        self.prompt = prompt
+        self.client_id = client_id
+        self.extra_data = extra_data
+        self.interrupted = False
+
+    def queue_item(self) -> List[Any]:
+        # 与 ComfyUI 队列项格式一致: [number, prompt_id, prompt, extra_data, outputs_to_execute]
+        return [self.number, self.prompt_id, self.prompt, self.extra_data, []]
+
+
+class _Interrupted(Exception):
+    pass
+
+
+class _ExecutionFailed(Exception):
+
+    def __init__(self, node_id: str, class_type: str, message: str):
+        super().__init__(message)
+        self.node_id = node_id
+        self.class_type = class_type
+
+
+class FakeComfyUI:
+    """模拟的 ComfyUI 服务"""
+
+    def __init__(self, config: Optional[SimulatorConfig] = None):
+        self.config = config or SimulatorConfig()
+        self.random = random.Random(self.config.seed)
+        self.pending: List[_Prompt] = []
+        self.running: Dict[str, _Prompt] = {}
+        self.history: Dict[str, Dict[str, Any]] = {}
+        # (type, subfolder, filename) -> 文件内容或生成文件的 (类别, 大小)
+        self.files: Dict[Tuple[str, str, str], Any] = {}
+        self.sockets: Dict[str, web.WebSocketResponse] = {}
+        self.node_cache: Set[str] = set()
+        self.stats: Dict[str, int] = {}
+        self._number = 0
+        self._queue_changed = asyncio.Event()
+        self._payloads: Dict[int, bytes] = {}
+        self._preview_frame: Optional[bytes] = None
+        self._workers: List[asyncio.Task] = []
+        self._runner: Optional[web.AppRunner] = None
+        self.app = self._create_app()
+
+    def _create_app(self) -> web.Application:
+        app = web.Application(client_max_size=1024 ** 3)
+        app.router.add_post("/prompt", self.handle_prompt)
+        app.router.add_get("/prompt", self.handle_prompt_info)
+        app.router.add_get("/history", self.handle_history)
+        app.router.add_get("/history/{prompt_id}", self.handle_history)
+        app.router.add_post("/history", self.handle_history_post)
+        app.router.add_get("/view", self.handle_view)
+        app.router.add_post("/upload/image", self.handle_upload)
+        app.router.add_get("/queue", self.handle_queue)
+        app.router.add_post("/queue", self.handle_queue_post)
+        app.router.add_post("/interrupt", self.handle_interrupt)
+        app.router.add_get("/ws", self.handle_ws)
+        app.router.add_get("/system_stats", self.handle_system_stats)
+        app.router.add_get("/fake/stats", self.handle_stats)
+        app.router.add_post("/fake/reset", self.handle_reset)
+        app.on_startup.append(self._start_workers)
+        app.on_cleanup.append(self._stop_workers)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8188):
+        """在当前事件循环中启动服务"""
+        self._runner = web.AppRunner(self.app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, host, port).start()
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def _count(self, name: str, value: int = 1):
+        self.stats[name] = self.stats.get(name, 0) + value
+
+    # ---------- 提交与队列 ----------
+
+    async def handle_prompt(self, request: web.Request) -> web.Response:
+        try:
+            body = await request.json()
+        except Exception:
+            return web.json_response({"error": {"type": "invalid_prompt", "message": "Invalid JSON"}, "node_errors": {}}, status=400)
+        prompt = body.get("prompt")
+        node_errors = self._validate(prompt)
+        if node_errors is None:
+            return web.json_response({"error": {"type": "invalid_prompt", "message": "Prompt must be a node dict"}, "node_errors": {}}, status=400)
+        if not node_errors and self.config.reject_rate > 0 and self.random.random() < self.config.reject_rate:
+            node_id = self.random.choice(list(prompt))
+            node_errors = {node_id: {"errors": [{"type": "injected_failure", "message": "Injected validation failure"}], "class_type": prompt[node_id].get("class_type")}}
+        if node_errors:
+            self._count("rejected")
+            return web.json_response({
+                "error": {"type": "prompt_outputs_failed_validation", "message": "Prompt outputs failed validation"},
+                "node_errors": node_errors,
+            }, status=400)
+        if self.config.queue_capacity > 0 and len(self.pending) >= self.config.queue_capacity:
+            self._count("queue_full")
+            return web.json_response({"error": {"type": "queue_full", "message": "Queue is full"}, "node_errors": {}}, status=503)
+
+        self._number += 1
+        item = _Prompt(self._number, body.get("prompt_id") or str(uuid.uuid4()), prompt, body.get("client_id"), body.get("extra_data") or {})
+        self.pending.append(item)
+        self._count("prompts")
+        self._queue_changed.set()
+        await self._broadcast_status()
+        return web.json_response({"prompt_id": item.prompt_id, "number": item.number, "node_errors": {}})
+
+    def _validate(self, prompt: Any) -> Optional[Dict[str, Any]]:
+        """检查节点结构与连线，返回节点错误，格式错误时返回 None"""
+        if not isinstance(prompt, dict) or not prompt:
+            return None
+        node_errors = {}
+        for node_id, node in prompt.items():
+            if not isinstance(node, dict) or "class_type" not in node:
+                node_errors[node_id] = {"errors": [{"type": "missing_class_type", "message": "Node has no class_type"}], "class_type": None}
+                continue
+            for name, value in (node.get("inputs") or {}).items():
+                if self._is_link(value) and str(value[0]) not in prompt:
+                    node_errors[node_id] = {
+                        "errors": [{"type": "missing_input_node", "message": f"Input {name} links to missing node {value[0]}"}],
+                        "class_type": node["class_type"],
+                    }
+        return node_errors
+
+    @staticmethod
+    def _is_link(value: Any) -> bool:
+        return isinstance(value, list) and len(value) == 2 and isinstance(value[0], (str, int)) and isinstance(value[1], int)
+
+    async def handle_prompt_info(self, request: web.Request) -> web.Response:
+        return web.json_response({"exec_info": {"queue_remaining": self._queue_remaining()}})
+
+    async def handle_queue(self, request: web.Request) -> web.Response:
+        return web.json_response({
+            "queue_running": [item.queue_item() for item in self.running.values()],
+            "queue_pending": [item.queue_item() for item in self.pending],
+        })
+
+    async def handle_queue_post(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        if body.get("clear"):
+            self._count("deleted", len(self.pending))
+            self.pending.clear()
+        for prompt_id in body.get("delete") or []:
+            before = len(self.pending)
+            self.pending = [item for item in self.pending if item.prompt_id != prompt_id]
+            self._count("deleted", before - len(self.pending))
+        await self._broadcast_status()
+        return web.Response(status=200)
+
+    async def handle_interrupt(self, request: web.Request) -> web.Response:
+        try:
+            body = await request.json()
+        except Exception:
+            body = {}
+        prompt_id = (body or {}).get("prompt_id")
+        for item in self.running.values():
+            # 与新版 ComfyUI 一致：指定 prompt_id 时只中断该任务
+            if prompt_id is None or item.prompt_id == prompt_id:
+                item.interrupted = True
+                self._count("interrupts")
+        return web.Response(status=200)
+
+    def _queue_remaining(self) -> int:
+        return len(self.pending) + len(self.running)
+
+    # ---------- 执行 ----------
+
+    async def _start_workers(self, app: web.Application):
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(max(1, self.config.workers))]
+
+    async def _stop_workers(self, app: web.Application):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        for ws in list(self.sockets.values()):
+            await ws.close()
+
+    async def _worker(self):
+        while True:
+            if not self.pending:
+                self._queue_changed.clear()
+                await self._queue_changed.wait()
+                continue
+            item = self.pending.pop(0)
+            self.running[item.prompt_id] = item
+            try:
+                await self._execute(item)
+            except Exception as e:
+                print(f"fake comfyui: execution of {item.prompt_id} crashed: {e}", file=sys.stderr)
+            finally:
+                self.running.pop(item.prompt_id, None)
+                await self._broadcast_status()
+
+    async def _execute(self, item: _Prompt):
+        prompt_id = item.prompt_id
+        messages: List[List[Any]] = []
+        outputs: Dict[str, Any] = {}
+
+        async def event(msg_type: str, data: Dict[str, Any], record: bool = False):
+            data = {**data, "prompt_id": prompt_id}
+            if record:
+                messages.append([msg_type, {**data, "timestamp": int(time.time() * 1000)}])
+            await self._send(item.client_id, msg_type, data)
+
+        await event("execution_start", {}, record=True)
+        signatures = self._signatures(item.prompt, prompt_id)
+        cached = [node_id for node_id in item.prompt if self.config.node_cache and signatures[node_id] in self.node_cache]
+        await event("execution_cached", {"nodes": cached}, record=True)
+
+        status_str = "success"
+        try:
+            if self.config.failure_rate > 0 and self.random.random() < self.config.failure_rate:
+                node_id = self.random.choice(list(item.prompt))
+                raise _ExecutionFailed(node_id, item.prompt[node_id]["class_type"], "Injected execution failure")
+            for node_id in self._execution_order(item.prompt):
+                node = item.prompt[node_id]
+                class_type = node["class_type"]
+                if node_id not in cached:
+                    await event("executing", {"node": node_id, "display_node": node_id})
+                    if class_type in self.config.fail_classes:
+                        raise _ExecutionFailed(node_id, class_type, f"Injected failure of {class_type}")
+                    await self._run_node(item, node_id, class_type, event)
+                output = self._node_output(prompt_id, node_id, node)
+                if output is not None:
+                    outputs[node_id] = output
+                    await event("executed", {"node": node_id, "display_node": node_id, "output": output})
+            self.node_cache.update(signatures.values())
+            await event("execution_success", {}, record=True)
+            self._count("completed")
+        except _Interrupted:
+            status_str = "error"
+            await event("execution_interrupted", {"node_id": None, "node_type": None, "executed": []}, record=True)
+            self._count("interrupted")
+        except _ExecutionFailed as e:
+            status_str = "error"
+            await event("execution_error", {
+                "node_id": e.node_id,
+                "node_type": e.class_type,
+                "exception_message": str(e),
+                "exception_type": "RuntimeError",
+                "traceback": [],
+                "executed": [],
+            }, record=True)
+            self._count("failed")
+
+        self.history[prompt_id] = {
+            "prompt": item.queue_item(),
+            "outputs": outputs if status_str == "success" else {},
+            "status": {"status_str": status_str, "completed": status_str == "success", "messages": messages},
+        }
+        # 与 ComfyUI 一致：任务结束时发送 node 为 None 的 executing 事件
+        await event("executing", {"node": None})
+
+    async def _run_node(self, item: _Prompt, node_id: str, class_type: str, event):
+        delay = self.config.delays.get(class_type, self.config.default_delay)
+        if self.config.jitter > 0:
+            delay *= 1 + self.random.uniform(-self.config.jitter, self.config.jitter)
+        if delay <= 0:
+            return
+        steps = self.config.progress_steps if class_type in self.config.delays and self.config.progress_steps > 0 else 1
+        for step in range(1, steps + 1):
+            await asyncio.sleep(delay / steps)
+            if item.interrupted:
+                raise _Interrupted()
+            if steps > 1:
+                await event("progress", {"value": step, "max": steps, "node": node_id})
+                if self.config.preview:
+                    await self._send_bytes(item.client_id, self._get_preview_frame())
+
+    def _execution_order(self, prompt: Dict[str, Any]) -> List[str]:
+        """按连线拓扑排序，上游节点先执行"""
+        order: List[str] = []
+        visited: Set[str] = set()
+
+        def visit(node_id: str):
+            if node_id in visited:
+                return
+            visited.add(node_id)
+            for value in (prompt[node_id].get("inputs") or {}).values():
+                if self._is_link(value) and str(value[0]) in prompt:
+                    visit(str(value[0]))
+            order.append(node_id)
+
+        for node_id in prompt:
+            visit(node_id)
+        return order
+
+    def _signatures(self, prompt: Dict[str, Any], prompt_id: str) -> Dict[str, str]:
+        """节点签名：class_type、输入值与上游节点签名，输入未变化的节点签名相同"""
+        signatures: Dict[str, str] = {}
+        for node_id in self._execution_order(prompt):
+            node = prompt[node_id]
+            inputs = {}
+            for name, value in (node.get("inputs") or {}).items():
+                if self._is_link(value) and str(value[0]) in prompt:
+                    inputs[name] = [signatures[str(value[0])], value[1]]
+                else:
+                    inputs[name] = value
+            # 输出节点每次都会产生新文件，不参与缓存
+            if node["class_type"] in OUTPUT_NODE_TYPES:
+                inputs["__prompt__"] = prompt_id
+            payload = json.dumps([node["class_type"], inputs], sort_keys=True, default=str)
+            signatures[node_id] = hashlib.sha1(payload.encode("utf-8")).hexdigest()
+        return signatures
+
+    def _node_output(self, prompt_id: str, node_id: str, node: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        class_type = node["class_type"]
+        if class_type in TEXT_NODE_TYPES:
+            return {"text": [f"Simulated text output of node {node_id}"]}
+        if class_type not in OUTPUT_NODE_TYPES:
+            return None
+        field, kind, ext = OUTPUT_NODE_TYPES[class_type]
+        folder = "temp" if class_type.startswith("Preview") else "output"
+        items = []
+        for index in range(max(1, self.config.files_per_output)):
+            filename = f"{prompt_id[:8]}_{node_id}_{index:05d}{ext}"
+            self.files[(folder, "", filename)] = (kind, self.config.output_sizes.get(kind, 100_000))
+            items.append({"filename": filename, "subfolder": "", "type": folder})
+        output = {field: items}
+        if class_type == "SaveVideo":
+            output["animated"] = [True]
+        return output
+
+    # ---------- 文件 ----------
+
+    def _payload(self, size: int) -> bytes:
+        # 每种大小只生成一次，随机内容避免被传输层压缩
+        if size not in self._payloads:
+            self._payloads[size] = os.urandom(size)
+        return self._payloads[size]
+
+    async def handle_view(self, request: web.Request) -> web.Response:
+        key = (request.query.get("type", "output"), request.query.get("subfolder", ""), request.query.get("filename", ""))
+        entry = self.files.get(key)
+        if entry is None:
+            return web.Response(status=404)
+        ext = os.path.splitext(key[2])[1].lower()
+        content_type = CONTENT_TYPES.get(ext, "application/octet-stream")
+        body = entry if isinstance(entry, bytes) else self._payload(entry[1])
+        self._count("view_requests")
+        if request.method != "HEAD":
+            self._count("bytes_served", len(body))
+        return web.Response(body=body, content_type=content_type)
+
+    async def handle_upload(self, request: web.Request) -> web.Response:
+        form = await request.post()
+        image = form.get("image")
+        if image is None or not hasattr(image, "file"):
+            return web.Response(status=400)
+        folder = form.get("type") or "input"
+        subfolder = form.get("subfolder") or ""
+        overwrite = str(form.get("overwrite", "")).lower() in ("true", "1")
+        data = image.file.read()
+        filename = image.filename
+        if not overwrite:
+            # 与 ComfyUI 一致：同名文件内容不同时追加序号
+            base, ext = os.path.splitext(filename)
+            counter = 1
+            while (folder, subfolder, filename) in self.files and self.files[(folder, subfolder, filename)] != data:
+                filename = f"{base} ({counter}){ext}"
+                counter += 1
+        self.files[(folder, subfolder, filename)] = data
+        self._count("uploads")
+        self._count("bytes_uploaded", len(data))
+        return web.json_response({"name": filename, "subfolder": subfolder, "type": folder})
+
+    # ---------- 历史记录 ----------
+
+    async def handle_history(self, request: web.Request) -> web.Response:
+        prompt_id = request.match_info.get("prompt_id")
+        if prompt_id is not None:
+            return web.json_response({prompt_id: self.history[prompt_id]} if prompt_id in self.history else {})
+        items = list(self.history.items())
+        max_items = request.query.get("max_items")
+        if max_items:
+            items = items[-int(max_items):]
+        return web.json_response(dict(items))
+
+    async def handle_history_post(self, request: web.Request) -> web.Response:
+        body = await request.json()
+        if body.get("clear"):
+            self.history.clear()
+        for prompt_id in body.get("delete") or []:
+            self.history.pop(prompt_id, None)
+        return web.Response(status=200)
+
+    # ---------- WebSocket ----------
+
+    async def handle_ws(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        client_id = request.query.get("clientId") or uuid.uuid4().hex
+        self.sockets[client_id] = ws
+        try:
+            await ws.send_str(json.dumps({"type": "status", "data": {"status": {"exec_info": {"queue_remaining": self._queue_remaining()}}, "sid": client_id}}))
+            async for message in ws:
+                if message.type == WSMsgType.ERROR:
+                    break
+        finally:
+            if self.sockets.get(client_id) is ws:
+                del self.sockets[client_id]
+        return ws
+
+    async def _send(self, client_id: Optional[str], msg_type: str, data: Dict[str, Any]):
+        """发送给提交任务的客户端，未指定 client_id 时广播"""
+        message = json.dumps({"type": msg_type, "data": data})
+        targets = [self.sockets.get(client_id)] if client_id else list(self.sockets.values())
+        for ws in targets:
+            if ws is not None and not ws.closed:
+                try:
+                    await ws.send_str(message)
+                except ConnectionResetError:
+                    pass
+
+    async def _send_bytes(self, client_id: Optional[str], data: bytes):
+        ws = self.sockets.get(client_id) if client_id else None
+        if ws is not None and not ws.closed:
+            try:
+                await ws.send_bytes(data)
+            except ConnectionResetError:
+                pass
+
+    async def _broadcast_status(self):
+        await self._send(None, "status", {"status": {"exec_info": {"queue_remaining": self._queue_remaining()}}})
+
+    def _get_preview_frame(self) -> bytes:
+        if self._preview_frame is None:
+            from PIL import Image
+            buffer = io.BytesIO()
+            Image.new("RGB", (256, 256), (90, 120, 200)).save(buffer, "JPEG")
+            # 事件类型(4字节) + 图片格式(4字节, 1=JPEG) + 图片数据
+            self._preview_frame = BINARY_EVENT_PREVIEW_IMAGE.to_bytes(4, "big") + (1).to_bytes(4, "big") + buffer.getvalue()
+        return self._preview_frame
+
+    # ---------- 统计 ----------
+
+    async def handle_system_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({"system": {"os": "fake", "comfyui_version": "fake"}, "devices": []})
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response({**self.stats, "pending": len(self.pending), "running": len(self.running)})
+
+    async def handle_reset(self, request: web.Request) -> web.Response:
+        self.stats.clear()
+        self.history.clear()
+        self.node_cache.clear()
+        self.files = {key: value for key, value in self.files.items() if key[0] == "input"}
+        return web.Response(status=200)
+
+
+def _parse_assignments(values: List[str], cast) -> Dict[str, Any]:
+    result = {}
+    for value in values or []:
+        key, _, raw = value.rpartition("=")
+        if not key:
+            raise argparse.ArgumentTypeError(f"expected NAME=VALUE, got {value!r}")
+        result[key] = cast(raw)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8188)
+    parser.add_argument("--default-delay", type=float, default=0.0, help="seconds spent on nodes without a configured delay")
+    parser.add_argument("--delay", action="append", metavar="CLASS_TYPE=SECONDS", help="seconds spent per node of a class_type, repeatable")
+    parser.add_argument("--jitter", type=float, default=0.0, help="random relative deviation of node delays")
+    parser.add_argument("--progress-steps", type=int, default=10, help="progress events sent by nodes with a configured delay")
+    parser.add_argument("--output-size", action="append", metavar="KIND=BYTES", help="size of generated image/video/audio files, repeatable")
+    parser.add_argument("--files-per-output", type=int, default=1, help="files produced by each output node")
+    parser.add_argument("--queue-capacity", type=int, default=0, help="maximum pending prompts, /prompt returns 503 beyond it, 0 means unlimited")
+    parser.add_argument("--workers", type=int, default=1, help="prompts executed at the same time")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="probability that a prompt fails during execution")
+    parser.add_argument("--fail-class", action="append", default=[], metavar="CLASS_TYPE", help="class_type that always fails, repeatable")
+    parser.add_argument("--reject-rate", type=float, default=0.0, help="probability that /prompt rejects a prompt as invalid")
+    parser.add_argument("--no-node-cache", action="store_true", help="execute every node of every prompt")
+    parser.add_argument("--preview", action="store_true", help="send binary preview frames with progress events")
+    parser.add_argument("--seed", type=int, default=None, help="seed for reproducible failure injection and jitter")
+    args = parser.parse_args()
+
+    config = SimulatorConfig(
+        default_delay=args.default_delay,
+        delays=_parse_assignments(args.delay, float),
+        jitter=args.jitter,
+        progress_steps=args.progress_steps,
+        output_sizes={**SimulatorConfig().output_sizes, **_parse_assignments(args.output_size, int)},
+        files_per_output=args.files_per_output,
+        queue_capacity=args.queue_capacity,
+        workers=args.workers,
+        failure_rate=args.failure_rate,
+        fail_classes=set(args.fail_class),
+        reject_rate=args.reject_rate,
+        node_cache=not args.no_node_cache,
+        preview=args.preview,
+        seed=args.seed,
+    )
+    print(f"Fake ComfyUI listening on http://{args.host}:{args.port}")
+    web.run_app(FakeComfyUI(config).app, host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
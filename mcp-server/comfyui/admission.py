@@ -0,0 +1,188 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+"""
+ComfyUI 准入控制
+GPU 积压过深时快速失败，而不是让工具调用长时间挂起：
+- 按工作流记录历史执行时长（指数滑动平均）
+- 结合调度队列与ComfyUI队列估算本次调用的完成时间（ETA）
+- ETA 超出所属优先级的延迟目标（SLO）时拒绝，或转为后台任务，并把 ETA 返回给 LLM
+"""
+
+import os
+import time
+import threading
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from core import logger
+from comfyui.scheduler import PRIORITY_CLASSES, ScheduleRequest, scheduler
+
+# 配置变量
+COMFYUI_ADMISSION_ENABLED = os.getenv('COMFYUI_ADMISSION_ENABLED', 'false').lower() == 'true'
+# 各优先级的延迟目标（秒），格式: 优先级:秒数，逗号分隔，未配置的优先级不限制
+COMFYUI_ADMISSION_SLO = os.getenv('COMFYUI_ADMISSION_SLO', 'high:300,normal:900,low:3600')
+# 超出延迟目标时的处理方式: defer 转为后台任务并返回 job_id / reject 直接拒绝
+COMFYUI_ADMISSION_ACTION = os.getenv('COMFYUI_ADMISSION_ACTION', 'defer').lower()
+# 没有历史记录的工作流的预估执行时长（秒）
+COMFYUI_ADMISSION_DEFAULT_DURATION = float(os.getenv('COMFYUI_ADMISSION_DEFAULT_DURATION', '60'))
+# 后台任务（submit_job）的最大预估等待时长（秒），超出时拒绝提交，0 表示不限制
+COMFYUI_ADMISSION_MAX_BACKLOG = float(os.getenv('COMFYUI_ADMISSION_MAX_BACKLOG', '0'))
+
+# 历史时长的平滑系数，越大越偏向最近的执行
+DURATION_EWMA_ALPHA = 0.3
+# ComfyUI队列深度的缓存时间（秒），避免每次调用都查询 /queue
+QUEUE_DEPTH_TTL = 5.0
+
+DeferHandler = Callable[[ScheduleRequest, Dict[str, Any]], Awaitable[str]]
+
+
+def _parse_slo(value: str) -> Dict[str, float]:
+    slo = {}
+    for item in value.split(','):
+        if ':' in item:
+            priority, seconds = item.rsplit(':', 1)
+            if priority.strip() in PRIORITY_CLASSES and seconds.strip():
+                slo[priority.strip()] = float(seconds)
+    return slo
+
+
+ADMISSION_SLO = _parse_slo(COMFYUI_ADMISSION_SLO)
+
+
+class AdmissionRejected(Exception):
+    """预估完成时间超出延迟目标"""
+
+    def __init__(self, eta: float, slo: float, message: str):
+        super().__init__(message)
+        self.eta = eta
+        self.slo = slo
+
+
+def format_eta(seconds: float) -> str:
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds}s"
+    if seconds < 3600:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+
+
+class AdmissionController:
+    """按工作流历史时长与当前积压估算等待时间，决定是否接受新的执行"""
+
+    def __init__(self):
+        self._durations: Dict[str, float] = {}
+        self._queue_depths: Dict[str, Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+        self._defer_handler: Optional[DeferHandler] = None
+
+    def record_duration(self, workflow_name: str, duration: float):
+        """记录一次ComfyUI实际执行时长"""
+        if not workflow_name or duration is None or duration < 0:
+            return
+        with self._lock:
+            previous = self._durations.get(workflow_name)
+            if previous is None:
+                self._durations[workflow_name] = duration
+            else:
+                self._durations[workflow_name] = DURATION_EWMA_ALPHA * duration + (1 - DURATION_EWMA_ALPHA) * previous
+
+    def estimate_duration(self, workflow_name: str) -> float:
+        """预估单次执行时长"""
+        with self._lock:
+            return self._durations.get(workflow_name, COMFYUI_ADMISSION_DEFAULT_DURATION)
+
+    def _mean_duration(self) -> float:
+        with self._lock:
+            if not self._durations:
+                return COMFYUI_ADMISSION_DEFAULT_DURATION
+            return sum(self._durations.values()) / len(self._durations)
+
+    async def _get_queue_depth(self, executor: Any) -> int:
+        """ComfyUI队列中的任务数（含其他客户端提交的），短时间缓存，查询失败时按0处理"""
+        now = time.time()
+        cached = self._queue_depths.get(executor.base_url)
+        if cached is not None and now - cached[0] < QUEUE_DEPTH_TTL:
+            return cached[1]
+        try:
+            queue_status = await executor.get_queue_status()
+            depth = len(queue_status["running"]) + len(queue_status["pending"])
+        except Exception as e:
+            logger.debug(f"查询ComfyUI队列失败，按空队列估算: {e}")
+            depth = 0
+        self._queue_depths[executor.base_url] = (now, depth)
+        return depth
+
+    async def estimate_wait(self, executor: Any, request: ScheduleRequest) -> float:
+        """
+        预估从现在到本次执行完成的时间（秒）
+
+        ComfyUI按顺序执行任务，等待时间为：执行中任务的剩余时长 + 调度队列中排在前面的任务时长
+        + ComfyUI中其他客户端的任务时长 + 本次执行时长
+        """
+        waiting, active = scheduler.snapshot(executor.base_url)
+        rank = PRIORITY_CLASSES[request.priority]
+
+        eta = self.estimate_duration(request.workflow_name)
+        for other, elapsed in active:
+            estimate = self.estimate_duration(other.workflow_name)
+            # 超出预估仍未结束的任务，至少还需要一小段时间
+            eta += max(estimate - elapsed, estimate * 0.1)
+        for other in waiting:
+            # 同优先级的等待任务按公平排队可能先执行，保守计入
+            if PRIORITY_CLASSES[other.priority] <= rank:
+                eta += self.estimate_duration(other.workflow_name)
+
+        # 本服务提交的任务已计入执行中的部分，剩余为其他客户端的任务
+        external = max(0, await self._get_queue_depth(executor) - len(active))
+        eta += external * self._mean_duration()
+        return eta
+
+    async def admit(self, executor: Any, request: Optional[ScheduleRequest]) -> Optional[float]:
+        """
+        判断是否接受本次执行，超出延迟目标时抛出 AdmissionRejected
+
+        Returns:
+            预估完成时间（秒），未启用准入控制时返回 None
+        """
+        if not COMFYUI_ADMISSION_ENABLED or request is None:
+            return None
+        eta = await self.estimate_wait(executor, request)
+        if request.background:
+            # 后台任务不等待结果，只在积压超过上限时拒绝
+            if COMFYUI_ADMISSION_MAX_BACKLOG > 0 and eta > COMFYUI_ADMISSION_MAX_BACKLOG:
+                raise AdmissionRejected(
+                    eta,
+                    COMFYUI_ADMISSION_MAX_BACKLOG,
+                    f"ComfyUI backlog is too deep, estimated completion in {format_eta(eta)}. Please try again later.",
+                )
+            return eta
+        slo = ADMISSION_SLO.get(request.priority)
+        # 前面没有任何任务时总是接受，拒绝也不会更快
+        idle = eta <= self.estimate_duration(request.workflow_name)
+        if slo is not None and eta > slo and not idle:
+            logger.info(f"准入拒绝: {request.workflow_name} ({request.tenant}), 预估 {eta:.0f}s 超出 {request.priority} 延迟目标 {slo:.0f}s")
+            raise AdmissionRejected(
+                eta,
+                slo,
+                f"ComfyUI is busy, estimated completion in {format_eta(eta)}, which exceeds the {format_eta(slo)} limit. "
+                f"Please try again later, or run it in the background with submit_job.",
+            )
+        return eta
+
+    def set_defer_handler(self, handler: Optional[DeferHandler]):
+        """设置超出延迟目标时转为后台任务的处理函数，参数为 (调度信息, 工作流参数)，返回 job_id"""
+        self._defer_handler = handler
+
+    async def defer(self, request: ScheduleRequest, params: Dict[str, Any]) -> Optional[str]:
+        """按配置把被拒绝的调用转为后台任务，返回 job_id，未转为后台任务时返回 None"""
+        if COMFYUI_ADMISSION_ACTION != "defer" or self._defer_handler is None or request.background:
+            return None
+        try:
+            return await self._defer_handler(request, params)
+        except Exception as e:
+            logger.warning(f"转为后台任务失败: {e}")
+            return None
+
+
+admission = AdmissionController()
@@ -3,12 +3,12 @@
 
 import os
 import json
-import copy
-import tempfile
-import mimetypes
+import asyncio
+import time
+import uuid
 from abc import ABC, abstractmethod
-from urllib.parse import urlparse
-from typing import Any, Optional, Dict, List, Tuple
+from pathlib import Path
+from typing import Any, Optional, Dict, List, Set, Tuple
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 import aiohttp
@@ -17,13 +17,28 @@ from core import logger
 from utils.file_util import download_files
 from utils.file_uploader import upload
 from comfyui.workflow_parser import WorkflowParser, WorkflowMetadata
+from comfyui.workflow_template import WorkflowTemplate, template_cache
 from comfyui.models import ExecuteResult
-from utils.os_util import get_data_path
+from comfyui.progress import ProgressCallback
+from comfyui.graph_util import canonical_graph_hash, is_deterministic
+from comfyui.result_cache import result_cache, RESULT_CACHE_ENABLED
+from comfyui.single_flight import in_flight, QueuedCallback
+from comfyui.scheduler import scheduler, current_request
+from comfyui.admission import admission, AdmissionRejected, format_eta
+from comfyui.upload_cache import upload_cache, UploadEntry, UPLOAD_CACHE_ENABLED
+from comfyui.media_source import MediaSource, is_mcp_base_file
+from utils import trace_util, metrics_util, json_util
 
 # 配置变量
 COMFYUI_BASE_URL = os.getenv('COMFYUI_BASE_URL')
 COMFYUI_API_KEY = os.getenv('COMFYUI_API_KEY')
 COMFYUI_COOKIES = os.getenv('COMFYUI_COOKIES')
+# 合并执行中的相同工作流，只向ComfyUI提交一次
+COMFYUI_COALESCE_ENABLED = os.getenv('COMFYUI_COALESCE_ENABLED', 'true').lower() == 'true'
+# 单次执行中同时上传的媒体输入数量上限
+COMFYUI_UPLOAD_CONCURRENCY = int(os.getenv('COMFYUI_UPLOAD_CONCURRENCY', '4'))
+# 调用方取消后删除或中断ComfyUI任务的超时时间（秒）
+COMFYUI_CANCEL_TIMEOUT = float(os.getenv('COMFYUI_CANCEL_TIMEOUT', '10'))
 
 # 需要特殊媒体上传处理的节点类型
 MEDIA_UPLOAD_NODE_TYPES = {
@@ -32,8 +47,9 @@ MEDIA_UPLOAD_NODE_TYPES = {
     'VHS_LoadVideo',
 }
 
-TEMP_DIR = get_data_path("temp")
-os.makedirs(TEMP_DIR, exist_ok=True)
+# 调用方取消后仍在进行的ComfyUI任务取消操作，保留引用避免被回收
+_abort_tasks: Set[asyncio.Task] = set()
+
 
 class ComfyUIExecutor(ABC):
     """ComfyUI 执行器抽象基类"""
@@ -42,10 +58,122 @@ class ComfyUIExecutor(ABC):
         self.base_url = (base_url or COMFYUI_BASE_URL).rstrip('/')
         
     @abstractmethod
-    async def execute_workflow(self, workflow_file: str, params: Dict[str, Any] = None) -> ExecuteResult:
-        """执行工作流的抽象方法"""
+    async def _execute_prompt(self, workflow_data: Dict[str, Any], output_id_2_var: Dict[str, str], on_queued: Optional[QueuedCallback] = None, on_progress: Optional[ProgressCallback] = None, output_node_ids: Optional[Set[str]] = None) -> ExecuteResult:
+        """提交已应用参数的工作流并等待结果的抽象方法，结果文件由调用方在释放调度名额后转存"""
         pass
     
+    async def execute_template(
+        self,
+        metadata: WorkflowMetadata,
+        template: WorkflowTemplate,
+        params: Dict[str, Any] = None,
+        on_queued: Optional[QueuedCallback] = None,
+        on_progress: Optional[ProgressCallback] = None,
+        use_cache: bool = True,
+    ) -> ExecuteResult:
+        """使用已加载的工作流模板执行一次，相同的工作流图优先返回缓存结果"""
+        try:
+            # 使用新的参数映射逻辑，即使没有传入参数，也需要应用默认值
+            media_digests: Dict[str, str] = {}
+            with trace_util.start_span("workflow.apply_params"):
+                workflow_data = await self._apply_params_to_workflow(template, metadata, params or {}, media_digests)
+            
+            # 从元数据提取输出节点信息
+            output_id_2_var = self._extract_output_nodes(metadata)
+            output_node_ids = self._extract_collect_node_ids(metadata)
+            
+            # 随机种子等非确定性工作流不参与缓存与合并
+            graph_hash = None
+            if (RESULT_CACHE_ENABLED or COMFYUI_COALESCE_ENABLED) and is_deterministic(workflow_data):
+                graph_hash = canonical_graph_hash(workflow_data, media_digests)
+            
+            # 结果缓存：跳过缓存时仍用新结果刷新缓存
+            cache_key = graph_hash if RESULT_CACHE_ENABLED else None
+            if cache_key and use_cache:
+                cached_result = result_cache.get(cache_key)
+                if cached_result is not None:
+                    logger.info(f"命中结果缓存: {cache_key}")
+                    return cached_result
+            
+            async def run_prompt(queued: Optional[QueuedCallback], progress: Optional[ProgressCallback]) -> ExecuteResult:
+                # 积压过深无法满足延迟目标时快速失败，命中缓存与合并到已有执行的调用不受影响；
+                # 准入只在发起执行时检查一次，合并的调用方共享同一个转后台结果（同一个 job_id）
+                try:
+                    await admission.admit(self, current_request.get())
+                except AdmissionRejected as e:
+                    return await self._handle_rejection(e, params or {})
+                # 按优先级与用户公平排队，获取到后端名额后再提交到ComfyUI
+                async with scheduler.slot(self.base_url, progress):
+                    result = await self._execute_prompt(workflow_data, output_id_2_var, queued, progress, output_node_ids)
+                # ComfyUI任务已结束，转存结果文件不占用后端名额
+                return await self.transfer_result_files(result)
+            
+            if graph_hash and COMFYUI_COALESCE_ENABLED:
+                # 相同的工作流图正在执行时，等待同一个ComfyUI任务的结果
+                result = await in_flight.run(f"{self.base_url}:{graph_hash}", run_prompt, on_queued, on_progress)
+            else:
+                result = await run_prompt(on_queued, on_progress)
+            if cache_key:
+                result_cache.put(cache_key, result)
+            return result
+            
+        except Exception as e:
+            logger.error(f"执行工作流出错: {str(e)}", exc_info=True)
+            return ExecuteResult(status="error", msg=str(e))
+    
+    async def _handle_rejection(self, rejection: AdmissionRejected, params: Dict[str, Any]) -> ExecuteResult:
+        """准入被拒绝时按配置转为后台任务，否则把预估完成时间返回给调用方"""
+        request = current_request.get()
+        job_id = await admission.defer(request, params) if request is not None else None
+        if job_id:
+            return ExecuteResult(
+                status="deferred",
+                eta=rejection.eta,
+                msg=f"ComfyUI is busy, the request was submitted as background job {job_id} "
+                    f"(estimated completion in {format_eta(rejection.eta)}). "
+                    f"Check it later with get_job_status and get_job_result.",
+            )
+        return ExecuteResult(status="rejected", eta=rejection.eta, msg=str(rejection))
+
+    def load_workflow_template(self, workflow_file: str) -> Tuple[WorkflowMetadata, WorkflowTemplate]:
+        """读取并编译工作流模板，返回元数据与模板，文件未修改时复用已编译的模板"""
+        if not os.path.exists(workflow_file):
+            logger.error(f"工作流文件不存在: {workflow_file}")
+            raise Exception(f"工作流文件不存在: {workflow_file}")
+        
+        template = template_cache.get(workflow_file, self._compile_workflow_template)
+        return template.metadata, template
+    
+    def _compile_workflow_template(self, workflow_file: str) -> WorkflowTemplate:
+        with trace_util.start_span("workflow.parse"):
+            # 加载工作流JSON
+            with open(workflow_file, 'r', encoding='utf-8') as f:
+                workflow_data = json.load(f)
+            if not workflow_data:
+                raise Exception("工作流数据缺失")
+            
+            # 获取工作流元数据
+            metadata = WorkflowParser().parse_workflow(workflow_data, Path(workflow_file).stem)
+            if not metadata:
+                raise Exception("无法解析工作流元数据")
+            
+            return WorkflowTemplate(workflow_data, metadata)
+    
+    async def execute_workflow(
+        self,
+        workflow_file: str,
+        params: Dict[str, Any] = None,
+        on_queued: Optional[QueuedCallback] = None,
+        on_progress: Optional[ProgressCallback] = None,
+        use_cache: bool = True,
+    ) -> ExecuteResult:
+        """执行工作流"""
+        try:
+            metadata, template = self.load_workflow_template(workflow_file)
+        except Exception as e:
+            return ExecuteResult(status="error", msg=str(e))
+        return await self.execute_template(metadata, template, params, on_queued, on_progress, use_cache)
+    
     async def _parse_comfyui_cookies(self) -> Optional[Dict[str, str]]:
         """解析 COMFYUI_COOKIES 配置并返回 cookies 字典
         支持三种格式：
@@ -118,11 +246,17 @@ class ComfyUIExecutor(ABC):
             
             # 下载并上传未缓存的url
             uncached_urls = [url for url in unique_urls if url not in url_cache]
+            for url in unique_urls:
+                metrics_util.record_cache("transfer_url", url in url_cache)
             if uncached_urls:
-                with download_files(uncached_urls, cookies=cookies, headers=headers) as temp_files:
-                    for temp_file, url in zip(temp_files, uncached_urls):
-                        new_url = upload(temp_file)
-                        url_cache[url] = new_url
+                with trace_util.start_span("comfyui.transfer", {"transfer.files": len(uncached_urls)}) as span:
+                    with download_files(uncached_urls, cookies=cookies, headers=headers) as temp_files:
+                        transfer_bytes = sum(os.path.getsize(f) for f in temp_files)
+                        span.set_attribute("transfer.bytes", transfer_bytes)
+                        metrics_util.TRANSFER_BYTES.labels(direction="comfyui_to_base").inc(transfer_bytes)
+                        for temp_file, url in zip(temp_files, uncached_urls):
+                            new_url = upload(temp_file)
+                            url_cache[url] = new_url
             
             return [url_cache.get(url, url) for url in urls]
 
@@ -130,6 +264,7 @@ class ComfyUIExecutor(ABC):
             return {k: transfer_urls(v) for k, v in d.items()} if d else d
 
         # 构造新数据
+        transfer_start = time.time()
         data = result.model_dump()
         for field in ["images", "audios", "videos"]:
             if data.get(field):
@@ -146,9 +281,10 @@ class ComfyUIExecutor(ABC):
             if data.get(field):
                 data[field] = data[field]
         
+        metrics_util.observe_phase("transfer", transfer_start)
         return ExecuteResult(**data)
 
-    async def _apply_param_mapping(self, workflow_data: Dict[str, Any], mapping: Any, param_value: Any):
+    async def _apply_param_mapping(self, workflow_data: Dict[str, Any], mapping: Any, param_value: Any, media_digests: Optional[Dict[str, str]] = None):
         """根据参数映射应用单个参数"""
         node_id = mapping.node_id
         input_field = mapping.input_field
@@ -167,12 +303,12 @@ class ComfyUIExecutor(ABC):
         
         # 检查节点类型是否需要特殊媒体上传处理
         if node_class_type in MEDIA_UPLOAD_NODE_TYPES:
-            await self._handle_media_upload(node_data, input_field, param_value)
+            await self._handle_media_upload(node_data, input_field, param_value, media_digests)
         else:
             # 常规参数设置
             await self._set_node_param(node_data, input_field, param_value)
 
-    async def _handle_media_upload(self, node_data: Dict[str, Any], input_field: str, param_value: Any):
+    async def _handle_media_upload(self, node_data: Dict[str, Any], input_field: str, param_value: Any, media_digests: Optional[Dict[str, str]] = None):
         """处理媒体上传"""
         # 确保inputs存在
         if "inputs" not in node_data:
@@ -182,7 +318,7 @@ class ComfyUIExecutor(ABC):
         if isinstance(param_value, str) and param_value.startswith(('http://', 'https://')):
             try:
                 # 上传媒体并获取上传后的媒体名
-                media_value = await self._upload_media_from_source(param_value)
+                media_value = await self._upload_media_from_source(param_value, media_digests)
                 # 使用上传后的媒体名作为节点的输入值
                 await self._set_node_param(node_data, input_field, media_value)
                 logger.info(f"媒体上传成功: {media_value}")
@@ -201,99 +337,313 @@ class ComfyUIExecutor(ABC):
         # 设置参数值
         node_data["inputs"][input_field] = param_value
 
-    async def _upload_media_from_source(self, media_url: str) -> str:
-        """从URL上传媒体"""
-        # 准备请求头
+    def _comfyui_headers(self) -> Dict[str, str]:
         headers = {}
         if COMFYUI_API_KEY:
             headers["Authorization"] = f"Bearer {COMFYUI_API_KEY}"
+        return headers
+
+    async def _upload_media_from_source(self, media_url: str, media_digests: Optional[Dict[str, str]] = None) -> str:
+        """从URL上传媒体，media_digests 用于记录上传后的文件名对应的内容哈希"""
+        headers = self._comfyui_headers()
         
-        async with self.get_comfyui_session() as session:
-            async with session.get(media_url, headers=headers) as response:
-                if response.status != 200:
-                    raise Exception(f"下载媒体失败: HTTP {response.status}")
-                
-                # 从URL提取文件名
-                parsed_url = urlparse(media_url)
-                filename = os.path.basename(parsed_url.path)
-                if not filename:
-                    filename = f"temp_media_{hash(media_url)}.jpg"
-                
-                # 获取媒体数据
-                media_data = await response.read()
+        with trace_util.start_span("comfyui.upload_media", {"media.url": media_url}) as span:
+            # 相同源URL已上传过且仍然有效时，跳过下载与上传
+            if UPLOAD_CACHE_ENABLED:
+                entry = upload_cache.get_by_url(self.base_url, media_url)
+                valid = entry is not None and await self._validate_upload_entry(entry, media_url)
+                metrics_util.record_cache("upload", valid)
+                if valid:
+                    logger.info(f"命中上传缓存: {media_url} -> {entry.name}")
+                    span.set_attribute("media.cached", True)
+                    if media_digests is not None:
+                        media_digests[entry.name] = entry.digest
+                    return entry.name
+            
+            digest = None
+            media_name = None
+            async with self.get_comfyui_session() as session:
+                source = MediaSource(media_url, session, headers)
+                span.set_attribute("media.local", source.local_path is not None)
+                try:
+                    await source.open()
+                    
+                    # 本地文件可以先计算哈希，内容相同的输入复用ComfyUI端已有的文件
+                    if source.local_path and UPLOAD_CACHE_ENABLED:
+                        digest = await source.hash_local()
+                        entry = upload_cache.get_by_digest(self.base_url, digest)
+                        if entry is not None and await self._validate_upload_entry(entry, media_url, check_source=False):
+                            logger.info(f"命中上传缓存(内容相同): {media_url} -> {entry.name}")
+                            media_name = entry.name
+                    
+                    if media_name is None:
+                        # 边读取边上传，不写临时文件
+                        filename = f"{uuid.uuid4().hex}{source.suffix}"
+                        media_name = await self._upload_media(filename, source.chunks(), source.content_type, session)
+                        digest = source.digest
+                        span.set_attribute("media.bytes", source.size)
+                finally:
+                    source.close()
+            
+            if UPLOAD_CACHE_ENABLED:
+                upload_cache.put(self.base_url, media_url, UploadEntry(
+                    name=media_name,
+                    digest=digest,
+                    etag=source.etag,
+                    last_modified=source.last_modified,
+                    immutable=is_mcp_base_file(media_url),
+                ))
+            if media_digests is not None:
+                media_digests[media_name] = digest
+            return media_name
+
+    async def _validate_upload_entry(self, entry: UploadEntry, media_url: str, check_source: bool = True) -> bool:
+        """
+        校验上传记录是否仍可复用
+
+        源文件：mcp-base 的文件不会变化；其他URL用 HEAD 比较 ETag / Last-Modified，没有校验信息时视为无效
+        ComfyUI端：HEAD /view 检查输入文件仍然存在
+        """
+        if entry.recently_validated:
+            return True
+        try:
+            async with self.get_comfyui_session() as session:
+                timeout = aiohttp.ClientTimeout(total=5)
+                if check_source and not entry.immutable:
+                    if not entry.etag and not entry.last_modified:
+                        return False
+                    async with session.head(media_url, headers=self._comfyui_headers(), timeout=timeout, allow_redirects=True) as response:
+                        if response.status != 200:
+                            return False
+                        if entry.etag and response.headers.get("ETag") != entry.etag:
+                            return False
+                        if entry.last_modified and response.headers.get("Last-Modified") != entry.last_modified:
+                            return False
                 
-                # 保存到临时文件
-                suffix = os.path.splitext(filename)[1] or ".jpg"
-                with tempfile.NamedTemporaryFile(delete=False, suffix=suffix, dir=TEMP_DIR) as tmp:
-                    tmp.write(media_data)
-                    temp_path = tmp.name
+                view_url = f"{self.base_url}/view"
+                params = {"filename": entry.name, "type": "input"}
+                async with session.head(view_url, params=params, headers=self._comfyui_headers(), timeout=timeout) as response:
+                    if response.status != 200:
+                        logger.info(f"ComfyUI输入文件已不存在: {entry.name}")
+                        upload_cache.invalidate(self.base_url, entry)
+                        return False
+        except Exception as e:
+            logger.debug(f"校验上传缓存失败: {e}")
+            return False
         
-        try:
-            # 上传临时文件到ComfyUI
-            return await self._upload_media(temp_path)
-        finally:
-            # 删除临时文件
-            os.unlink(temp_path)
+        entry.validated_at = time.time()
+        return True
 
-    async def _upload_media(self, media_path: str) -> str:
-        """上传媒体到ComfyUI"""
-        # 读取媒体数据
-        with open(media_path, 'rb') as f:
-            media_data = f.read()
-        
-        # 提取文件名
-        filename = os.path.basename(media_path)
-        
-        # 自动检测文件MIME类型
-        mime_type = mimetypes.guess_type(filename)[0]
-        if mime_type is None:
-            mime_type = 'application/octet-stream'
-        
+    async def _upload_media(self, filename: str, media_data: Any, content_type: str, session: aiohttp.ClientSession) -> str:
+        """上传媒体到ComfyUI，media_data 可以是 bytes 或逐块产出内容的异步迭代器"""
         # 准备表单数据
         data = aiohttp.FormData()
         data.add_field('image', media_data, 
                        filename=filename, 
-                       content_type=mime_type)
-        
-        # 准备请求头
-        headers = {}
-        if COMFYUI_API_KEY:
-            headers["Authorization"] = f"Bearer {COMFYUI_API_KEY}"
+                       content_type=content_type)
         
         # 上传媒体
         upload_url = f"{self.base_url}/upload/image"
-        async with self.get_comfyui_session() as session:
-            async with session.post(upload_url, data=data, headers=headers) as response:
-                if response.status != 200:
-                    raise Exception(f"上传媒体失败: HTTP {response.status}")
-                
-                # 获取上传结果
-                result = await response.json()
-                return result.get('name', '')
+        async with session.post(upload_url, data=data, headers=self._comfyui_headers()) as response:
+            if response.status != 200:
+                raise Exception(f"上传媒体失败: HTTP {response.status}")
+            
+            # 获取上传结果
+            result = await response.json(loads=json_util.loads)
+            return result.get('name', '')
 
-    async def _apply_params_to_workflow(self, workflow_data: Dict[str, Any], metadata: WorkflowMetadata, params: Dict[str, Any]) -> Dict[str, Any]:
-        """使用新解析器将参数应用到工作流"""
-        workflow_data = copy.deepcopy(workflow_data)
+    async def _apply_params_to_workflow(self, template: WorkflowTemplate, metadata: WorkflowMetadata, params: Dict[str, Any], media_digests: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+        """使用新解析器将参数应用到工作流，只复制被参数化的节点"""
+        workflow_data = template.instantiate()
         
-        # 遍历所有参数映射
+        # 先确定每个映射的取值，必填参数缺失时在上传媒体之前失败
+        resolved: List[Tuple[Any, Any]] = []
         for mapping in metadata.mapping_info.param_mappings:
             param_name = mapping.param_name
             
             # 检查参数是否存在
             if param_name in params:
-                param_value = params[param_name]
-                await self._apply_param_mapping(workflow_data, mapping, param_value)
+                resolved.append((mapping, params[param_name]))
             else:
                 # 使用默认值（如果存在）
                 if param_name in metadata.params:
                     param_info = metadata.params[param_name]
                     if param_info.default is not None:
-                        await self._apply_param_mapping(workflow_data, mapping, param_info.default)
+                        resolved.append((mapping, param_info.default))
                     elif param_info.required:
                         raise Exception(f"必填参数 '{param_name}' 缺失")
         
+        # 媒体输入并发上传，相同URL只上传一次，其余参数直接设置
+        def is_media_upload(mapping: Any, value: Any) -> bool:
+            return mapping.node_class_type in MEDIA_UPLOAD_NODE_TYPES and mapping.node_id in workflow_data \
+                and isinstance(value, str) and value.startswith(('http://', 'https://'))
+        
+        media_urls = [value for mapping, value in resolved if is_media_upload(mapping, value)]
+        uploaded = await self._upload_media_sources(list(dict.fromkeys(media_urls)), media_digests) if media_urls else {}
+        
+        for mapping, value in resolved:
+            # 只有媒体输入替换为上传后的文件名，其他参数即使取值相同的URL也原样设置
+            if is_media_upload(mapping, value):
+                value = uploaded[value]
+            await self._apply_param_mapping(workflow_data, mapping, value, media_digests)
+        
         return workflow_data
 
+    async def _upload_media_sources(self, media_urls: List[str], media_digests: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+        """并发上传多个媒体，返回源URL到ComfyUI文件名的映射，任一失败时取消其余上传"""
+        semaphore = asyncio.Semaphore(max(1, COMFYUI_UPLOAD_CONCURRENCY))
+        
+        async def upload_one(media_url: str) -> Tuple[str, str]:
+            async with semaphore:
+                try:
+                    media_name = await self._upload_media_from_source(media_url, media_digests)
+                except Exception as e:
+                    logger.error(f"媒体上传失败: {str(e)}")
+                    raise Exception(f"媒体上传失败: {str(e)}")
+            logger.info(f"媒体上传成功: {media_name}")
+            return media_url, media_name
+        
+        tasks = [asyncio.create_task(upload_one(media_url)) for media_url in media_urls]
+        try:
+            return dict(await asyncio.gather(*tasks))
+        finally:
+            for task in tasks:
+                task.cancel()
+            # 等待被取消的上传结束，避免遗留的上传任务与未读取的异常
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def get_queue_status(self) -> Dict[str, List[str]]:
+        """查询ComfyUI队列，返回运行中与排队中的prompt_id列表"""
+        headers = {}
+        if COMFYUI_API_KEY:
+            headers["Authorization"] = f"Bearer {COMFYUI_API_KEY}"
+        
+        async with self.get_comfyui_session() as session:
+            async with session.get(f"{self.base_url}/queue", headers=headers, timeout=aiohttp.ClientTimeout(total=5)) as response:
+                if response.status != 200:
+                    raise Exception(f"获取队列失败: HTTP {response.status}")
+                queue_data = await response.json(loads=json_util.loads)
+        
+        # 队列项格式: [number, prompt_id, prompt, extra_data, outputs_to_execute]
+        return {
+            "running": [item[1] for item in queue_data.get("queue_running", [])],
+            "pending": [item[1] for item in queue_data.get("queue_pending", [])],
+        }
+
+    async def _notify_queued(self, on_queued: Optional[QueuedCallback], prompt_id: str):
+        """通知调用方任务已进入ComfyUI队列，回调失败不影响执行"""
+        if on_queued is None:
+            return
+        try:
+            await on_queued(prompt_id, self.base_url)
+        except Exception as e:
+            logger.warning(f"任务入队回调失败: {e}")
+
+    async def get_prompt_history(self, prompt_id: str) -> Optional[Dict[str, Any]]:
+        """查询单个任务的历史记录，任务未完成时返回 None"""
+        headers = {}
+        if COMFYUI_API_KEY:
+            headers["Authorization"] = f"Bearer {COMFYUI_API_KEY}"
+        
+        async with self.get_comfyui_session() as session:
+            async with session.get(f"{self.base_url}/history/{prompt_id}", headers=headers) as response:
+                if response.status != 200:
+                    raise Exception(f"获取历史记录失败: HTTP {response.status}")
+                history_data = await response.json(loads=json_util.loads)
+        return history_data.get(prompt_id)
+
+    async def prompt_exists(self, prompt_id: str) -> bool:
+        """判断任务是否仍在ComfyUI队列中或已有历史记录"""
+        queue_status = await self.get_queue_status()
+        if prompt_id in queue_status["running"] or prompt_id in queue_status["pending"]:
+            return True
+        return await self.get_prompt_history(prompt_id) is not None
+
+    async def cancel_prompt(self, prompt_id: str) -> bool:
+        """取消ComfyUI中的任务：排队中的从队列删除，执行中的中断执行
+        
+        Returns:
+            是否找到并取消了任务
+        """
+        headers = {"Content-Type": "application/json"}
+        if COMFYUI_API_KEY:
+            headers["Authorization"] = f"Bearer {COMFYUI_API_KEY}"
+        
+        queue_status = await self.get_queue_status()
+        async with self.get_comfyui_session() as session:
+            if prompt_id in queue_status["pending"]:
+                async with session.post(f"{self.base_url}/queue", json={"delete": [prompt_id]}, headers=headers) as response:
+                    if response.status != 200:
+                        raise Exception(f"删除排队任务失败: HTTP {response.status}")
+                logger.info(f"已从ComfyUI队列删除任务: {prompt_id}")
+                return True
+            if prompt_id in queue_status["running"]:
+                # /interrupt 只会中断当前正在执行的任务，新版ComfyUI支持按prompt_id中断
+                async with session.post(f"{self.base_url}/interrupt", json={"prompt_id": prompt_id}, headers=headers) as response:
+                    if response.status != 200:
+                        raise Exception(f"中断任务失败: HTTP {response.status}")
+                logger.info(f"已中断ComfyUI任务: {prompt_id}")
+                return True
+        return False
+
+    async def _abort_prompt(self, prompt_id: Optional[str]):
+        """
+        调用方取消执行（如MCP请求被取消、客户端断开）时，从ComfyUI队列删除或中断已提交的任务，
+        避免为已放弃的任务占用GPU。后台任务在服务重启后会重新接管，其取消由任务管理器处理
+        """
+        request = current_request.get()
+        if not prompt_id or (request is not None and request.background):
+            return
+        task = asyncio.create_task(self._cancel_abandoned_prompt(prompt_id))
+        _abort_tasks.add(task)
+        task.add_done_callback(_abort_tasks.discard)
+        try:
+            await asyncio.shield(task)
+        except asyncio.CancelledError:
+            # 调用方所在的取消范围会立即再次取消等待，取消操作在后台继续完成
+            pass
+
+    async def _cancel_abandoned_prompt(self, prompt_id: str):
+        try:
+            if await asyncio.wait_for(self.cancel_prompt(prompt_id), timeout=COMFYUI_CANCEL_TIMEOUT):
+                logger.info(f"调用方已取消，已停止ComfyUI任务: {prompt_id}")
+        except Exception as e:
+            logger.warning(f"调用方已取消，停止ComfyUI任务失败 {prompt_id}: {e}")
+
+    def _record_phases(self, prompt_id: str, submitted_at: Optional[float], started_at: Optional[float], finished_at: Optional[float]):
+        """补录 ComfyUI 排队等待与实际执行两个阶段的 span"""
+        attributes = {"comfyui.prompt_id": prompt_id, "comfyui.base_url": self.base_url}
+        if started_at is None:
+            # 没有收到开始执行事件（如全部命中缓存），整段记为执行时间
+            started_at = submitted_at
+        trace_util.record_span("comfyui.queue_wait", submitted_at, started_at, attributes)
+        trace_util.record_span("comfyui.execution", started_at, finished_at, attributes)
+        metrics_util.observe_phase("queue_wait", submitted_at, started_at)
+        metrics_util.observe_phase("execution", started_at, finished_at)
+        request = current_request.get()
+        if request is not None and started_at is not None and finished_at is not None:
+            admission.record_duration(request.workflow_name, finished_at - started_at)
+
+    def _record_phases_from_status(self, prompt_id: str, submitted_at: float, status: Optional[Dict[str, Any]]):
+        """从 /history 返回的 status.messages 中读取时间戳并补录阶段 span
+        
+        ComfyUI 的时间戳来自远端时钟，与本地提交时间不可直接比较：
+        执行时长取远端两个时间戳之差，各阶段边界统一换算到本地时钟，以收到结果的时间为执行结束时间；
+        轮询间隔带来的延迟计入排队等待
+        """
+        finished_at = time.time()
+        timestamps = {}
+        for message in (status or {}).get("messages") or []:
+            if isinstance(message, (list, tuple)) and len(message) == 2 and isinstance(message[1], dict):
+                msg_type, body = message
+                if "timestamp" in body:
+                    timestamps[msg_type] = body["timestamp"] / 1000
+        started_at = None
+        if "execution_start" in timestamps and "execution_success" in timestamps:
+            execution_time = max(timestamps["execution_success"] - timestamps["execution_start"], 0)
+            started_at = max(finished_at - execution_time, submitted_at)
+        self._record_phases(prompt_id, submitted_at, started_at, finished_at)
+
     def _extract_output_nodes(self, metadata: WorkflowMetadata) -> Dict[str, str]:
         """从元数据提取输出节点及其输出变量名"""
         output_id_2_var = {}
@@ -303,6 +653,17 @@ class ComfyUIExecutor(ABC):
         
         return output_id_2_var
 
+    def _extract_collect_node_ids(self, metadata: WorkflowMetadata) -> Optional[Set[str]]:
+        """加载时分析得到的需要收集结果的节点，None 表示收集所有节点的结果"""
+        output_node_ids = metadata.mapping_info.output_node_ids
+        return set(output_node_ids) if output_node_ids is not None else None
+
+    def _select_outputs(self, outputs: Dict[str, Any], output_node_ids: Optional[Set[str]]) -> Dict[str, Any]:
+        """只保留需要收集结果的节点的输出，预览节点等产生的临时文件不下载也不转存"""
+        if output_node_ids is None:
+            return outputs
+        return {node_id: output for node_id, output in outputs.items() if node_id in output_node_ids}
+
     def get_workflow_metadata(self, workflow_file: str) -> Optional[WorkflowMetadata]:
         """获取工作流元数据（使用新的解析器）"""
         parser = WorkflowParser()
@@ -2,14 +2,26 @@
 # This project is licensed under the MIT License (SPDX-License-identifier: MIT).
 
 import os
-from typing import Dict, Any
+import time
+import asyncio
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Callable, Awaitable
 
-from comfyui.models import ExecuteResult
+from comfyui.models import ExecuteResult, BatchExecuteResult
 from comfyui.websocket_executor import WebSocketExecutor
 from comfyui.http_executor import HttpExecutor
+from comfyui.base_executor import QueuedCallback
+from comfyui.progress import ProgressCallback, ctx_progress_callback
+from comfyui.scheduler import request_context
+from comfyui.workflow_parser import WorkflowMetadata
+from comfyui.workflow_template import WorkflowTemplate
+from core import logger
+from utils import trace_util, metrics_util
 
 # 配置变量
 COMFYUI_EXECUTOR_TYPE = os.getenv('COMFYUI_EXECUTOR_TYPE', 'http')
+# 批量执行时同时提交到ComfyUI的最大任务数
+COMFYUI_BATCH_CONCURRENCY = int(os.getenv('COMFYUI_BATCH_CONCURRENCY', '4'))
 
 
 class ComfyUIClient:
@@ -38,19 +50,264 @@ class ComfyUIClient:
                 raise ValueError(f"Unsupported executor type: {self.executor_type}")
         return self._executor
     
-    async def execute_workflow(self, workflow_file: str, params: Dict[str, Any] = None) -> ExecuteResult:
+    async def execute_workflow(
+        self,
+        workflow_file: str,
+        params: Dict[str, Any] = None,
+        ctx: Any = None,
+        on_queued: Optional[QueuedCallback] = None,
+        on_progress: Optional[ProgressCallback] = None,
+        use_cache: bool = True,
+    ) -> ExecuteResult:
         """
         执行工作流
         
         Args:
             workflow_file: 工作流文件路径
             params: 工作流参数
+            ctx: MCP 请求上下文，用于接续客户端传递的 trace context
+            on_queued: 工作流提交到ComfyUI队列后的回调
+            on_progress: 执行进度回调，默认转发为 ctx 的 MCP progress 通知
+            use_cache: 是否使用结果缓存，False 时强制重新执行
             
         Returns:
             执行结果
         """
         executor = self._get_executor()
-        return await executor.execute_workflow(workflow_file, params)
+        workflow_name = Path(workflow_file).stem
+        with request_context(workflow_name, ctx):
+            return await self._execute_with_metrics(
+                workflow_name,
+                lambda: executor.execute_workflow(workflow_file, params, on_queued, on_progress or ctx_progress_callback(ctx), use_cache),
+                carrier=trace_util.get_carrier_from_ctx(ctx),
+            )
+    
+    async def execute_template(
+        self,
+        metadata: WorkflowMetadata,
+        template: WorkflowTemplate,
+        params: Dict[str, Any] = None,
+        ctx: Any = None,
+        on_queued: Optional[QueuedCallback] = None,
+        on_progress: Optional[ProgressCallback] = None,
+        use_cache: bool = True,
+        content_hash: Optional[str] = None,
+    ) -> ExecuteResult:
+        """
+        使用调用方已加载的工作流模板执行，不读取工作流文件
+        
+        Args:
+            metadata: 工作流元数据
+            template: 工作流模板
+            params: 工作流参数
+            ctx: MCP 请求上下文
+            on_queued: 工作流提交到ComfyUI队列后的回调
+            on_progress: 执行进度回调，默认转发为 ctx 的 MCP progress 通知
+            use_cache: 是否使用结果缓存
+            content_hash: 工作流版本的内容哈希，调用被转为后台任务时使用同一版本
+            
+        Returns:
+            执行结果
+        """
+        executor = self._get_executor()
+        workflow_name = metadata.title
+        with request_context(workflow_name, ctx, content_hash=content_hash):
+            return await self._execute_with_metrics(
+                workflow_name,
+                lambda: executor.execute_template(metadata, template, params, on_queued, on_progress or ctx_progress_callback(ctx), use_cache),
+                carrier=trace_util.get_carrier_from_ctx(ctx),
+            )
+    
+    async def resume_workflow(self, workflow_file: str, prompt_id: str) -> ExecuteResult:
+        """
+        重新接管已提交到ComfyUI的工作流任务并等待结果
+        
+        Args:
+            workflow_file: 工作流文件路径，用于解析输出节点
+            prompt_id: ComfyUI任务ID
+            
+        Returns:
+            执行结果
+        """
+        try:
+            metadata, _ = self._get_executor().load_workflow_template(workflow_file)
+        except Exception as e:
+            return ExecuteResult(status="error", prompt_id=prompt_id, msg=str(e))
+        return await self.resume_template(metadata, prompt_id)
+    
+    async def resume_template(self, metadata: WorkflowMetadata, prompt_id: str) -> ExecuteResult:
+        """
+        使用提交时的工作流元数据重新接管已提交到ComfyUI的任务并等待结果
+        
+        Args:
+            metadata: 工作流元数据，用于解析输出节点
+            prompt_id: ComfyUI任务ID
+            
+        Returns:
+            执行结果
+        """
+        executor = self._get_executor()
+        # WebSocket只能收到本连接提交的任务事件，接管已有任务统一使用HTTP轮询
+        http_executor = executor if isinstance(executor, HttpExecutor) else HttpExecutor(executor.base_url)
+        return await self._execute_with_metrics(
+            metadata.title,
+            lambda: http_executor.resume_prompt(metadata, prompt_id),
+        )
+    
+    async def cancel_prompt(self, prompt_id: str) -> bool:
+        """取消ComfyUI中排队或执行中的任务"""
+        return await self._get_executor().cancel_prompt(prompt_id)
+    
+    async def execute_workflow_batch(
+        self,
+        workflow_file: str,
+        params_list: List[Dict[str, Any]],
+        concurrency: Optional[int] = None,
+        ctx: Any = None,
+        on_result: Optional[Callable[[int, ExecuteResult, int], Awaitable[None]]] = None,
+        use_cache: bool = True,
+    ) -> BatchExecuteResult:
+        """
+        批量执行同一个工作流文件
+        
+        Args:
+            workflow_file: 工作流文件路径
+            params_list: 每次执行的工作流参数列表
+            concurrency: 最大并发数，默认使用 COMFYUI_BATCH_CONCURRENCY
+            ctx: MCP 请求上下文，用于接续客户端传递的 trace context
+            on_result: 单项完成回调，参数为 (序号, 执行结果, 已完成数量)
+            use_cache: 是否使用结果缓存
+            
+        Returns:
+            批量执行结果，results 与 params_list 顺序一致
+        """
+        start_time = time.time()
+        try:
+            metadata, template = self._get_executor().load_workflow_template(workflow_file)
+        except Exception as e:
+            results = [ExecuteResult(status="error", msg=str(e)) for _ in params_list]
+            return BatchExecuteResult.from_results(results, time.time() - start_time)
+        return await self.execute_template_batch(metadata, template, params_list, concurrency, ctx, on_result, use_cache)
+    
+    async def execute_template_batch(
+        self,
+        metadata: WorkflowMetadata,
+        template: WorkflowTemplate,
+        params_list: List[Dict[str, Any]],
+        concurrency: Optional[int] = None,
+        ctx: Any = None,
+        on_result: Optional[Callable[[int, ExecuteResult, int], Awaitable[None]]] = None,
+        use_cache: bool = True,
+        content_hash: Optional[str] = None,
+    ) -> BatchExecuteResult:
+        """
+        使用调用方已加载的工作流模板批量执行
+        
+        所有参数组使用同一个模板，以有限并发流水线式提交到ComfyUI，
+        先完成的任务先通过 on_result 回调返回
+        
+        Args:
+            metadata: 工作流元数据
+            template: 工作流模板
+            params_list: 每次执行的工作流参数列表
+            concurrency: 最大并发数，默认使用 COMFYUI_BATCH_CONCURRENCY
+            ctx: MCP 请求上下文，用于接续客户端传递的 trace context
+            on_result: 单项完成回调，参数为 (序号, 执行结果, 已完成数量)
+            use_cache: 是否使用结果缓存
+            content_hash: 工作流版本的内容哈希
+            
+        Returns:
+            批量执行结果，results 与 params_list 顺序一致
+        """
+        executor = self._get_executor()
+        workflow_name = metadata.title
+        concurrency = max(1, concurrency or COMFYUI_BATCH_CONCURRENCY)
+        start_time = time.time()
+        results: List[Optional[ExecuteResult]] = [None] * len(params_list)
+        attributes = {
+            "workflow.name": workflow_name,
+            "comfyui.executor": self.executor_type,
+            "batch.size": len(params_list),
+            "batch.concurrency": concurrency,
+        }
+        
+        with trace_util.start_span("workflow.execute_batch", attributes, carrier=trace_util.get_carrier_from_ctx(ctx)) as span, \
+                request_context(workflow_name, ctx, content_hash=content_hash):
+            semaphore = asyncio.Semaphore(concurrency)
+            
+            async def run_item(index: int, params: Dict[str, Any]):
+                async with semaphore:
+                    try:
+                        result = await self._execute_with_metrics(
+                            workflow_name,
+                            lambda: executor.execute_template(metadata, template, params, use_cache=use_cache),
+                            extra_attributes={"batch.index": index},
+                        )
+                    except Exception as e:
+                        # 单项异常只记为该项失败，不影响其余参数组
+                        logger.error(f"批量执行第 {index} 项异常: {e}", exc_info=True)
+                        result = ExecuteResult(status="error", msg=str(e))
+                    return index, result
+            
+            tasks = [asyncio.create_task(run_item(index, params or {})) for index, params in enumerate(params_list)]
+            try:
+                for completed, task in enumerate(asyncio.as_completed(tasks), 1):
+                    index, result = await task
+                    results[index] = result
+                    if on_result:
+                        try:
+                            await on_result(index, result, completed)
+                        except Exception as e:
+                            logger.warning(f"批量执行结果回调失败: {e}")
+            finally:
+                # 调用方取消时一并取消未完成的任务，并等待其退出
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+            
+            batch_result = BatchExecuteResult.from_results(results, time.time() - start_time)
+            span.set_attributes({
+                "batch.status": batch_result.status,
+                "batch.succeeded": batch_result.succeeded,
+                "batch.failed": batch_result.failed,
+            })
+            return batch_result
+    
+    async def _execute_with_metrics(
+        self,
+        workflow_name: str,
+        run: Callable[[], Awaitable[ExecuteResult]],
+        carrier: Optional[Dict[str, str]] = None,
+        extra_attributes: Optional[Dict[str, Any]] = None,
+    ) -> ExecuteResult:
+        """在 workflow.execute span 内执行一次工作流并记录指标"""
+        attributes = {
+            "workflow.name": workflow_name,
+            "comfyui.executor": self.executor_type,
+            **(extra_attributes or {}),
+        }
+        start_time = time.time()
+        status = "error"
+        metrics_util.WORKFLOW_IN_FLIGHT.labels(workflow=workflow_name).inc()
+        try:
+            with trace_util.start_span("workflow.execute", attributes, carrier=carrier) as span:
+                result = await run()
+                status = result.status
+                span.set_attribute("workflow.status", result.status)
+                span.set_attribute("workflow.cached", result.cached)
+                if result.prompt_id:
+                    span.set_attribute("comfyui.prompt_id", result.prompt_id)
+                return result
+        finally:
+            metrics_util.WORKFLOW_IN_FLIGHT.labels(workflow=workflow_name).dec()
+            metrics_util.WORKFLOW_DURATION.labels(workflow=workflow_name, status=status).observe(time.time() - start_time)
+    
+    async def refresh_queue_metrics(self):
+        """刷新ComfyUI队列深度指标"""
+        executor = self._get_executor()
+        queue_status = await executor.get_queue_status()
+        for state, prompt_ids in queue_status.items():
+            metrics_util.COMFYUI_QUEUE_DEPTH.labels(backend=executor.base_url, state=state).set(len(prompt_ids))
     
     def get_workflow_metadata(self, workflow_file: str):
         """
@@ -68,21 +325,103 @@ class ComfyUIClient:
 
 # 创建默认客户端实例
 default_client = ComfyUIClient()
+metrics_util.add_collect_hook(default_client.refresh_queue_metrics)
 
 
 # 提供便捷的函数接口
-async def execute_workflow(workflow_file: str, params: Dict[str, Any] = None) -> ExecuteResult:
+async def execute_workflow(workflow_file: str, params: Dict[str, Any] = None, ctx: Any = None, use_cache: bool = True) -> ExecuteResult:
     """
     执行工作流的便捷函数
     
     Args:
         workflow_file: 工作流文件路径
         params: 工作流参数
+        ctx: MCP 请求上下文
+        use_cache: 是否使用结果缓存
         
     Returns:
         执行结果
     """
-    return await default_client.execute_workflow(workflow_file, params)
+    return await default_client.execute_workflow(workflow_file, params, ctx, use_cache=use_cache)
+
+
+async def execute_template(
+    metadata: WorkflowMetadata,
+    template: WorkflowTemplate,
+    params: Dict[str, Any] = None,
+    ctx: Any = None,
+    use_cache: bool = True,
+    content_hash: Optional[str] = None,
+) -> ExecuteResult:
+    """
+    执行已加载的工作流模板的便捷函数
+    
+    Args:
+        metadata: 工作流元数据
+        template: 工作流模板
+        params: 工作流参数
+        ctx: MCP 请求上下文
+        use_cache: 是否使用结果缓存
+        content_hash: 工作流版本的内容哈希
+        
+    Returns:
+        执行结果
+    """
+    return await default_client.execute_template(metadata, template, params, ctx, use_cache=use_cache, content_hash=content_hash)
+
+
+async def execute_workflow_batch(
+    workflow_file: str,
+    params_list: List[Dict[str, Any]],
+    concurrency: Optional[int] = None,
+    ctx: Any = None,
+    on_result: Optional[Callable[[int, ExecuteResult, int], Awaitable[None]]] = None,
+    use_cache: bool = True,
+) -> BatchExecuteResult:
+    """
+    批量执行工作流的便捷函数
+    
+    Args:
+        workflow_file: 工作流文件路径
+        params_list: 每次执行的工作流参数列表
+        concurrency: 最大并发数
+        ctx: MCP 请求上下文
+        on_result: 单项完成回调
+        use_cache: 是否使用结果缓存
+        
+    Returns:
+        批量执行结果
+    """
+    return await default_client.execute_workflow_batch(workflow_file, params_list, concurrency, ctx, on_result, use_cache)
+
+
+async def execute_template_batch(
+    metadata: WorkflowMetadata,
+    template: WorkflowTemplate,
+    params_list: List[Dict[str, Any]],
+    concurrency: Optional[int] = None,
+    ctx: Any = None,
+    on_result: Optional[Callable[[int, ExecuteResult, int], Awaitable[None]]] = None,
+    use_cache: bool = True,
+    content_hash: Optional[str] = None,
+) -> BatchExecuteResult:
+    """
+    批量执行已加载的工作流模板的便捷函数
+    
+    Args:
+        metadata: 工作流元数据
+        template: 工作流模板
+        params_list: 每次执行的工作流参数列表
+        concurrency: 最大并发数
+        ctx: MCP 请求上下文
+        on_result: 单项完成回调
+        use_cache: 是否使用结果缓存
+        content_hash: 工作流版本的内容哈希
+        
+    Returns:
+        批量执行结果
+    """
+    return await default_client.execute_template_batch(metadata, template, params_list, concurrency, ctx, on_result, use_cache, content_hash)
 
 
 def get_workflow_metadata(workflow_file: str):
@@ -0,0 +1,145 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+"""
+工作流图分析工具
+基于应用参数后的工作流（API格式）计算规范化哈希、判断执行结果是否确定；
+加载时分析节点间的连接，找出不影响声明输出的节点
+"""
+
+import os
+import json
+import hashlib
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set
+
+# 额外的非确定性节点类型（逗号分隔），包含这些节点的工作流不做结果缓存
+COMFYUI_NONDETERMINISTIC_NODES = {
+    node_type.strip()
+    for node_type in os.getenv('COMFYUI_NONDETERMINISTIC_NODES', '').split(',')
+    if node_type.strip()
+}
+
+# 执行前移除不影响声明输出的节点（如未声明为输出的预览节点），关闭后只在加载时给出警告
+WORKFLOW_PRUNE_UNUSED_NODES = os.getenv('WORKFLOW_PRUNE_UNUSED_NODES', 'true').lower() == 'true'
+
+# 只在界面预览、不落盘的节点类型，未声明为输出时视为无用节点
+# PreviewAny 的文本结果会出现在任务的输出中，可能被用作文本输出，不在此列
+PREVIEW_NODE_TYPES = {
+    'PreviewImage',
+    'PreviewAudio',
+    'MaskPreview',
+}
+# 额外的预览节点类型（逗号分隔）
+PREVIEW_NODE_TYPES |= {
+    node_type.strip()
+    for node_type in os.getenv('WORKFLOW_PREVIEW_NODES', '').split(',')
+    if node_type.strip()
+}
+
+
+def canonical_graph_hash(workflow_data: Dict[str, Any], media_digests: Optional[Dict[str, str]] = None) -> str:
+    """
+    计算工作流图的规范化哈希
+
+    忽略只影响界面展示的 _meta 字段，键排序后序列化；
+    media_digests 为上传到ComfyUI的输入文件名到内容哈希的映射，哈希时用内容哈希代替文件名，
+    每次上传的文件名不同，内容相同的输入得到相同的哈希，同名不同内容的输入得到不同的哈希
+    """
+    media_digests = {name: digest for name, digest in (media_digests or {}).items() if digest}
+    graph = {
+        node_id: _canonical_node(node, media_digests) if isinstance(node, dict) else node
+        for node_id, node in workflow_data.items()
+    }
+    serialized = json.dumps({"graph": graph}, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+def _canonical_node(node: Dict[str, Any], media_digests: Dict[str, str]) -> Dict[str, Any]:
+    canonical = {k: v for k, v in node.items() if k != "_meta"}
+    inputs = canonical.get("inputs")
+    if media_digests and isinstance(inputs, dict):
+        canonical["inputs"] = {
+            field: f"media:{media_digests[value]}" if isinstance(value, str) and value in media_digests else value
+            for field, value in inputs.items()
+        }
+    return canonical
+
+
+def _is_random_seed(field: str, value: Any) -> bool:
+    """种子字段取负数（通常为-1）时由节点在执行时随机生成"""
+    return "seed" in field.lower() and isinstance(value, (int, float)) and not isinstance(value, bool) and value < 0
+
+
+def is_deterministic(workflow_data: Dict[str, Any]) -> bool:
+    """判断工作流相同输入是否产生相同结果，含随机种子或非确定性节点时返回 False"""
+    for node in workflow_data.values():
+        if not isinstance(node, dict):
+            continue
+        if node.get("class_type") in COMFYUI_NONDETERMINISTIC_NODES:
+            return False
+        for field, value in (node.get("inputs") or {}).items():
+            if _is_random_seed(field, value):
+                return False
+    return True
+
+
+class GraphAnalysis(NamedTuple):
+    """工作流图的静态分析结果"""
+    # 需要收集结果的节点，None 表示没有声明输出，收集所有节点的结果
+    output_node_ids: Optional[List[str]]
+    # 不影响任何输出的节点，执行前可以移除
+    unused_node_ids: List[str]
+
+
+def _upstream_node_ids(node: Any) -> Iterable[str]:
+    """节点 inputs 中以 [node_id, slot] 形式连接的上游节点"""
+    if not isinstance(node, dict):
+        return
+    for value in (node.get("inputs") or {}).values():
+        if isinstance(value, list) and len(value) == 2 and isinstance(value[0], (str, int)) and isinstance(value[1], int):
+            yield str(value[0])
+
+
+def reachable_node_ids(workflow_data: Dict[str, Any], targets: Iterable[str]) -> Set[str]:
+    """targets 及其所有上游节点"""
+    reachable: Set[str] = set()
+    stack = [node_id for node_id in targets if node_id in workflow_data]
+    while stack:
+        node_id = stack.pop()
+        if node_id in reachable:
+            continue
+        reachable.add(node_id)
+        stack.extend(upstream for upstream in _upstream_node_ids(workflow_data[node_id]) if upstream in workflow_data and upstream not in reachable)
+    return reachable
+
+
+def analyze_graph(
+    workflow_data: Dict[str, Any],
+    declared_output_ids: Iterable[str],
+    keep_node_ids: Iterable[str] = (),
+    ignored_node_ids: Iterable[str] = (),
+) -> GraphAnalysis:
+    """
+    分析工作流图中哪些节点影响输出
+
+    没有被其他节点使用的节点中，声明的输出节点与非预览节点（可能是未识别的自定义输出节点）都视为输出，
+    未声明的预览节点只产生临时文件；不是任何输出的上游的节点即为无用节点。
+    keep_node_ids 为被参数修改的节点，即使无用也保留；ignored_node_ids 为只承载配置的节点（如MCP节点），不视为输出。
+    没有声明输出时无法判断调用方需要哪些结果，保持原样。
+    """
+    declared = [node_id for node_id in declared_output_ids if node_id in workflow_data]
+    if not declared:
+        return GraphAnalysis(output_node_ids=None, unused_node_ids=[])
+
+    consumed = {upstream for node in workflow_data.values() for upstream in _upstream_node_ids(node)}
+    skipped = set(declared) | set(ignored_node_ids)
+    outputs = list(declared)
+    for node_id, node in workflow_data.items():
+        if node_id in consumed or node_id in skipped or not isinstance(node, dict):
+            continue
+        if node.get("class_type") not in PREVIEW_NODE_TYPES:
+            outputs.append(node_id)
+
+    reachable = reachable_node_ids(workflow_data, [*outputs, *keep_node_ids])
+    unused = [node_id for node_id in workflow_data if node_id not in reachable]
+    return GraphAnalysis(output_node_ids=outputs, unused_node_ids=unused)
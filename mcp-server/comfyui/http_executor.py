@@ -1,15 +1,17 @@
 # Copyright (C) 2025 AIDC-AI
 # This project is licensed under the MIT License (SPDX-License-identifier: MIT).
 
-import os
-import json
 import time
 import uuid
 import asyncio
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Set
 
-from comfyui.base_executor import ComfyUIExecutor, COMFYUI_API_KEY, logger
+from comfyui.workflow_template import dumps_prompt
+from comfyui.base_executor import ComfyUIExecutor, QueuedCallback, COMFYUI_API_KEY, logger
 from comfyui.models import ExecuteResult
+from comfyui.progress import ProgressCallback
+from comfyui.workflow_parser import WorkflowMetadata
+from utils import trace_util, json_util
 
 
 class HttpExecutor(ComfyUIExecutor):
@@ -29,7 +31,7 @@ class HttpExecutor(ComfyUIExecutor):
         if prompt_ext_params:
             prompt_data.update(prompt_ext_params)
         
-        json_data = json.dumps(prompt_data)
+        json_data = dumps_prompt(prompt_data)
         
         # 准备请求头
         headers = {"Content-Type": "application/json"}
@@ -50,14 +52,14 @@ class HttpExecutor(ComfyUIExecutor):
                     response_text = await response.text()
                     raise Exception(f"提交工作流失败: [{response.status}] {response_text}")
                 
-                result = await response.json()
+                result = await response.json(loads=json_util.loads)
                 prompt_id = result.get("prompt_id")
                 if not prompt_id:
                     raise Exception(f"获取prompt_id失败: {result}")
                 logger.info(f"任务已提交: {prompt_id}")
                 return prompt_id
 
-    async def _wait_for_results(self, prompt_id: str, client_id: str, timeout: Optional[int] = None, output_id_2_var: Optional[Dict[str, str]] = None) -> ExecuteResult:
+    async def _wait_for_results(self, prompt_id: str, client_id: str, timeout: Optional[int] = None, output_id_2_var: Optional[Dict[str, str]] = None, output_node_ids: Optional[Set[str]] = None) -> ExecuteResult:
         """等待工作流执行结果（HTTP方式）"""
         start_time = time.time()
         logger.info(f"HTTP方式等待执行结果，prompt_id: {prompt_id}, client_id: {client_id}")
@@ -93,7 +95,7 @@ class HttpExecutor(ComfyUIExecutor):
                     if response.status != 200:
                         await asyncio.sleep(1.0)
                         continue
-                    history_data = await response.json()
+                    history_data = await response.json(loads=json_util.loads)
                     if prompt_id not in history_data:
                         await asyncio.sleep(1.0)
                         continue
@@ -117,16 +119,18 @@ class HttpExecutor(ComfyUIExecutor):
                         return result
                     
                     if "outputs" in prompt_history:
-                        result.outputs = prompt_history["outputs"]
+                        outputs = self._select_outputs(prompt_history["outputs"], output_node_ids)
+                        result.outputs = outputs
                         result.status = "completed"
+                        self._record_phases_from_status(prompt_id, start_time, status)
 
-                        # 按文件扩展名收集所有图片、视频、音频和文本输出
+                        # 按文件扩展名收集输出节点的图片、视频、音频和文本输出
                         output_id_2_images = {}
                         output_id_2_videos = {}
                         output_id_2_audios = {}
                         output_id_2_texts = {}
                         
-                        for node_id, node_output in prompt_history["outputs"].items():
+                        for node_id, node_output in outputs.items():
                             images, videos, audios = self._split_media_by_suffix(node_output, base_url)
                             if images:
                                 output_id_2_images[node_id] = images
@@ -167,35 +171,24 @@ class HttpExecutor(ComfyUIExecutor):
                         return result
             await asyncio.sleep(1.0)
 
-    async def execute_workflow(self, workflow_file: str, params: Dict[str, Any] = None) -> ExecuteResult:
-        """执行工作流（HTTP方式）"""
+    async def resume_prompt(self, metadata: WorkflowMetadata, prompt_id: str) -> ExecuteResult:
+        """重新接管已提交到ComfyUI的任务（如服务重启后），通过 /history 轮询等待结果"""
         try:
-            if not os.path.exists(workflow_file):
-                logger.error(f"工作流文件不存在: {workflow_file}")
-                return ExecuteResult(status="error", msg=f"工作流文件不存在: {workflow_file}")
+            if not await self.prompt_exists(prompt_id):
+                return ExecuteResult(status="error", prompt_id=prompt_id, msg="任务在ComfyUI中已不存在")
             
-            # 获取工作流元数据
-            metadata = self.get_workflow_metadata(workflow_file)
-            if not metadata:
-                return ExecuteResult(status="error", msg="无法解析工作流元数据")
-            
-            # 加载工作流JSON
-            with open(workflow_file, 'r', encoding='utf-8') as f:
-                workflow_data = json.load(f)
-            
-            if not workflow_data:
-                return ExecuteResult(status="error", msg="工作流数据缺失")
-            
-            # 使用新的参数映射逻辑
-            if params:
-                workflow_data = await self._apply_params_to_workflow(workflow_data, metadata, params)
-            else:
-                # 即使没有传入参数，也需要应用默认值
-                workflow_data = await self._apply_params_to_workflow(workflow_data, metadata, {})
-            
-            # 从元数据提取输出节点信息
             output_id_2_var = self._extract_output_nodes(metadata)
-            
+            output_node_ids = self._extract_collect_node_ids(metadata)
+            with trace_util.start_span("comfyui.wait", {"comfyui.prompt_id": prompt_id, "comfyui.resumed": True}):
+                result = await self._wait_for_results(prompt_id, "", None, output_id_2_var, output_node_ids)
+            return await self.transfer_result_files(result)
+        except Exception as e:
+            logger.error(f"接管任务出错: {str(e)}", exc_info=True)
+            return ExecuteResult(status="error", prompt_id=prompt_id, msg=str(e))
+
+    async def _execute_prompt(self, workflow_data: Dict[str, Any], output_id_2_var: Dict[str, str], on_queued: Optional[QueuedCallback] = None, on_progress: Optional[ProgressCallback] = None, output_node_ids: Optional[Set[str]] = None) -> ExecuteResult:
+        """提交已应用参数的工作流并等待结果（HTTP方式），HTTP轮询拿不到节点级进度，只通知排队状态"""
+        try:
             # 生成客户端ID
             client_id = str(uuid.uuid4())
             
@@ -212,17 +205,24 @@ class HttpExecutor(ComfyUIExecutor):
             
             # 提交工作流到ComfyUI队列
             try:
-                prompt_id = await self._queue_prompt(workflow_data, client_id, prompt_ext_params)
+                with trace_util.start_span("comfyui.queue_prompt"):
+                    prompt_id = await self._queue_prompt(workflow_data, client_id, prompt_ext_params)
             except Exception as e:
                 error_message = f"提交工作流失败: [{type(e)}] {str(e)}"
                 logger.error(error_message)
                 return ExecuteResult(status="error", msg=error_message)
+            await self._notify_queued(on_queued, prompt_id)
+            if on_progress:
+                await on_progress(0, "Queued", None)
             
-            # 等待结果
-            result = await self._wait_for_results(prompt_id, client_id, None, output_id_2_var)
+            # 等待结果，调用方取消时一并停止ComfyUI中的任务
+            try:
+                with trace_util.start_span("comfyui.wait", {"comfyui.prompt_id": prompt_id}):
+                    result = await self._wait_for_results(prompt_id, client_id, None, output_id_2_var, output_node_ids)
+            except asyncio.CancelledError:
+                await self._abort_prompt(prompt_id)
+                raise
             
-            # 转存结果文件
-            result = await self.transfer_result_files(result)
             return result
             
         except Exception as e:
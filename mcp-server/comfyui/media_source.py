@@ -0,0 +1,125 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+"""
+输入媒体读取
+以流的方式读取媒体源并同步计算内容哈希，不落临时文件；
+mcp-base 托管的文件优先从共享存储目录读取，或改用内网地址下载
+"""
+
+import os
+import asyncio
+import hashlib
+import mimetypes
+from urllib.parse import urlparse
+from typing import AsyncIterator, Dict, Optional
+
+import aiohttp
+
+from utils.file_uploader import MCP_BASE_URL
+from utils import metrics_util
+
+# 配置变量
+# mcp-base 返回的文件URL前缀（即 base 的 public_read_url），默认与 MCP_BASE_URL 相同
+MCP_BASE_PUBLIC_URL = (os.getenv('MCP_BASE_PUBLIC_URL') or MCP_BASE_URL).rstrip('/')
+# 与 mcp-base 共享文件系统时，填写其 local_storage_path 对应的本地目录，直接读取文件
+MCP_BASE_STORAGE_PATH = os.getenv('MCP_BASE_STORAGE_PATH', '')
+
+CHUNK_SIZE = 256 * 1024
+
+
+def get_mcp_base_file_id(url: str) -> Optional[str]:
+    """mcp-base 托管的文件URL返回文件ID，否则返回 None"""
+    for prefix in {MCP_BASE_PUBLIC_URL, MCP_BASE_URL.rstrip('/')}:
+        if url.startswith(f"{prefix}/files/"):
+            file_id = url[len(prefix) + len("/files/"):].split('?', 1)[0]
+            # 文件ID不允许包含路径
+            if file_id and os.path.basename(file_id) == file_id:
+                return file_id
+    return None
+
+
+def is_mcp_base_file(url: str) -> bool:
+    """mcp-base 的文件ID每次上传都不同，URL对应的内容不会变化"""
+    return get_mcp_base_file_id(url) is not None
+
+
+class MediaSource:
+    """
+    单个媒体源，chunks() 逐块产出内容，读取完成后 digest / size 可用
+
+    读取顺序：共享存储目录中的本地文件 -> mcp-base 内网地址 -> 原始URL
+    """
+
+    def __init__(self, url: str, session: aiohttp.ClientSession, headers: Optional[Dict[str, str]] = None):
+        self.url = url
+        self.session = session
+        self.headers = headers or {}
+        self.local_path: Optional[str] = None
+        self.fetch_url = url
+        self.etag: Optional[str] = None
+        self.last_modified: Optional[str] = None
+        self.size = 0
+        self._hasher = hashlib.sha256()
+        self._response: Optional[aiohttp.ClientResponse] = None
+
+        file_id = get_mcp_base_file_id(url)
+        if file_id:
+            local_path = os.path.join(MCP_BASE_STORAGE_PATH, file_id) if MCP_BASE_STORAGE_PATH else None
+            if local_path and os.path.isfile(local_path):
+                self.local_path = local_path
+            else:
+                self.fetch_url = f"{MCP_BASE_URL.rstrip('/')}/files/{file_id}"
+
+        path = urlparse(url).path
+        self.suffix = os.path.splitext(os.path.basename(path))[1] or ".jpg"
+        self.content_type = mimetypes.guess_type(f"media{self.suffix}")[0] or 'application/octet-stream'
+
+    @property
+    def digest(self) -> str:
+        return self._hasher.hexdigest()
+
+    async def open(self):
+        """打开媒体源，远程源在此发起请求并检查状态"""
+        if self.local_path:
+            return
+        self._response = await self.session.get(self.fetch_url, headers=self.headers)
+        if self._response.status != 200:
+            self._response.release()
+            raise Exception(f"下载媒体失败: HTTP {self._response.status}")
+        self.etag = self._response.headers.get("ETag")
+        self.last_modified = self._response.headers.get("Last-Modified")
+
+    async def hash_local(self) -> str:
+        """本地文件可以在上传前计算哈希，用于按内容复用已上传的文件"""
+        def compute():
+            hasher = hashlib.sha256()
+            with open(self.local_path, 'rb') as f:
+                for block in iter(lambda: f.read(CHUNK_SIZE), b''):
+                    hasher.update(block)
+            return hasher.hexdigest()
+
+        return await asyncio.to_thread(compute)
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        if self.local_path:
+            with open(self.local_path, 'rb') as f:
+                for block in iter(lambda: f.read(CHUNK_SIZE), b''):
+                    self._consume(block)
+                    yield block
+            return
+        try:
+            async for block in self._response.content.iter_chunked(CHUNK_SIZE):
+                self._consume(block)
+                yield block
+        finally:
+            self._response.release()
+
+    def _consume(self, block: bytes):
+        self._hasher.update(block)
+        self.size += len(block)
+        metrics_util.TRANSFER_BYTES.labels(direction="source_to_comfyui").inc(len(block))
+
+    def close(self):
+        if self._response is not None:
+            self._response.release()
@@ -19,6 +19,8 @@ class ExecuteResult(BaseModel):
     texts_by_var: Dict[str, List[str]] = Field(default_factory=dict, description="Texts grouped by variable name")
     outputs: Optional[Dict[str, Any]] = Field(None, description="Raw outputs")
     msg: Optional[str] = Field(None, description="Message")
+    cached: bool = Field(False, description="Whether the result was served from the result cache")
+    eta: Optional[float] = Field(None, description="Estimated seconds until completion when the request was rejected or deferred")
     
     def to_llm_result(self) -> str:
         """Convert to a result string readable by LLM"""
@@ -46,3 +48,33 @@ class ExecuteResult(BaseModel):
             if self.msg:
                 result += f", message: {self.msg}"
             return result
+
+
+class BatchExecuteResult(BaseModel):
+    """Batch execution result model"""
+    status: str = Field(description="Batch status: completed / partial / error")
+    total: int = Field(0, description="Number of items in the batch")
+    succeeded: int = Field(0, description="Number of items completed successfully")
+    failed: int = Field(0, description="Number of items that failed")
+    duration: Optional[float] = Field(None, description="Batch duration (in seconds)")
+    results: List[ExecuteResult] = Field(default_factory=list, description="Results in the same order as the input params")
+
+    @classmethod
+    def from_results(cls, results: List[ExecuteResult], duration: Optional[float] = None) -> "BatchExecuteResult":
+        """Build the batch summary from per-item results"""
+        succeeded = sum(1 for r in results if r.status == "completed")
+        failed = len(results) - succeeded
+        if failed == 0:
+            status = "completed"
+        elif succeeded == 0:
+            status = "error"
+        else:
+            status = "partial"
+        return cls(status=status, total=len(results), succeeded=succeeded, failed=failed, duration=duration, results=results)
+
+    def to_llm_result(self) -> str:
+        """Convert to a result string readable by LLM"""
+        lines = [f"Batch finished: {self.succeeded}/{self.total} succeeded"]
+        for index, result in enumerate(self.results):
+            lines.append(f"[{index}] {result.to_llm_result()}")
+        return "\n".join(lines)
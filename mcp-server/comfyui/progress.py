@@ -0,0 +1,182 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+"""
+ComfyUI 执行进度跟踪
+将 WebSocket 的 executing / progress / execution_cached 事件换算为整体进度百分比，
+按时间间隔限流后回调，可选地将预览帧缩小后上传
+"""
+
+import io
+import os
+import json
+import time
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from PIL import Image
+
+from core import logger
+from utils.file_uploader import upload
+
+# 配置变量
+COMFYUI_PROGRESS_INTERVAL = float(os.getenv('COMFYUI_PROGRESS_INTERVAL', '1.0'))
+COMFYUI_PREVIEW_ENABLED = os.getenv('COMFYUI_PREVIEW_ENABLED', 'false').lower() == 'true'
+COMFYUI_PREVIEW_INTERVAL = float(os.getenv('COMFYUI_PREVIEW_INTERVAL', '3.0'))
+COMFYUI_PREVIEW_MAX_SIZE = int(os.getenv('COMFYUI_PREVIEW_MAX_SIZE', '256'))
+
+# 进度消息中预览图地址的分隔标记，客户端据此解析预览图
+PREVIEW_MARKER = " | preview: "
+
+# ComfyUI 二进制消息类型
+BINARY_EVENT_PREVIEW_IMAGE = 1
+BINARY_EVENT_PREVIEW_IMAGE_WITH_METADATA = 4
+
+# 进度回调，参数为 (百分比, 描述, 预览图URL)
+ProgressCallback = Callable[[float, str, Optional[str]], Awaitable[None]]
+
+
+def _encode_preview(image_bytes: bytes) -> bytes:
+    """将预览帧缩小并压缩为JPEG"""
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        img = img.convert("RGB")
+        img.thumbnail((COMFYUI_PREVIEW_MAX_SIZE, COMFYUI_PREVIEW_MAX_SIZE))
+        buffer = io.BytesIO()
+        img.save(buffer, format="JPEG", quality=70)
+        return buffer.getvalue()
+
+
+class ProgressTracker:
+    """跟踪单个prompt的执行进度"""
+
+    def __init__(self, prompt_id: Optional[str], workflow_data: Dict[str, Any], callback: ProgressCallback):
+        self.prompt_id = prompt_id
+        self.callback = callback
+        self.node_types = {
+            node_id: node.get("class_type", "")
+            for node_id, node in workflow_data.items()
+            if isinstance(node, dict)
+        }
+        self.total_nodes = max(len(self.node_types), 1)
+        self.done_nodes: Set[str] = set()
+        self.current_node: Optional[str] = None
+        self.node_progress = 0.0
+        self.message = "Queued"
+        self.percent = 0.0
+        self._last_sent_at = 0.0
+        self._last_preview_at = 0.0
+        self._preview_task: Optional[asyncio.Task] = None
+
+    def _describe_node(self, node_id: str) -> str:
+        class_type = self.node_types.get(node_id)
+        return f"{class_type} (#{node_id})" if class_type else f"#{node_id}"
+
+    def _update_percent(self):
+        done = len(self.done_nodes) + self.node_progress
+        # 进度只增不减，避免节点数估算偏差导致回退
+        self.percent = max(self.percent, min(done / self.total_nodes * 100, 99.0))
+
+    async def start(self, prompt_id: str):
+        """任务提交到队列后调用，立即发送一次排队状态"""
+        self.prompt_id = prompt_id
+        await self._report(force=True)
+
+    async def on_message(self, msg_type: str, data: Dict[str, Any]):
+        """处理属于本prompt的WebSocket文本消息"""
+        if msg_type == 'execution_start':
+            self.message = "Started"
+        elif msg_type == 'execution_cached':
+            self.done_nodes.update(str(node) for node in data.get('nodes', []))
+            self._update_percent()
+        elif msg_type == 'executing':
+            node_id = data.get('node')
+            if self.current_node is not None:
+                self.done_nodes.add(self.current_node)
+            if node_id is None:
+                # 执行结束
+                self.current_node = None
+                self.percent = 100.0
+                self.message = "Finished"
+                await self._report(force=True)
+                return
+            self.current_node = str(node_id)
+            self.node_progress = 0.0
+            self.message = f"Executing {self._describe_node(self.current_node)}"
+            self._update_percent()
+        elif msg_type == 'progress':
+            value = data.get('value', 0)
+            maximum = data.get('max') or 1
+            node_id = data.get('node')
+            if node_id is not None:
+                self.current_node = str(node_id)
+            self.node_progress = min(value / maximum, 1.0)
+            self.message = f"Executing {self._describe_node(self.current_node)} {value}/{maximum}"
+            self._update_percent()
+        else:
+            return
+        await self._report()
+
+    async def on_binary(self, data: bytes):
+        """处理预览帧二进制消息，限流后缩小上传"""
+        if not COMFYUI_PREVIEW_ENABLED or len(data) < 8:
+            return
+        now = time.time()
+        if now - self._last_preview_at < COMFYUI_PREVIEW_INTERVAL:
+            return
+        if self._preview_task is not None and not self._preview_task.done():
+            return
+
+        event_type = int.from_bytes(data[:4], "big")
+        if event_type == BINARY_EVENT_PREVIEW_IMAGE:
+            image_bytes = data[8:]
+        elif event_type == BINARY_EVENT_PREVIEW_IMAGE_WITH_METADATA:
+            metadata_length = int.from_bytes(data[4:8], "big")
+            try:
+                metadata = json.loads(data[8:8 + metadata_length])
+            except ValueError:
+                return
+            if self.prompt_id and metadata.get("prompt_id") not in (None, self.prompt_id):
+                return
+            image_bytes = data[8 + metadata_length:]
+        else:
+            return
+
+        self._last_preview_at = now
+        # 压缩与上传放到后台，不阻塞WebSocket消息接收
+        self._preview_task = asyncio.create_task(self._upload_preview(image_bytes))
+
+    async def _upload_preview(self, image_bytes: bytes):
+        try:
+            preview_bytes = await asyncio.to_thread(_encode_preview, image_bytes)
+            preview_url = await asyncio.to_thread(upload, preview_bytes, "preview.jpg")
+            await self.callback(self.percent, self.message, preview_url)
+        except Exception as e:
+            logger.debug(f"上传预览帧失败: {e}")
+
+    async def _report(self, force: bool = False):
+        now = time.time()
+        if not force and now - self._last_sent_at < COMFYUI_PROGRESS_INTERVAL:
+            return
+        self._last_sent_at = now
+        try:
+            await self.callback(self.percent, self.message, None)
+        except Exception as e:
+            logger.debug(f"发送进度通知失败: {e}")
+
+    def close(self):
+        """执行结束时取消未完成的预览上传"""
+        if self._preview_task is not None and not self._preview_task.done():
+            self._preview_task.cancel()
+
+
+def ctx_progress_callback(ctx: Any) -> Optional[ProgressCallback]:
+    """将进度转发为MCP progress通知，请求未携带progressToken时不发送"""
+    if ctx is None:
+        return None
+
+    async def report(percent: float, message: str, preview_url: Optional[str] = None):
+        if preview_url:
+            message = f"{message}{PREVIEW_MARKER}{preview_url}"
+        await ctx.report_progress(round(percent, 1), 100, message)
+
+    return report
@@ -0,0 +1,70 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+"""
+工作流执行结果缓存
+以应用参数后的工作流图哈希为键，缓存转存后的执行结果，支持过期时间与容量上限（LRU淘汰）
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from core import logger
+from comfyui.models import ExecuteResult
+from utils import metrics_util
+
+# 配置变量
+# 默认关闭：工作流中的随机性（如固定在图中、由节点在执行时随机生成的种子）无法从图上可靠识别，
+# 确认已加载的工作流相同输入得到相同结果后再开启
+RESULT_CACHE_ENABLED = os.getenv('RESULT_CACHE_ENABLED', 'false').lower() == 'true'
+# 缓存有效期（秒），不应超过 mcp-base 中文件的保留时间
+RESULT_CACHE_TTL = int(os.getenv('RESULT_CACHE_TTL', str(24 * 3600)))
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv('RESULT_CACHE_MAX_ENTRIES', '1000'))
+
+
+class ResultCache:
+    """进程内的LRU结果缓存"""
+
+    def __init__(self, ttl: int = RESULT_CACHE_TTL, max_entries: int = RESULT_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, ExecuteResult]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[ExecuteResult]:
+        """查询缓存，命中时返回结果副本"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry[0] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is not None:
+                self._entries.move_to_end(key)
+        metrics_util.record_cache("result", entry is not None)
+        if entry is None:
+            return None
+        return entry[1].model_copy(deep=True, update={"cached": True, "duration": 0.0})
+
+    def put(self, key: str, result: ExecuteResult):
+        """写入缓存，只缓存成功的结果"""
+        if result.status != "completed":
+            return
+        with self._lock:
+            self._entries[key] = (time.time(), result.model_copy(deep=True))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        logger.debug(f"执行结果已缓存: {key}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+result_cache = ResultCache()
@@ -0,0 +1,316 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+"""
+ComfyUI 提交调度
+工作流在提交到ComfyUI之前按优先级与用户公平排队，每个ComfyUI后端同时执行的任务数有上限：
+- 优先级：按工作流名前缀配置 high / normal / low，等待过久的任务逐级提升，避免饿死
+- 公平：同一优先级内按用户做加权公平排队（WFQ），一个用户的大量任务不会阻塞其他用户
+- 排队位置：等待期间通过进度回调通知，并可按请求ID查询
+"""
+
+import os
+import time
+import asyncio
+import itertools
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from core import logger
+from comfyui.progress import ProgressCallback
+from utils import metrics_util
+
+# 配置变量
+COMFYUI_SCHEDULER_ENABLED = os.getenv('COMFYUI_SCHEDULER_ENABLED', 'true').lower() == 'true'
+# 每个ComfyUI后端同时执行（已提交且未完成）的最大任务数，0 表示不限制
+COMFYUI_MAX_CONCURRENT_PROMPTS = int(os.getenv('COMFYUI_MAX_CONCURRENT_PROMPTS', '0'))
+# 工作流名前缀到优先级的映射，格式: 前缀:优先级，逗号分隔，未匹配的工作流为 normal；
+# 只在设置了 COMFYUI_MAX_CONCURRENT_PROMPTS 时影响提交顺序，默认为空
+COMFYUI_WORKFLOW_PRIORITIES = os.getenv('COMFYUI_WORKFLOW_PRIORITIES', '')
+# 等待超过该秒数的任务提升一个优先级，0 表示不提升
+COMFYUI_PRIORITY_AGING = float(os.getenv('COMFYUI_PRIORITY_AGING', '300'))
+# 用户权重，格式: 用户:权重，逗号分隔，未配置的用户权重为 1
+COMFYUI_TENANT_WEIGHTS = os.getenv('COMFYUI_TENANT_WEIGHTS', '')
+# 客户端标识用户的HTTP请求头，也可以通过请求 _meta 的 user_id 传递
+COMFYUI_TENANT_HEADER = os.getenv('COMFYUI_TENANT_HEADER', 'x-pixelle-user').lower()
+
+PRIORITY_CLASSES = {"high": 0, "normal": 1, "low": 2}
+DEFAULT_TENANT = "default"
+# 等待期间排队位置通知的检查间隔（秒）
+POSITION_NOTIFY_INTERVAL = 1.0
+
+
+def _parse_pairs(value: str) -> List[Tuple[str, str]]:
+    pairs = []
+    for item in value.split(','):
+        if ':' in item:
+            key, val = item.rsplit(':', 1)
+            if key.strip() and val.strip():
+                pairs.append((key.strip(), val.strip()))
+    return pairs
+
+
+# 按前缀长度倒序，最长前缀优先匹配
+WORKFLOW_PRIORITIES = sorted(
+    [(prefix, priority) for prefix, priority in _parse_pairs(COMFYUI_WORKFLOW_PRIORITIES) if priority in PRIORITY_CLASSES],
+    key=lambda pair: len(pair[0]),
+    reverse=True,
+)
+TENANT_WEIGHTS = {tenant: max(float(weight), 0.01) for tenant, weight in _parse_pairs(COMFYUI_TENANT_WEIGHTS)}
+
+
+def get_workflow_priority(workflow_name: str) -> str:
+    """按工作流名前缀获取优先级"""
+    for prefix, priority in WORKFLOW_PRIORITIES:
+        if workflow_name.startswith(prefix):
+            return priority
+    return "normal"
+
+
+def get_tenant(ctx: Any) -> Optional[str]:
+    """从MCP请求中识别用户：_meta.user_id -> 请求头 -> MCP会话ID"""
+    if ctx is None:
+        return None
+    try:
+        meta = ctx.request_context.meta
+        user_id = (getattr(meta, "model_extra", None) or {}).get("user_id")
+        if isinstance(user_id, str) and user_id:
+            return user_id
+    except Exception:
+        pass
+    try:
+        from fastmcp.server.dependencies import get_http_headers
+        user_id = get_http_headers().get(COMFYUI_TENANT_HEADER)
+        if user_id:
+            return user_id
+    except Exception:
+        pass
+    try:
+        return ctx.session_id
+    except Exception:
+        return None
+
+
+class ScheduleRequest(BaseModel):
+    """当前调用的调度信息，通过 contextvar 传递到执行器"""
+    workflow_name: str = Field(description="Workflow name")
+    tenant: str = Field(DEFAULT_TENANT, description="User or session the execution is accounted to")
+    priority: str = Field("normal", description="Priority class")
+    request_id: Optional[str] = Field(None, description="ID used to look up the queue position, e.g. a job_id")
+    background: bool = Field(False, description="Whether the caller is a background job rather than a waiting tool call")
+    content_hash: Optional[str] = Field(None, description="Content hash of the workflow version being executed")
+
+
+current_request: ContextVar[Optional[ScheduleRequest]] = ContextVar("comfyui_schedule_request", default=None)
+
+
+@contextmanager
+def request_context(
+    workflow_name: str,
+    ctx: Any = None,
+    tenant: Optional[str] = None,
+    request_id: Optional[str] = None,
+    background: bool = False,
+    content_hash: Optional[str] = None,
+) -> Iterator[ScheduleRequest]:
+    """为当前调用设置调度信息，未识别出用户时沿用外层的设置"""
+    parent = current_request.get()
+    request = ScheduleRequest(
+        workflow_name=workflow_name,
+        tenant=tenant or get_tenant(ctx) or (parent.tenant if parent else DEFAULT_TENANT),
+        priority=get_workflow_priority(workflow_name),
+        request_id=request_id or (parent.request_id if parent else None),
+        background=background or (parent.background if parent else False),
+        content_hash=content_hash or (parent.content_hash if parent else None),
+    )
+    token = current_request.set(request)
+    try:
+        yield request
+    finally:
+        current_request.reset(token)
+
+
+class _Ticket:
+    """一个等待执行的任务"""
+
+    def __init__(self, request: ScheduleRequest, seq: int, finish_tag: float):
+        self.request = request
+        self.seq = seq
+        self.finish_tag = finish_tag
+        self.enqueued_at = time.time()
+        self.dispatched_at: Optional[float] = None
+        self.granted = asyncio.get_running_loop().create_future()
+
+    def sort_key(self, now: float) -> Tuple[int, float, int]:
+        rank = PRIORITY_CLASSES[self.request.priority]
+        if COMFYUI_PRIORITY_AGING > 0:
+            rank = max(0, rank - int((now - self.enqueued_at) / COMFYUI_PRIORITY_AGING))
+        return rank, self.finish_tag, self.seq
+
+
+class BackendScheduler:
+    """单个ComfyUI后端的调度队列"""
+
+    def __init__(self, base_url: str, max_concurrent: int = COMFYUI_MAX_CONCURRENT_PROMPTS):
+        self.base_url = base_url
+        self.max_concurrent = max_concurrent
+        self.waiting: List[_Ticket] = []
+        self.active: List[_Ticket] = []
+        self._virtual_time = 0.0
+        self._tenant_finish: Dict[str, float] = {}
+        self._seq = itertools.count()
+
+    @property
+    def running(self) -> int:
+        return len(self.active)
+
+    def _has_capacity(self) -> bool:
+        return self.max_concurrent <= 0 or self.running < self.max_concurrent
+
+    def _enqueue(self, request: ScheduleRequest) -> _Ticket:
+        # WFQ：每个用户的虚拟完成时间按 1/权重 递增，调度时取最小者
+        weight = TENANT_WEIGHTS.get(request.tenant, 1.0)
+        start = max(self._virtual_time, self._tenant_finish.get(request.tenant, 0.0))
+        finish_tag = start + 1.0 / weight
+        self._tenant_finish[request.tenant] = finish_tag
+        ticket = _Ticket(request, next(self._seq), finish_tag)
+        self.waiting.append(ticket)
+        self._dispatch()
+        return ticket
+
+    def _ordered(self) -> List[_Ticket]:
+        now = time.time()
+        return sorted(self.waiting, key=lambda ticket: ticket.sort_key(now))
+
+    def _dispatch(self):
+        while self.waiting and self._has_capacity():
+            ticket = self._ordered()[0]
+            self.waiting.remove(ticket)
+            self._virtual_time = max(self._virtual_time, ticket.finish_tag - 1.0 / TENANT_WEIGHTS.get(ticket.request.tenant, 1.0))
+            ticket.dispatched_at = time.time()
+            self.active.append(ticket)
+            ticket.granted.set_result(None)
+        self._update_metrics()
+
+    def _cancel(self, ticket: _Ticket):
+        if ticket in self.waiting:
+            self.waiting.remove(ticket)
+            self._update_metrics()
+
+    def release(self, ticket: _Ticket):
+        if ticket in self.active:
+            self.active.remove(ticket)
+        # 虚拟完成时间已落后的用户与从未排队的用户等价，不再保留
+        self._tenant_finish = {tenant: finish for tenant, finish in self._tenant_finish.items() if finish > self._virtual_time}
+        self._dispatch()
+
+    def position(self, ticket: _Ticket) -> Optional[int]:
+        """排队位置，从1开始"""
+        for index, waiting in enumerate(self._ordered(), 1):
+            if waiting is ticket:
+                return index
+        return None
+
+    def find(self, request_id: str) -> Optional[_Ticket]:
+        for ticket in self.waiting:
+            if ticket.request.request_id == request_id:
+                return ticket
+        return None
+
+    def _update_metrics(self):
+        counts = {priority: 0 for priority in PRIORITY_CLASSES}
+        for ticket in self.waiting:
+            counts[ticket.request.priority] += 1
+        for priority, count in counts.items():
+            metrics_util.SCHEDULER_WAITING.labels(backend=self.base_url, priority=priority).set(count)
+        metrics_util.SCHEDULER_RUNNING.labels(backend=self.base_url).set(self.running)
+
+
+class Scheduler:
+    """按ComfyUI后端划分的调度器"""
+
+    def __init__(self):
+        self._backends: Dict[str, BackendScheduler] = {}
+
+    def _get_backend(self, base_url: str) -> BackendScheduler:
+        if base_url not in self._backends:
+            self._backends[base_url] = BackendScheduler(base_url)
+        return self._backends[base_url]
+
+    @asynccontextmanager
+    async def slot(self, base_url: str, on_progress: Optional[ProgressCallback] = None) -> AsyncIterator[None]:
+        """
+        获取向ComfyUI提交任务的名额，退出时释放
+
+        Args:
+            base_url: ComfyUI地址
+            on_progress: 等待期间用于通知排队位置的进度回调
+        """
+        if not COMFYUI_SCHEDULER_ENABLED:
+            yield
+            return
+
+        request = current_request.get() or ScheduleRequest(workflow_name="")
+        backend = self._get_backend(base_url)
+        ticket = backend._enqueue(request)
+        wait_start = time.time()
+        try:
+            last_position = None
+            while not ticket.granted.done():
+                position = backend.position(ticket)
+                if position != last_position and on_progress:
+                    await on_progress(0, f"Waiting in queue, position {position}", None)
+                    last_position = position
+                try:
+                    await asyncio.wait_for(asyncio.shield(ticket.granted), timeout=POSITION_NOTIFY_INTERVAL)
+                except asyncio.TimeoutError:
+                    pass
+        except BaseException:
+            if ticket.granted.done():
+                backend.release(ticket)
+            else:
+                backend._cancel(ticket)
+            raise
+        if last_position is not None:
+            logger.info(f"调度等待结束: {request.workflow_name} ({request.tenant}), 等待 {time.time() - wait_start:.1f}s")
+        metrics_util.observe_phase("schedule_wait", wait_start)
+
+        try:
+            yield
+        finally:
+            backend.release(ticket)
+
+    def get_position(self, request_id: str) -> Optional[int]:
+        """按请求ID查询在调度队列中的位置，不在队列中时返回 None"""
+        for backend in self._backends.values():
+            ticket = backend.find(request_id)
+            if ticket is not None:
+                return backend.position(ticket)
+        return None
+
+    def snapshot(self, base_url: str) -> Tuple[List[ScheduleRequest], List[Tuple[ScheduleRequest, float]]]:
+        """后端当前等待中的请求，以及执行中的请求与其已执行时长"""
+        backend = self._backends.get(base_url)
+        if backend is None:
+            return [], []
+        now = time.time()
+        waiting = [ticket.request for ticket in backend.waiting]
+        active = [(ticket.request, now - (ticket.dispatched_at or now)) for ticket in backend.active]
+        return waiting, active
+
+    def get_status(self) -> Dict[str, Dict[str, Any]]:
+        """各后端的运行数与等待数"""
+        return {
+            base_url: {
+                "running": backend.running,
+                "waiting": len(backend.waiting),
+                "max_concurrent": backend.max_concurrent,
+            }
+            for base_url, backend in self._backends.items()
+        }
+
+
+scheduler = Scheduler()
@@ -0,0 +1,128 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+"""
+进行中任务合并（single-flight）
+相同的工作流图在执行期间再次提交时不重复入队，而是等待同一个ComfyUI任务，
+入队、进度与最终结果广播给所有等待方
+"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from core import logger
+from comfyui.models import ExecuteResult
+from comfyui.progress import ProgressCallback
+from utils import metrics_util
+
+# 工作流提交到ComfyUI队列后的回调，参数为 (prompt_id, ComfyUI地址)
+QueuedCallback = Callable[[str, str], Awaitable[None]]
+
+
+class _Flight:
+    """一个进行中的执行及其等待方"""
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.waiters = 0
+        self.queued: Optional[Tuple[str, str]] = None
+        self.last_progress: Optional[Tuple[float, str, Optional[str]]] = None
+        self.queued_callbacks: List[QueuedCallback] = []
+        self.progress_callbacks: List[ProgressCallback] = []
+
+    async def _call(self, kind: str, callback: Callable[..., Awaitable[None]], *args):
+        """调用单个等待方的回调，某个客户端的回调失败（如会话已关闭）不影响执行与其他等待方"""
+        try:
+            await callback(*args)
+        except Exception as e:
+            logger.warning(f"{kind}回调失败: {e}")
+
+    async def notify_queued(self, prompt_id: str, base_url: str):
+        self.queued = (prompt_id, base_url)
+        for callback in list(self.queued_callbacks):
+            await self._call("任务入队", callback, prompt_id, base_url)
+
+    async def notify_progress(self, percent: float, message: str, preview_url: Optional[str] = None):
+        self.last_progress = (percent, message, preview_url)
+        for callback in list(self.progress_callbacks):
+            await self._call("进度", callback, percent, message, preview_url)
+
+    async def subscribe(self, on_queued: Optional[QueuedCallback], on_progress: Optional[ProgressCallback]):
+        """加入等待，并补发已经发生的入队与最新进度"""
+        if on_queued:
+            self.queued_callbacks.append(on_queued)
+            if self.queued:
+                await self._call("任务入队", on_queued, *self.queued)
+        if on_progress:
+            self.progress_callbacks.append(on_progress)
+            if self.last_progress:
+                await self._call("进度", on_progress, *self.last_progress)
+
+    def unsubscribe(self, on_queued: Optional[QueuedCallback], on_progress: Optional[ProgressCallback]):
+        if on_queued in self.queued_callbacks:
+            self.queued_callbacks.remove(on_queued)
+        if on_progress in self.progress_callbacks:
+            self.progress_callbacks.remove(on_progress)
+
+
+class SingleFlight:
+    """按工作流图哈希合并进行中的执行"""
+
+    def __init__(self):
+        self._flights: Dict[str, _Flight] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def run(
+        self,
+        key: str,
+        fn: Callable[[QueuedCallback, ProgressCallback], Awaitable[ExecuteResult]],
+        on_queued: Optional[QueuedCallback] = None,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> ExecuteResult:
+        """
+        执行或加入相同key的进行中执行
+
+        执行放在独立的任务中，发起方被取消不影响其他等待方；所有等待方都取消后才取消执行
+
+        Args:
+            key: 合并键，通常为 ComfyUI地址 + 工作流图哈希
+            fn: 实际执行函数，参数为广播用的入队与进度回调
+            on_queued: 当前调用方的入队回调
+            on_progress: 当前调用方的进度回调
+        """
+        flight = self._flights.get(key)
+        shared = flight is not None
+        if flight is None:
+            flight = _Flight()
+            self._flights[key] = flight
+            flight.task = asyncio.create_task(fn(flight.notify_queued, flight.notify_progress))
+            flight.task.add_done_callback(lambda _: self._remove(key, flight))
+        else:
+            logger.info(f"合并进行中的相同工作流: {key}")
+        metrics_util.record_cache("in_flight", shared)
+
+        flight.waiters += 1
+        try:
+            await flight.subscribe(on_queued, on_progress)
+            result = await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                # 最后一个等待方离开，取消执行，后续相同的提交重新发起
+                self._remove(key, flight)
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+            flight.unsubscribe(on_queued, on_progress)
+
+        # 每个等待方拿到独立的副本
+        return result.model_copy(deep=True) if shared else result
+
+    def _remove(self, key: str, flight: _Flight):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+
+in_flight = SingleFlight()
@@ -0,0 +1,100 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+"""
+输入媒体上传缓存
+记录 (ComfyUI地址, 源URL) 与 (ComfyUI地址, 内容哈希) 到ComfyUI输入文件名的映射，
+重复使用的输入跳过下载与上传
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from core import logger
+
+# 配置变量
+UPLOAD_CACHE_ENABLED = os.getenv('UPLOAD_CACHE_ENABLED', 'true').lower() == 'true'
+# 缓存有效期（秒），ComfyUI的输入目录可能被清理，过期后重新上传
+UPLOAD_CACHE_TTL = int(os.getenv('UPLOAD_CACHE_TTL', '3600'))
+UPLOAD_CACHE_MAX_ENTRIES = int(os.getenv('UPLOAD_CACHE_MAX_ENTRIES', '1000'))
+# 距上次校验不超过该秒数时直接复用，不再检查源文件与ComfyUI端文件
+UPLOAD_CACHE_VALIDATE_INTERVAL = int(os.getenv('UPLOAD_CACHE_VALIDATE_INTERVAL', '60'))
+
+
+class UploadEntry(BaseModel):
+    """一次上传的记录"""
+    name: str = Field(description="ComfyUI输入文件名")
+    digest: str = Field(description="文件内容的sha256")
+    etag: Optional[str] = Field(None, description="源URL响应的ETag")
+    last_modified: Optional[str] = Field(None, description="源URL响应的Last-Modified")
+    immutable: bool = Field(False, description="源URL内容不会变化，如 mcp-base 的文件")
+    created_at: float = Field(default_factory=time.time)
+    validated_at: float = Field(default_factory=time.time)
+
+    @property
+    def is_expired(self) -> bool:
+        return time.time() - self.created_at > UPLOAD_CACHE_TTL
+
+    @property
+    def recently_validated(self) -> bool:
+        return time.time() - self.validated_at < UPLOAD_CACHE_VALIDATE_INTERVAL
+
+
+class UploadCache:
+    """进程内的LRU上传缓存，按源URL与内容哈希两种方式查找"""
+
+    def __init__(self, max_entries: int = UPLOAD_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._by_url: "OrderedDict[Tuple[str, str], UploadEntry]" = OrderedDict()
+        self._by_digest: "OrderedDict[Tuple[str, str], UploadEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _get(index: "OrderedDict[Tuple[str, str], UploadEntry]", key: Tuple[str, str]) -> Optional[UploadEntry]:
+        entry = index.get(key)
+        if entry is not None and entry.is_expired:
+            del index[key]
+            entry = None
+        if entry is not None:
+            index.move_to_end(key)
+        return entry
+
+    def get_by_url(self, base_url: str, url: str) -> Optional[UploadEntry]:
+        with self._lock:
+            return self._get(self._by_url, (base_url, url))
+
+    def get_by_digest(self, base_url: str, digest: str) -> Optional[UploadEntry]:
+        with self._lock:
+            return self._get(self._by_digest, (base_url, digest))
+
+    def put(self, base_url: str, url: str, entry: UploadEntry):
+        with self._lock:
+            for index, key in ((self._by_url, (base_url, url)), (self._by_digest, (base_url, entry.digest))):
+                index[key] = entry
+                index.move_to_end(key)
+                while len(index) > self.max_entries:
+                    index.popitem(last=False)
+        logger.debug(f"上传记录已缓存: {url} -> {entry.name}")
+
+    def invalidate(self, base_url: str, entry: UploadEntry):
+        """ComfyUI端文件已不存在或源文件已变化时移除记录"""
+        with self._lock:
+            for index in (self._by_url, self._by_digest):
+                for key in [key for key, value in index.items() if key[0] == base_url and value is entry]:
+                    del index[key]
+
+    def clear(self):
+        with self._lock:
+            self._by_url.clear()
+            self._by_digest.clear()
+
+    def __len__(self) -> int:
+        return len(self._by_url)
+
+
+upload_cache = UploadCache()
@@ -1,17 +1,18 @@
 # Copyright (C) 2025 AIDC-AI
 # This project is licensed under the MIT License (SPDX-License-identifier: MIT).
 
-import os
-import json
 import time
 import uuid
 import asyncio
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Set
 from urllib.parse import urlparse, urlunparse
 import websockets
 
-from comfyui.base_executor import ComfyUIExecutor, COMFYUI_API_KEY, logger
+from comfyui.workflow_template import dumps_prompt
+from comfyui.base_executor import ComfyUIExecutor, QueuedCallback, COMFYUI_API_KEY, logger
 from comfyui.models import ExecuteResult
+from comfyui.progress import ProgressTracker, ProgressCallback
+from utils import trace_util, json_util
 
 
 class WebSocketExecutor(ComfyUIExecutor):
@@ -55,7 +56,7 @@ class WebSocketExecutor(ComfyUIExecutor):
         if prompt_ext_params:
             prompt_data.update(prompt_ext_params)
         
-        json_data = json.dumps(prompt_data)
+        json_data = dumps_prompt(prompt_data)
         
         # 准备请求头
         headers = {"Content-Type": "application/json"}
@@ -76,7 +77,7 @@ class WebSocketExecutor(ComfyUIExecutor):
                     response_text = await response.text()
                     raise Exception(f"提交工作流失败: [{response.status}] {response_text}")
                 
-                result = await response.json()
+                result = await response.json(loads=json_util.loads)
                 prompt_id = result.get("prompt_id")
                 if not prompt_id:
                     raise Exception(f"获取prompt_id失败: {result}")
@@ -172,37 +173,11 @@ class WebSocketExecutor(ComfyUIExecutor):
                 msg=f"从收集的输出中构建执行结果异常: {str(e)}"
             )
 
-    async def execute_workflow(self, workflow_file: str, params: Dict[str, Any] = None) -> ExecuteResult:
-        """执行工作流（WebSocket方式）"""
+    async def _execute_prompt(self, workflow_data: Dict[str, Any], output_id_2_var: Dict[str, str], on_queued: Optional[QueuedCallback] = None, on_progress: Optional[ProgressCallback] = None, output_node_ids: Optional[Set[str]] = None) -> ExecuteResult:
+        """提交已应用参数的工作流并等待结果（WebSocket方式）"""
         try:
             start_time = time.time()
             
-            if not os.path.exists(workflow_file):
-                logger.error(f"工作流文件不存在: {workflow_file}")
-                return ExecuteResult(status="error", msg=f"工作流文件不存在: {workflow_file}")
-            
-            # 获取工作流元数据
-            metadata = self.get_workflow_metadata(workflow_file)
-            if not metadata:
-                return ExecuteResult(status="error", msg="无法解析工作流元数据")
-            
-            # 加载工作流JSON
-            with open(workflow_file, 'r', encoding='utf-8') as f:
-                workflow_data = json.load(f)
-            
-            if not workflow_data:
-                return ExecuteResult(status="error", msg="工作流数据缺失")
-            
-            # 使用新的参数映射逻辑
-            if params:
-                workflow_data = await self._apply_params_to_workflow(workflow_data, metadata, params)
-            else:
-                # 即使没有传入参数，也需要应用默认值
-                workflow_data = await self._apply_params_to_workflow(workflow_data, metadata, {})
-            
-            # 从元数据提取输出节点信息
-            output_id_2_var = self._extract_output_nodes(metadata)
-            
             # 生成客户端ID
             client_id = str(uuid.uuid4())
             
@@ -228,6 +203,9 @@ class WebSocketExecutor(ComfyUIExecutor):
             # 用于收集包含输出的节点
             collected_outputs = {}
             prompt_id = None
+            submitted_at = None
+            execution_started_at = None
+            progress_tracker = ProgressTracker(None, workflow_data, on_progress) if on_progress else None
             
             try:
                 # 准备WebSocket连接的额外头部，包含cookies
@@ -251,11 +229,16 @@ class WebSocketExecutor(ComfyUIExecutor):
                     
                     # 连接成功后立即提交工作流
                     try:
-                        prompt_id = await self._queue_prompt(workflow_data, client_id, prompt_ext_params)
+                        with trace_util.start_span("comfyui.queue_prompt"):
+                            prompt_id = await self._queue_prompt(workflow_data, client_id, prompt_ext_params)
+                        submitted_at = time.time()
                     except Exception as e:
                         error_message = f"提交工作流失败: [{type(e)}] {str(e)}"
                         logger.error(error_message)
                         return ExecuteResult(status="error", msg=error_message)
+                    await self._notify_queued(on_queued, prompt_id)
+                    if progress_tracker:
+                        await progress_tracker.start(prompt_id)
                     
                     logger.info(f"工作流已提交，prompt_id: {prompt_id}，开始等待结果")
                     
@@ -277,28 +260,41 @@ class WebSocketExecutor(ComfyUIExecutor):
                             message_str = await asyncio.wait_for(websocket.recv(), timeout=3.0)
                             
                             if not isinstance(message_str, str):
+                                # 二进制消息为预览帧
+                                if progress_tracker:
+                                    await progress_tracker.on_binary(message_str)
                                 continue
                                 
-                            message = json.loads(message_str)
+                            # 其他任务的进度与队列状态广播不含目标prompt_id，跳过完整解析
+                            if prompt_id not in message_str:
+                                continue
+                            
+                            message = json_util.loads(message_str)
                             
                             # 打印目标prompt_id的完整消息用于调试
                             if message.get('data', {}).get('prompt_id') == prompt_id:
-                                logger.debug(f'收到目标WebSocket消息 (prompt_id: {prompt_id}): {json.dumps(message, ensure_ascii=False)}')
+                                logger.debug(f'收到目标WebSocket消息 (prompt_id: {prompt_id}): {message_str}')
                                 
                                 # 处理不同类型的消息
                                 msg_type = message.get('type')
                                 data = message.get('data', {})
                                 
-                                if msg_type == 'execution_cached':
+                                if progress_tracker:
+                                    await progress_tracker.on_message(msg_type, data)
+                                
+                                if msg_type == 'execution_start':
+                                    execution_started_at = time.time()
+                                    
+                                elif msg_type == 'execution_cached':
                                     # 处理缓存执行消息
                                     cached_nodes = data.get('nodes', [])
                                     logger.debug(f"检测到缓存执行，跳过节点: {cached_nodes}")
                                     
                                 elif msg_type == 'executed':
-                                    # 收集包含输出的节点
+                                    # 收集输出节点中包含结果的节点，忽略预览等节点的临时文件
                                     node_id = data.get('node')
                                     output = data.get('output')
-                                    if output and node_id:
+                                    if output and node_id and (output_node_ids is None or node_id in output_node_ids):
                                         # 检查是否有我们感兴趣的输出
                                         has_media = output.get('images') \
                                             or output.get('gifs') \
@@ -318,13 +314,6 @@ class WebSocketExecutor(ComfyUIExecutor):
                                         msg=error_message,
                                         duration=time.time() - start_time
                                     )
-                            else:
-                                # 对于status消息，记录队列状态
-                                if message.get('type') == 'status':
-                                    queue_remaining = message.get('data', {}).get('status', {}).get('exec_info', {}).get('queue_remaining', 'unknown')
-                                    logger.debug(f'队列状态更新: 剩余任务 {queue_remaining} 个')
-                                else:
-                                    logger.debug(f'收到其他WebSocket消息: {message}')
                             
                             # 解析消息
                             invoke_completed, parsed_message = self._parse_ws_message(message, prompt_id)
@@ -333,14 +322,14 @@ class WebSocketExecutor(ComfyUIExecutor):
                                 logger.info('WebSocket检测到执行完成')
                                 
                                 # 设置执行耗时
-                                duration = time.time() - start_time
+                                finished_at = time.time()
+                                duration = finished_at - start_time
+                                self._record_phases(prompt_id, submitted_at, execution_started_at, finished_at)
                                 
                                 # 如果有收集到的输出，使用它们构建结果
                                 if collected_outputs:
                                     result = self._build_result_from_collected_outputs(collected_outputs, prompt_id, output_id_2_var)
                                     result.duration = duration
-                                    # 转存结果文件
-                                    result = await self.transfer_result_files(result)
                                     return result
                                 else:
                                     # WebSocket方式没有收集到输出，返回错误
@@ -366,6 +355,10 @@ class WebSocketExecutor(ComfyUIExecutor):
                             )
                             return result
                             
+            except asyncio.CancelledError:
+                # 调用方取消时一并停止ComfyUI中的任务
+                await self._abort_prompt(prompt_id)
+                raise
             except Exception as e:
                 logger.error(f"WebSocket连接或执行异常: {str(e)}")
                 result = ExecuteResult(
@@ -375,6 +368,9 @@ class WebSocketExecutor(ComfyUIExecutor):
                     duration=time.time() - start_time
                 )
                 return result
+            finally:
+                if progress_tracker:
+                    progress_tracker.close()
                 
         except Exception as e:
             logger.error(f"执行工作流出错: {str(e)}", exc_info=True)
@@ -7,6 +7,7 @@ from pathlib import Path
 from core import logger
 from typing import Dict, Any, Optional, List
 from pydantic import BaseModel, Field
+from comfyui.graph_util import analyze_graph
 
 class WorkflowParam(BaseModel):
     name: str
@@ -31,6 +32,10 @@ class WorkflowMappingInfo(BaseModel):
     """工作流映射信息"""
     param_mappings: List[WorkflowParamMapping]
     output_mappings: List[WorkflowOutputMapping]
+    # 需要收集结果的节点，None 表示收集所有节点的结果
+    output_node_ids: Optional[List[str]] = None
+    # 不影响任何输出的节点
+    unused_node_ids: List[str] = Field(default_factory=list)
 
 class WorkflowMetadata(BaseModel):
     title: str
@@ -242,13 +247,31 @@ class WorkflowParser:
             if output_mapping:
                 output_mappings.append(output_mapping)
         
-        # 3. 构建mapping_info
+        # 3. 分析节点连接，找出需要收集结果的节点与不影响输出的节点
+        mcp_node_ids = [node_id for node_id, node_data in workflow_data.items() if node_data is mcp_node]
+        analysis = analyze_graph(
+            workflow_data,
+            [mapping.node_id for mapping in output_mappings],
+            [mapping.node_id for mapping in param_mappings],
+            mcp_node_ids,
+        )
+        unused = [
+            f"{node_id}({workflow_data[node_id].get('class_type') if isinstance(workflow_data[node_id], dict) else '?'})"
+            for node_id in analysis.unused_node_ids
+            if node_id not in mcp_node_ids
+        ]
+        if unused:
+            logger.warning(f"工作流 {title} 中以下节点不影响声明的输出: {', '.join(unused)}")
+        
+        # 4. 构建mapping_info
         mapping_info = WorkflowMappingInfo(
             param_mappings=param_mappings,
-            output_mappings=output_mappings
+            output_mappings=output_mappings,
+            output_node_ids=analysis.output_node_ids,
+            unused_node_ids=analysis.unused_node_ids,
         )
         
-        # 4. 构建metadata
+        # 5. 构建metadata
         metadata = WorkflowMetadata(
             title=title,
             description=description,
@@ -0,0 +1,110 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+"""
+预编译的工作流模板
+模板记录哪些节点会被参数修改，实例化时只复制这些节点及其 inputs，其余节点与模板共享；
+未修改的节点预先序列化，提交工作流时直接拼接；不影响声明输出的节点在编译时移除
+"""
+
+import os
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from comfyui.workflow_parser import WorkflowMetadata
+from comfyui.graph_util import WORKFLOW_PRUNE_UNUSED_NODES
+from utils import json_util
+
+
+class WorkflowGraph(dict):
+    """模板实例化得到的工作流，可以像普通dict一样使用，序列化时复用模板中的片段"""
+
+    def __init__(self, template: "WorkflowTemplate", nodes: Dict[str, Any]):
+        super().__init__(nodes)
+        self.template = template
+
+    def to_json(self) -> str:
+        """与 json_util.dumps(dict(self)) 结果一致"""
+        fragments = self.template.fragments
+        shared = self.template.workflow_data
+        parts = []
+        for node_id, node in self.items():
+            fragment = fragments.get(node_id) if node is shared.get(node_id) else None
+            if fragment is None:
+                fragment = json_util.dumps(node)
+            parts.append(f"{json_util.dumps(node_id)}:{fragment}")
+        return "{" + ",".join(parts) + "}"
+
+
+class WorkflowTemplate:
+    """只读的工作流模板，实例化代价与被参数化的节点数量成正比"""
+
+    def __init__(self, workflow_data: Dict[str, Any], metadata: WorkflowMetadata):
+        unused_node_ids = set(metadata.mapping_info.unused_node_ids)
+        if WORKFLOW_PRUNE_UNUSED_NODES and unused_node_ids:
+            workflow_data = {node_id: node for node_id, node in workflow_data.items() if node_id not in unused_node_ids}
+        self.workflow_data = workflow_data
+        self.metadata = metadata
+        # 被参数修改的节点
+        self.param_node_ids = {
+            mapping.node_id
+            for mapping in metadata.mapping_info.param_mappings
+            if mapping.node_id in workflow_data
+        }
+        # 未参数化节点的预序列化片段
+        self.fragments = {
+            node_id: json_util.dumps(node)
+            for node_id, node in workflow_data.items()
+            if node_id not in self.param_node_ids
+        }
+
+    def instantiate(self) -> WorkflowGraph:
+        """浅复制被参数化节点的 inputs，其余节点与模板共享，调用方只能修改被参数化节点的 inputs"""
+        graph = WorkflowGraph(self, self.workflow_data)
+        for node_id in self.param_node_ids:
+            node = dict(graph[node_id])
+            node["inputs"] = dict(node.get("inputs") or {})
+            graph[node_id] = node
+        return graph
+
+
+def dumps_prompt(prompt_data: Dict[str, Any]) -> str:
+    """序列化 /prompt 请求体，prompt 为模板实例时复用预序列化的节点片段"""
+    workflow = prompt_data.get("prompt")
+    if not isinstance(workflow, WorkflowGraph):
+        return json_util.dumps(prompt_data)
+    parts = []
+    for key, value in prompt_data.items():
+        fragment = workflow.to_json() if key == "prompt" else json_util.dumps(value)
+        parts.append(f"{json_util.dumps(key)}:{fragment}")
+    return "{" + ",".join(parts) + "}"
+
+
+class TemplateCache:
+    """按文件路径缓存已编译的模板，文件修改后自动重新加载"""
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[Tuple[int, int], WorkflowTemplate]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, workflow_file: str, loader: Callable[[str], WorkflowTemplate]) -> WorkflowTemplate:
+        stat = os.stat(workflow_file)
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._entries.get(workflow_file)
+        if entry is not None and entry[0] == version:
+            return entry[1]
+        template = loader(workflow_file)
+        with self._lock:
+            self._entries[workflow_file] = (version, template)
+        return template
+
+    def invalidate(self, workflow_file: Optional[str] = None):
+        with self._lock:
+            if workflow_file is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(workflow_file, None)
+
+
+template_cache = TemplateCache()
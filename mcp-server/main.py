@@ -1,11 +1,15 @@
 # Copyright (C) 2025 AIDC-AI
 # This project is licensed under the MIT License (SPDX-License-identifier: MIT).
 
+import asyncio
 import importlib
 import os
 from pathlib import Path
 
 from core import mcp, logger
+from utils.health_util import setup_health, add_readiness_check
+from utils.metrics_util import setup_metrics
+from utils.session_util import setup_session_tracking, notify_tool_list_changed
 
 
 def load_modules(module_name: str):
@@ -29,13 +33,49 @@ def load_modules(module_name: str):
         except Exception as e:
             logger.error(f"Error loading {module_name_with_ext} from {module_name}: {e}")
 
+# 注册 /metrics 与工具调用统计
+setup_metrics(mcp)
+# 记录客户端会话，用于工具列表变更通知
+setup_session_tracking(mcp)
+# 注册 /health/live 与 /health/ready
+setup_health(mcp)
+
 # 动态加载其他资源
 load_modules("tools")
 
+async def load_workflows():
+    """后台加载工作流，完成后通知已连接的客户端并开启工作流热更新"""
+    from manager.workflow_manager import workflow_manager
+    from manager.workflow_watcher import workflow_watcher, WORKFLOW_WATCH_ENABLED
+    try:
+        load_results = await workflow_manager.load_all_workflows_async()
+        logger.info(f"初始工作流加载结果: {load_results}")
+    except Exception as e:
+        # 已加载的工作流可以正常使用，热更新会继续补齐
+        logger.error(f"初始工作流加载失败: {e}", exc_info=True)
+        workflow_manager.ready = True
+    await notify_tool_list_changed()
+    if WORKFLOW_WATCH_ENABLED:
+        await workflow_watcher.start()
+
+async def serve(host: str, port: int):
+    """清理遗留的临时文件、恢复重启前未完成的异步任务后启动MCP服务器，工作流在服务启动的同时后台加载"""
+    from manager.job_manager import job_manager
+    from manager.workflow_manager import workflow_manager
+    from utils.file_util import cleanup_stale_temp_files
+    cleanup_stale_temp_files()
+    await job_manager.resume_jobs()
+    add_readiness_check("workflows", workflow_manager.get_load_state)
+    loading = asyncio.create_task(load_workflows())
+    try:
+        await mcp.run_async(transport="sse", port=port, host=host)
+    finally:
+        loading.cancel()
+
 if __name__ == "__main__":
     # 启动MCP服务器
     print("🚀 启动 MCP 服务器...")
     
     host = os.getenv("MCP_HOST", "127.0.0.1")
     port = int(os.getenv("MCP_PORT", 9002))
-    mcp.run(transport="sse", port=port, host=host)
+    asyncio.run(serve(host, port))
@@ -0,0 +1,341 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+import os
+import json
+import time
+import uuid
+import asyncio
+import sqlite3
+import threading
+from typing import Dict, Any, Optional, List, Tuple
+from pydantic import BaseModel, Field
+
+from core import logger
+from utils.os_util import get_data_path
+from comfyui.facade import ComfyUIClient, default_client
+from comfyui.models import ExecuteResult
+from comfyui.scheduler import scheduler, request_context, ScheduleRequest
+from comfyui.admission import admission
+from manager.workflow_manager import workflow_manager
+from manager.workflow_versions import WorkflowVersion, version_store
+
+# 配置变量
+JOB_DB_PATH = os.getenv("JOB_DB_PATH") or get_data_path("jobs.db")
+# 已结束任务的保留天数，服务启动时清理
+JOB_RETENTION_DAYS = int(os.getenv("JOB_RETENTION_DAYS", "7"))
+
+# 任务状态：pending(等待提交) -> queued(已提交到ComfyUI) -> completed / error / timeout / cancelled
+# 积压超过上限时为 rejected
+TERMINAL_STATUSES = {"completed", "error", "timeout", "cancelled", "rejected"}
+
+
+class Job(BaseModel):
+    """异步任务"""
+    job_id: str = Field(description="Job ID")
+    workflow_name: str = Field(description="Workflow tool name")
+    params: Dict[str, Any] = Field(default_factory=dict, description="Workflow parameters")
+    status: str = Field("pending", description="Job status")
+    prompt_id: Optional[str] = Field(None, description="ComfyUI prompt ID")
+    base_url: Optional[str] = Field(None, description="ComfyUI base URL the prompt was submitted to")
+    content_hash: Optional[str] = Field(None, description="Content hash of the workflow version the job runs")
+    result: Optional[ExecuteResult] = Field(None, description="Execution result")
+    msg: Optional[str] = Field(None, description="Message")
+    created_at: float = Field(default_factory=time.time, description="Creation time")
+    updated_at: float = Field(default_factory=time.time, description="Last update time")
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+
+class JobManager:
+    """异步任务管理器，任务状态持久化到SQLite，服务重启后按prompt_id重新接管未完成的任务
+
+    任务在提交时绑定工作流版本并记录其内容哈希，执行与重新接管都使用该版本，不受之后工作流更新的影响
+    """
+
+    def __init__(self, db_path: str = JOB_DB_PATH):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._tasks: Dict[str, asyncio.Task] = {}
+        # 运行中任务的最新执行进度 (百分比, 描述)，仅保存在内存中
+        self._progress: Dict[str, Tuple[float, str]] = {}
+        self._clients: Dict[str, ComfyUIClient] = {}
+        # 提交任务的用户，用于调度时的公平排队，仅保存在内存中
+        self._tenants: Dict[str, str] = {}
+        self._init_db()
+
+    def _init_db(self):
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    workflow_name TEXT NOT NULL,
+                    params TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    prompt_id TEXT,
+                    base_url TEXT,
+                    result TEXT,
+                    msg TEXT,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    content_hash TEXT
+                )
+            """)
+            # 兼容没有 content_hash 列的旧数据库
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+            if "content_hash" not in columns:
+                self._conn.execute("ALTER TABLE jobs ADD COLUMN content_hash TEXT")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status)")
+
+    def _save(self, job: Job):
+        job.updated_at = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO jobs
+                    (job_id, workflow_name, params, status, prompt_id, base_url, result, msg, created_at, updated_at, content_hash)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    job.job_id,
+                    job.workflow_name,
+                    json.dumps(job.params, ensure_ascii=False),
+                    job.status,
+                    job.prompt_id,
+                    job.base_url,
+                    job.result.model_dump_json() if job.result else None,
+                    job.msg,
+                    job.created_at,
+                    job.updated_at,
+                    job.content_hash,
+                ),
+            )
+
+    def _row_to_job(self, row: sqlite3.Row) -> Job:
+        return Job(
+            job_id=row["job_id"],
+            workflow_name=row["workflow_name"],
+            params=json.loads(row["params"]),
+            status=row["status"],
+            prompt_id=row["prompt_id"],
+            base_url=row["base_url"],
+            content_hash=row["content_hash"],
+            result=ExecuteResult.model_validate_json(row["result"]) if row["result"] else None,
+            msg=row["msg"],
+            created_at=row["created_at"],
+            updated_at=row["updated_at"],
+        )
+
+    def get_job(self, job_id: str) -> Optional[Job]:
+        """查询任务"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def _list_unfinished_jobs(self) -> List[Job]:
+        placeholders = ", ".join("?" for _ in TERMINAL_STATUSES)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT * FROM jobs WHERE status NOT IN ({placeholders}) ORDER BY created_at",
+                tuple(TERMINAL_STATUSES),
+            ).fetchall()
+        return [self._row_to_job(row) for row in rows]
+
+    def referenced_hashes(self) -> List[str]:
+        """未完成的任务使用的工作流版本，这些版本的快照在重启后仍需保留"""
+        placeholders = ", ".join("?" for _ in TERMINAL_STATUSES)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT DISTINCT content_hash FROM jobs WHERE status NOT IN ({placeholders}) AND content_hash IS NOT NULL",
+                tuple(TERMINAL_STATUSES),
+            ).fetchall()
+        return [row["content_hash"] for row in rows]
+
+    def _cleanup_finished_jobs(self):
+        expire_before = time.time() - JOB_RETENTION_DAYS * 24 * 3600
+        placeholders = ", ".join("?" for _ in TERMINAL_STATUSES)
+        with self._lock, self._conn:
+            cursor = self._conn.execute(
+                f"DELETE FROM jobs WHERE status IN ({placeholders}) AND updated_at < ?",
+                (*TERMINAL_STATUSES, expire_before),
+            )
+        if cursor.rowcount:
+            logger.info(f"已清理过期任务: {cursor.rowcount} 个")
+
+    def _get_client(self, base_url: Optional[str]) -> ComfyUIClient:
+        """获取任务提交时使用的ComfyUI客户端"""
+        if not base_url or base_url == default_client._get_executor().base_url:
+            return default_client
+        if base_url not in self._clients:
+            self._clients[base_url] = ComfyUIClient(base_url=base_url)
+        return self._clients[base_url]
+
+    def submit(
+        self,
+        workflow_name: str,
+        params: Dict[str, Any],
+        tenant: Optional[str] = None,
+        version: Optional[WorkflowVersion] = None,
+    ) -> Job:
+        """提交任务，立即返回，工作流在后台执行
+
+        未指定版本时使用工作流当前加载的版本
+        """
+        version = version or workflow_manager.get_version(workflow_name)
+        if version is None:
+            raise ValueError(f"Workflow '{workflow_name}' not found or not loaded")
+        job = Job(job_id=uuid.uuid4().hex, workflow_name=workflow_name, params=params or {}, content_hash=version.content_hash)
+        if tenant:
+            self._tenants[job.job_id] = tenant
+        self._save(job)
+        self._start(job, version)
+        logger.info(f"异步任务已提交: {job.job_id} ({workflow_name})")
+        return job
+
+    async def admit(self, workflow_name: str, tenant: Optional[str] = None) -> Optional[float]:
+        """提交前的准入检查，返回预估完成时间（秒），积压超过上限时抛出 AdmissionRejected"""
+        with request_context(workflow_name, tenant=tenant, background=True) as request:
+            return await admission.admit(default_client._get_executor(), request)
+
+    async def defer(self, request: ScheduleRequest, params: Dict[str, Any]) -> str:
+        """把超出延迟目标的工具调用转为后台任务，后台任务使用工具调用开始时的工作流版本"""
+        version = None
+        if request.content_hash:
+            version = workflow_manager.load_version(request.workflow_name, request.content_hash)
+            if version is None:
+                raise ValueError(f"Workflow '{request.workflow_name}' version {request.content_hash} is not available")
+        return self.submit(request.workflow_name, params, tenant=request.tenant, version=version).job_id
+
+    def _start(self, job: Job, version: Optional[WorkflowVersion] = None):
+        task = asyncio.create_task(self._run(job, version))
+        self._tasks[job.job_id] = task
+        task.add_done_callback(lambda _: self._on_task_done(job.job_id))
+
+    def _on_task_done(self, job_id: str):
+        self._tasks.pop(job_id, None)
+        self._progress.pop(job_id, None)
+        self._tenants.pop(job_id, None)
+
+    def get_progress(self, job_id: str) -> Optional[Tuple[float, str]]:
+        """查询运行中任务的最新执行进度"""
+        return self._progress.get(job_id)
+
+    def _resolve_version(self, job: Job) -> Optional[WorkflowVersion]:
+        """取得恢复的任务提交时绑定的工作流版本"""
+        if job.content_hash:
+            return workflow_manager.load_version(job.workflow_name, job.content_hash)
+        # 未记录版本的旧任务使用工作流当前加载的版本
+        return workflow_manager.get_version(job.workflow_name)
+
+    async def _run(self, job: Job, version: Optional[WorkflowVersion] = None):
+
+        async def on_queued(prompt_id: str, base_url: str):
+            job.status = "queued"
+            job.prompt_id = prompt_id
+            job.base_url = base_url
+            self._save(job)
+
+        async def on_progress(percent: float, message: str, preview_url: Optional[str] = None):
+            self._progress[job.job_id] = (percent, message)
+
+        try:
+            version = version or self._resolve_version(job)
+            if version is None:
+                result = ExecuteResult(status="error", prompt_id=job.prompt_id, msg=f"工作流 '{job.workflow_name}' 提交时的版本已不存在")
+            elif job.prompt_id:
+                logger.info(f"重新接管异步任务: {job.job_id} (prompt_id: {job.prompt_id})")
+                result = await self._get_client(job.base_url).resume_template(version.metadata, job.prompt_id)
+            else:
+                with request_context(job.workflow_name, tenant=self._tenants.get(job.job_id), request_id=job.job_id, background=True):
+                    result = await default_client.execute_template(
+                        version.metadata,
+                        version.template,
+                        job.params,
+                        on_queued=on_queued,
+                        on_progress=on_progress,
+                        content_hash=version.content_hash,
+                    )
+        except asyncio.CancelledError:
+            job.status = "cancelled"
+            job.msg = "任务已取消"
+            self._save(job)
+            raise
+        except Exception as e:
+            logger.error(f"异步任务执行出错 {job.job_id}: {e}", exc_info=True)
+            result = ExecuteResult(status="error", msg=str(e))
+
+        job.status = result.status
+        job.result = result
+        job.msg = result.msg
+        self._save(job)
+        logger.info(f"异步任务结束: {job.job_id}, 状态: {job.status}")
+
+    async def resume_jobs(self):
+        """服务启动时恢复未完成的任务：已提交的按prompt_id接管，未提交的重新提交"""
+        self._cleanup_finished_jobs()
+        jobs = self._list_unfinished_jobs()
+        for job in jobs:
+            self._start(job)
+        if jobs:
+            logger.info(f"已恢复未完成的异步任务: {len(jobs)} 个")
+
+    def get_schedule_position(self, job: Job) -> Optional[int]:
+        """查询尚未提交到ComfyUI的任务在调度队列中的位置，从1开始"""
+        if job.prompt_id or job.is_finished:
+            return None
+        return scheduler.get_position(job.job_id)
+
+    async def get_queue_position(self, job: Job) -> Optional[int]:
+        """查询任务在ComfyUI队列中的位置，0表示正在执行，None表示不在队列中"""
+        if not job.prompt_id or job.is_finished:
+            return None
+        try:
+            queue_status = await self._get_client(job.base_url)._get_executor().get_queue_status()
+        except Exception as e:
+            logger.debug(f"查询ComfyUI队列失败: {e}")
+            return None
+        if job.prompt_id in queue_status["running"]:
+            return 0
+        if job.prompt_id in queue_status["pending"]:
+            return queue_status["pending"].index(job.prompt_id) + 1
+        return None
+
+    async def cancel(self, job_id: str) -> Optional[Job]:
+        """取消任务：停止本地等待并从ComfyUI队列删除或中断执行"""
+        job = self.get_job(job_id)
+        if job is None or job.is_finished:
+            return job
+
+        task = self._tasks.get(job_id)
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+            # 任务在取消前可能已提交到ComfyUI，重新读取最新的prompt_id
+            job = self.get_job(job_id)
+
+        if job.prompt_id:
+            try:
+                await self._get_client(job.base_url).cancel_prompt(job.prompt_id)
+            except Exception as e:
+                logger.warning(f"取消ComfyUI任务失败 {job.prompt_id}: {e}")
+
+        job.status = "cancelled"
+        job.msg = "任务已取消"
+        self._save(job)
+        logger.info(f"异步任务已取消: {job_id}")
+        return job
+
+
+# 创建任务管理器实例
+job_manager = JobManager()
+admission.set_defer_handler(job_manager.defer)
+version_store.add_reference_source(job_manager.referenced_hashes)
+
+__all__ = ['job_manager', 'JobManager', 'Job']
@@ -0,0 +1,122 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+"""
+工作流解析缓存
+
+以文件内容哈希为键持久化解析得到的 WorkflowMetadata，启动或同步时内容未变的工作流无需重新解析。
+解析逻辑变化导致结果不同时递增 PARSE_CACHE_VERSION，旧版本的缓存自动失效；
+影响解析结果的配置（预览节点、非确定性节点类型）记录为配置指纹，配置修改后缓存同样失效。
+"""
+
+import os
+import json
+import time
+import hashlib
+import sqlite3
+import threading
+from typing import Dict, Iterable, Optional
+
+from core import logger
+from utils.os_util import get_data_path
+from comfyui.workflow_parser import WorkflowMetadata
+from comfyui.graph_util import PREVIEW_NODE_TYPES, WORKFLOW_PRUNE_UNUSED_NODES
+
+WORKFLOW_DB_PATH = os.getenv("WORKFLOW_DB_PATH") or get_data_path("workflows.db")
+
+PARSE_CACHE_VERSION = 2
+
+
+def settings_fingerprint() -> str:
+    """影响解析结果的配置的指纹"""
+    settings = {
+        "preview_nodes": sorted(PREVIEW_NODE_TYPES),
+        "prune_unused_nodes": WORKFLOW_PRUNE_UNUSED_NODES,
+    }
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def with_title(metadata: WorkflowMetadata, title: str) -> WorkflowMetadata:
+    """内容相同的工作流可以以不同的工具名加载"""
+    return metadata if metadata.title == title else metadata.model_copy(update={"title": title})
+
+
+class WorkflowParseCache:
+    """工作流解析结果缓存"""
+
+    def __init__(self, db_path: str = WORKFLOW_DB_PATH):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._settings = settings_fingerprint()
+        self._init_db()
+
+    def _init_db(self):
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS parse_cache (
+                    content_hash TEXT PRIMARY KEY,
+                    version INTEGER NOT NULL,
+                    metadata TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    settings TEXT NOT NULL DEFAULT ''
+                )
+            """)
+            # 兼容没有 settings 列的旧数据库，旧的缓存不匹配任何配置指纹
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(parse_cache)")}
+            if "settings" not in columns:
+                self._conn.execute("ALTER TABLE parse_cache ADD COLUMN settings TEXT NOT NULL DEFAULT ''")
+
+    def get(self, content_hash: str, title: str) -> Optional[WorkflowMetadata]:
+        metadata = self.get_many([content_hash]).get(content_hash)
+        return with_title(metadata, title) if metadata is not None else None
+
+    def get_many(self, content_hashes: Iterable[str]) -> Dict[str, WorkflowMetadata]:
+        """批量查询，返回命中的内容哈希到元数据的映射，标题为写入缓存时的标题"""
+        hashes = list(set(content_hashes))
+        rows = []
+        with self._lock:
+            # SQLite 默认限制单条语句的参数数量
+            for i in range(0, len(hashes), 500):
+                chunk = hashes[i:i + 500]
+                rows.extend(self._conn.execute(
+                    f"SELECT content_hash, metadata FROM parse_cache WHERE version = ? AND settings = ? AND content_hash IN ({','.join('?' * len(chunk))})",
+                    (PARSE_CACHE_VERSION, self._settings, *chunk),
+                ).fetchall())
+
+        results = {}
+        for content_hash, metadata_json in rows:
+            try:
+                results[content_hash] = WorkflowMetadata.model_validate_json(metadata_json)
+            except Exception as e:
+                logger.warning(f"工作流解析缓存损坏，将重新解析: {e}")
+        return results
+
+    def put(self, content_hash: str, metadata: WorkflowMetadata):
+        self.put_many({content_hash: metadata})
+
+    def put_many(self, items: Dict[str, WorkflowMetadata]):
+        if not items:
+            return
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO parse_cache (content_hash, version, metadata, created_at, settings) VALUES (?, ?, ?, ?, ?)",
+                [(content_hash, PARSE_CACHE_VERSION, metadata.model_dump_json(), now, self._settings) for content_hash, metadata in items.items()],
+            )
+
+    def prune(self, keep: Iterable[str]) -> int:
+        """删除不在 keep 中的缓存，返回删除的条数"""
+        keep = set(keep)
+        with self._lock, self._conn:
+            stale = [
+                row[0] for row in self._conn.execute("SELECT content_hash FROM parse_cache").fetchall()
+                if row[0] not in keep
+            ]
+            self._conn.executemany("DELETE FROM parse_cache WHERE content_hash = ?", [(h,) for h in stale])
+        return len(stale)
+
+
+parse_cache = WorkflowParseCache()
+
+__all__ = ['parse_cache', 'WorkflowParseCache', 'WORKFLOW_DB_PATH', 'PARSE_CACHE_VERSION', 'settings_fingerprint']
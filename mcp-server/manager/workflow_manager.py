@@ -2,19 +2,48 @@
 # This project is licensed under the MIT License (SPDX-License-identifier: MIT).
 
 from datetime import datetime
+import asyncio
+import hashlib
+import json
 import os
 import time
 import re
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Any, Optional
-from pydantic import Field
+from typing import Dict, Any, List, NamedTuple, Optional, Set, Tuple
 from core import mcp, logger
 from utils.os_util import get_data_path
 from comfyui.workflow_parser import WorkflowParser, WorkflowMetadata
-from comfyui.facade import execute_workflow
+from manager.workflow_cache import parse_cache, with_title
+from manager.workflow_registry import workflow_registry
+from manager.workflow_tool import WorkflowTool, USE_CACHE_DESCRIPTION
+from manager.workflow_versions import WorkflowVersion, version_store, write_file_atomic
 
-CUSTOM_WORKFLOW_DIR = get_data_path("custom_workflows")
+CUSTOM_WORKFLOW_DIR = os.getenv("CUSTOM_WORKFLOW_DIR") or get_data_path("custom_workflows")
 os.makedirs(CUSTOM_WORKFLOW_DIR, exist_ok=True)
+# 启动时并行读取与解析工作流文件的线程数，1 表示逐个处理
+WORKFLOW_LOAD_WORKERS = max(int(os.getenv("WORKFLOW_LOAD_WORKERS") or 8), 1)
+# 后台注册时每注册多少个工作流让出一次事件循环
+WORKFLOW_REGISTER_BATCH = 20
+
+def _read_workflow(path: Path | str) -> Tuple[bytes, str]:
+    """读取工作流文件的内容及其哈希，解析、执行与哈希使用同一次读取的内容"""
+    with open(path, "rb") as f:
+        content = f.read()
+    return content, hashlib.sha256(content).hexdigest()
+
+def _parse_workflow_content(content: bytes, title: str) -> Optional[WorkflowMetadata]:
+    return WorkflowParser().parse_workflow(json.loads(content), title)
+
+class _SyncPlan(NamedTuple):
+    """增量同步的准备结果：读取与解析可以在线程中完成，工具注册与移除在事件循环中执行"""
+    results: Dict
+    # (文件, 原工作流名称, 新版本)，原名称为 None 表示新增
+    changed: List[Tuple[Path, Optional[str], WorkflowVersion]]
+    # 准备时已加载的工作流文件路径到名称的映射
+    loaded_by_path: Dict[str, str]
+    # 工作流目录中现存的文件
+    present: Set[str]
 
 class WorkflowManager:
     """工作流管理器，支持动态加载和热更新"""
@@ -22,118 +51,86 @@ class WorkflowManager:
     def __init__(self, workflows_dir: str = CUSTOM_WORKFLOW_DIR):
         self.workflows_dir = Path(workflows_dir)
         self.loaded_workflows = {}
+        # 初始加载是否完成，未完成时服务只提供内置工具，就绪检查返回未就绪
+        self.ready = False
+        self._load_total = 0
 
     
-    def parse_workflow_metadata(self, workflow_path: Path, tool_name: str = None) -> Optional[WorkflowMetadata]:
-        """使用新的工作流解析器解析工作流元数据"""
-        parser = WorkflowParser()
-        metadata = parser.parse_workflow_file(str(workflow_path), tool_name)
-        return metadata
-    
-    def _generate_params_str(self, params: Dict[str, Any]) -> str:
-        """生成函数参数字符串"""
-        # 分离必需参数和可选参数，确保参数顺序正确
-        required_params = []
-        optional_params = []
-        
-        for param_name, param in params.items():
-            # 直接使用用户提供的description
-            description = param.description or ''
-            
-            # 生成 Field 参数列表
-            field_args = [f"description={repr(description)}"]
-            if param.default is not None:
-                field_args.append(f"default={repr(param.default)}")
-            
-            # 生成完整的参数定义
-            param_str = f"{param_name}: {param.type} = Field({', '.join(field_args)})"
-            
-            # 根据是否有默认值分类
-            if param.default is not None:
-                optional_params.append(param_str)
-            else:
-                required_params.append(param_str)
+    def parse_workflow_metadata(self, workflow_path: Path, tool_name: str = None, content: bytes = None, content_hash: str = None) -> Optional[WorkflowMetadata]:
+        """使用新的工作流解析器解析工作流元数据
         
-        # 必需参数在前，可选参数在后
-        return ", ".join(required_params + optional_params)
+        提供文件内容时直接解析该内容，提供内容哈希时优先使用解析缓存
+        """
+        title = tool_name or Path(workflow_path).stem
+        if content_hash:
+            metadata = parse_cache.get(content_hash, title)
+            if metadata is not None:
+                return metadata
+        if content is None:
+            metadata = WorkflowParser().parse_workflow_file(str(workflow_path), tool_name)
+        else:
+            metadata = _parse_workflow_content(content, title)
+        if metadata and content_hash:
+            parse_cache.put(content_hash, metadata)
+        return metadata
     
-    def _generate_workflow_function(self, title: str, params_str: str) -> tuple[str, str]:
-        """Generate the workflow execution function code
+    def _register_workflow(self, title: str, version: WorkflowVersion, owner: str = None) -> None:
+        """注册并记录工作流，同名工具被原地替换，不存在未注册的间隙
         
-        Returns:
-            tuple: (function_code, workflow_path) - Function code and workflow path
+        工具绑定不可变的工作流版本，替换后新的调用使用新版本，执行中的调用继续使用旧版本
         """
-        final_workflow_path = os.path.join(CUSTOM_WORKFLOW_DIR, f"{title}.json")
-        
-        template = '''async def {title}({params_str}):
-    try:
-        # Get the passed parameters (excluding special parameters)
-        params = {{k: v for k, v in locals().items() if not k.startswith('_')}}
         
-        # Execute the workflow - workflow_path is retrieved from the external environment
-        result = await execute_workflow(WORKFLOW_PATH, params)
-        
-        # Convert the result to a format friendly to LLM
-        if result.status == "completed":
-            return result.to_llm_result()
-        else:
-            return "Workflow execution failed: " + str(result.msg or result.status)
-            
-    except Exception as e:
-        logger.error("Workflow execution failed {title_safe}: " + str(e), exc_info=True)
-        return "Workflow execution exception: " + str(e)
-'''
-
-        function_code = template.format(
-            title=title,
-            params_str=params_str,
-            title_safe=repr(title)
-        )
-        
-        return function_code, final_workflow_path
-
-
-    def _register_workflow(self, title: str, workflow_handler, metadata: WorkflowMetadata) -> None:
-        """注册并记录工作流"""
+        # 持久化到注册表，供查询工具使用，并保存版本快照用于回滚
+        version.version = workflow_registry.register(version.metadata, version.content_hash, owner)
+        version_store.add(version)
         
         # 注册为MCP工具
-        mcp.tool(workflow_handler)
+        tool = WorkflowTool.from_version(version)
+        mcp.add_tool(tool)
         
         # 记录工作流信息
         self.loaded_workflows[title] = {
-            "function": workflow_handler,
-            "metadata": metadata.model_dump(),
-            "loaded_at": datetime.now()
+            "tool": tool,
+            "metadata": version.metadata,
+            "loaded_at": datetime.now(),
+            "version": version.version,
+            # 工作流目录中的文件及其内容哈希，用于增量同步
+            "path": str((self.workflows_dir / f"{title}.json").resolve()),
+            "content_hash": version.content_hash,
         }
         
         logger.info(f"成功加载工作流: {title}")
     
-    def _save_workflow_if_needed(self, workflow_path: Path, title: str):
-        """如果需要，保存工作流文件到工作流目录"""
+    def _save_workflow_if_needed(self, workflow_path: Optional[Path], title: str, content: bytes):
+        """如果需要，保存工作流文件到工作流目录
+        
+        写入临时文件后原子替换，读取工作流目录的任务与热更新不会读到写了一半的文件；
+        workflow_path 为 None 表示内容不来自文件（如回滚），总是写入
+        """
         target_workflow_path = self.workflows_dir / f"{title}.json"
         try:
             # 确保工作流目录存在
             self.workflows_dir.mkdir(parents=True, exist_ok=True)
 
             # 如果源文件和目标文件是同一个文件，直接跳过
-            if os.path.abspath(str(workflow_path)) == os.path.abspath(str(target_workflow_path)):
+            if workflow_path is not None and os.path.abspath(str(workflow_path)) == os.path.abspath(str(target_workflow_path)):
                 logger.info(f"工作流文件已存在且路径相同，无需复制: {target_workflow_path}")
                 return
 
-            # 复制工作流文件到工作流目录
-            import shutil
-            shutil.copy2(workflow_path, target_workflow_path)
+            # 将解析所用的内容写入工作流目录
+            write_file_atomic(str(target_workflow_path), content)
             logger.info(f"工作流文件已保存到: {target_workflow_path}")
         except Exception as e:
             logger.warning(f"保存工作流文件失败: {e}")
         
 
-    def load_workflow(self, workflow_path: Path | str, tool_name: str = None) -> Dict:
+    def load_workflow(self, workflow_path: Path | str, tool_name: str = None, owner: str = None) -> Dict:
         """加载单个工作流
         
         Args:
             workflow_path: 工作流文件路径
             tool_name: 工具名称，优先级高于工作流文件名
+            owner: 保存工作流的用户，未指定时保留注册表中原有的所有者
             save_workflow_if_not_exists: 是否将工作流文件保存到工作流目录（如果目标文件不存在）
         """
         try:
@@ -148,8 +145,10 @@ class WorkflowManager:
                     "error": f"工作流文件不存在: {workflow_path}"
                 }
             
+            content, content_hash = _read_workflow(workflow_path)
+            
             # 使用新的解析器解析工作流元数据
-            metadata = self.parse_workflow_metadata(workflow_path, tool_name)
+            metadata = self.parse_workflow_metadata(workflow_path, tool_name, content, content_hash)
             if not metadata:
                 logger.error(f"无法解析工作流元数据: {workflow_path}")
                 return {
@@ -157,6 +156,21 @@ class WorkflowManager:
                     "error": f"无法解析工作流元数据: {workflow_path}"
                 }
 
+            result = self._load_parsed_workflow(workflow_path, WorkflowVersion(content_hash, content, metadata), owner)
+            self.collect_versions()
+            return result
+            
+        except Exception as e:
+            logger.error(f"加载工作流失败 {workflow_path}: {e}", exc_info=True)
+            return {
+                "success": False,
+                "error": f"加载工作流失败: {str(e)}"
+            }
+    
+    def _load_parsed_workflow(self, workflow_path: Optional[Path], version: WorkflowVersion, owner: str = None) -> Dict:
+        """根据已解析的工作流版本生成并注册工具"""
+        try:
+            metadata = version.metadata
             title = metadata.title
             
             
@@ -168,32 +182,11 @@ class WorkflowManager:
                     "error": f"工具名称 '{title}' 格式无效。只允许使用字母、数字、下划线、点和连字符。"
                 }
             
-            # 生成参数字符串
-            params_str = self._generate_params_str(metadata.params)
-            
-            # 创建工具处理函数
-            exec_locals = {}
-            
-            # 生成工作流执行函数
-            func_def, target_workflow_path = self._generate_workflow_function(title, params_str)
-            # 执行函数定义，将工作流路径作为变量传入执行环境
-            exec(func_def, {
-                "metadata": metadata, 
-                "logger": logger, 
-                "Field": Field,
-                "execute_workflow": execute_workflow,
-                "WORKFLOW_PATH": target_workflow_path,
-            }, exec_locals)
+            # 保存工作流文件到工作流目录，重启与增量同步时从该目录加载
+            self._save_workflow_if_needed(workflow_path, title, version.content)
             
-            dynamic_function = exec_locals[title]
-            if metadata.description:
-                dynamic_function.__doc__ = metadata.description
-            
-            # 注册并记录工作流
-            self._register_workflow(title, dynamic_function, metadata)
-            
-            # 保存工作流文件到工作流目录
-            self._save_workflow_if_needed(workflow_path, title)
+            # 注册并记录工作流，切换工具绑定的版本
+            self._register_workflow(title, version, owner)
             
             logger.info(f"工作流 '{title}' 已成功加载为MCP工具")
             return {
@@ -230,6 +223,8 @@ class WorkflowManager:
             
             # 从记录中删除
             del self.loaded_workflows[workflow_name]
+            workflow_registry.unregister(workflow_name)
+            self.collect_versions()
             
             logger.info(f"成功卸载工作流: {workflow_name}")
             
@@ -247,76 +242,359 @@ class WorkflowManager:
             }
     
     
+    def _prepare_workflows(self) -> List[Tuple[Path, Optional[str], Optional[WorkflowMetadata], Optional[str]]]:
+        """计算工作流目录中所有文件的内容哈希并解析元数据
+        
+        文件在线程池中并发读取（工作流目录可能在网络存储上），内容未变的文件直接使用解析缓存，
+        其余文件在线程池中解析。服务运行中调用时进程已有事件循环、文件监听等线程，不使用 fork 的进程池；
+        单个工作流的解析在毫秒以内，不值得为此启动子进程。
+        耗时操作都在这里完成，可以放到线程中执行。
+        
+        Returns:
+            (文件, 工作流版本, 错误信息) 列表
+        """
+        self.workflows_dir.mkdir(parents=True, exist_ok=True)
+        json_files = sorted(self.workflows_dir.glob("*.json"))
+        self._load_total = len(json_files)
+        workers = min(WORKFLOW_LOAD_WORKERS, max(len(json_files), 1))
+        
+        def read(json_file: Path) -> Tuple[Optional[bytes], Optional[str], Optional[str]]:
+            try:
+                return (*_read_workflow(json_file), None)
+            except OSError as e:
+                return None, None, f"读取工作流文件失败: {e}"
+        
+        def parse(item: Tuple[str, Path]) -> Tuple[str, Optional[WorkflowMetadata], Optional[str]]:
+            content_hash, json_file = item
+            try:
+                return content_hash, _parse_workflow_content(contents[json_file], json_file.stem), None
+            except Exception as e:
+                return content_hash, None, f"解析工作流失败: {e}"
+        
+        hashes = {}
+        contents = {}
+        errors = {}
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="workflow-load") as pool:
+            for json_file, (content, content_hash, error) in zip(json_files, pool.map(read, json_files)):
+                if error:
+                    errors[json_file] = error
+                else:
+                    contents[json_file], hashes[json_file] = content, content_hash
+            
+            # 内容相同的文件只解析一次
+            cached = parse_cache.get_many(hashes.values())
+            misses = {}
+            for json_file, content_hash in hashes.items():
+                if content_hash not in cached:
+                    misses.setdefault(content_hash, json_file)
+            
+            if misses:
+                start_time = time.perf_counter()
+                parse_errors = {}
+                for content_hash, metadata, error in pool.map(parse, misses.items()):
+                    if error:
+                        parse_errors[content_hash] = error
+                    else:
+                        cached[content_hash] = metadata
+                parse_cache.put_many({content_hash: cached[content_hash] for content_hash in misses if cached.get(content_hash)})
+                for json_file, content_hash in hashes.items():
+                    if content_hash in parse_errors:
+                        errors[json_file] = parse_errors[content_hash]
+                logger.info(f"解析 {len(misses)} 个工作流耗时 {time.perf_counter() - start_time:.2f}s，其余 {len(hashes) - len(misses)} 个使用解析缓存")
+        
+        # 只保留当前工作流目录中文件的缓存
+        parse_cache.prune(hashes.values())
+        
+        prepared = []
+        for json_file in json_files:
+            content_hash = hashes.get(json_file)
+            metadata = cached.get(content_hash)
+            version = None
+            if metadata is not None:
+                version = WorkflowVersion(content_hash, contents[json_file], with_title(metadata, json_file.stem))
+            error = errors.get(json_file)
+            if version is None and error is None:
+                error = f"无法解析工作流元数据: {json_file}"
+            prepared.append((json_file, version, error))
+        return prepared
+    
+    def _register_prepared(self, prepared_item: Tuple, results: Dict) -> None:
+        json_file, version, error = prepared_item
+        if error is None:
+            result = self._load_parsed_workflow(json_file, version)
+            if result["success"]:
+                results["success"].append(result["workflow"])
+                return
+            error = result["error"]
+        else:
+            logger.error(f"加载工作流失败 {json_file.name}: {error}")
+        results["failed"].append({
+            "file": json_file.name,
+            "error": error
+        })
+    
     def load_all_workflows(self) -> Dict:
         """加载所有工作流"""
         results = {
             "success": [],
             "failed": []
         }
+        for item in self._prepare_workflows():
+            self._register_prepared(item, results)
+        self._finish_initial_load()
+        return results
+    
+    async def load_all_workflows_async(self) -> Dict:
+        """在服务运行时后台加载所有工作流
         
-        # 确保目录存在
-        self.workflows_dir.mkdir(parents=True, exist_ok=True)
+        哈希计算与解析在线程中执行，工具注册在事件循环中分批进行，期间服务正常响应请求。
+        """
+        results = {
+            "success": [],
+            "failed": []
+        }
+        prepared = await asyncio.to_thread(self._prepare_workflows)
+        for i, item in enumerate(prepared, 1):
+            self._register_prepared(item, results)
+            if i % WORKFLOW_REGISTER_BATCH == 0:
+                await asyncio.sleep(0)
+        self._finish_initial_load()
+        return results
+    
+    def _finish_initial_load(self):
+        # 注册表中保留的是上次运行时加载的工作流，移除本次未能加载的
+        stale = workflow_registry.retain(self.loaded_workflows)
+        if stale:
+            logger.info(f"从注册表中移除未加载的工作流: {stale}")
+        self.collect_versions()
+        self.ready = True
+    
+    def get_version(self, workflow_name: str) -> Optional[WorkflowVersion]:
+        """工作流当前加载的版本，未加载时返回 None"""
+        entry = self.loaded_workflows.get(workflow_name)
+        return entry["tool"].version if entry else None
+    
+    def load_version(self, workflow_name: str, content_hash: str) -> Optional[WorkflowVersion]:
+        """按内容哈希取得工作流版本
         
-        # 加载所有JSON文件
-        for json_file in self.workflows_dir.glob("*.json"):
-            result = self.load_workflow(json_file)
-            if result["success"]:
-                results["success"].append(result["workflow"])
-            else:
-                results["failed"].append({
-                    "file": json_file.name,
-                    "error": result["error"]
-                })
+        与当前加载的版本相同时直接使用，否则从版本快照恢复，快照不存在或无法解析时返回 None
+        """
+        current = self.get_version(workflow_name)
+        if current is not None and current.content_hash == content_hash:
+            return current
+        content = version_store.read(content_hash)
+        if content is None:
+            return None
+        workflow_path = self.workflows_dir / f"{workflow_name}.json"
+        metadata = self.parse_workflow_metadata(workflow_path, workflow_name, content, content_hash)
+        if not metadata:
+            return None
+        version = WorkflowVersion(content_hash, content, metadata)
+        version_store.add(version)
+        return version
+    
+    def collect_versions(self) -> List[str]:
+        """清理注册表历史中不再保留、也没有执行在使用的版本快照"""
+        return version_store.collect(workflow_registry.referenced_hashes())
+    
+    def rollback_workflow(self, workflow_name: str, version: int = 0) -> Dict:
+        """将工作流恢复到历史版本，version 为 0 时恢复到上一个版本
         
-        return results
+        恢复的内容作为新版本注册，工作流目录中的文件被原子替换
+        """
+        if workflow_name not in self.loaded_workflows:
+            return {
+                "success": False,
+                "error": f"工作流 '{workflow_name}' 不存在或未加载"
+            }
+        
+        current = self.loaded_workflows[workflow_name]["version"]
+        history = workflow_registry.get_versions(workflow_name)
+        if version:
+            target = next((entry for entry in history if entry["version"] == version), None)
+        else:
+            target = next((entry for entry in history if entry["version"] < current), None)
+        if target is None:
+            available = [entry["version"] for entry in history]
+            return {
+                "success": False,
+                "error": f"工作流 '{workflow_name}' 没有可恢复的版本 {version or '(上一个版本)'}，保留的版本: {available}"
+            }
+        
+        content = version_store.read(target["content_hash"]) if target["content_hash"] else None
+        if content is None:
+            return {
+                "success": False,
+                "error": f"工作流 '{workflow_name}' 版本 {target['version']} 的快照不存在"
+            }
+        
+        try:
+            workflow_path = self.workflows_dir / f"{workflow_name}.json"
+            metadata = self.parse_workflow_metadata(workflow_path, workflow_name, content, target["content_hash"])
+            if not metadata:
+                return {
+                    "success": False,
+                    "error": f"无法解析工作流 '{workflow_name}' 版本 {target['version']}"
+                }
+            result = self._load_parsed_workflow(None, WorkflowVersion(target["content_hash"], content, metadata))
+        except Exception as e:
+            logger.error(f"回滚工作流失败 {workflow_name}: {e}", exc_info=True)
+            return {
+                "success": False,
+                "error": f"回滚工作流失败: {str(e)}"
+            }
+        if not result["success"]:
+            return result
+        
+        new_version = self.loaded_workflows[workflow_name]["version"]
+        self.collect_versions()
+        logger.info(f"工作流 '{workflow_name}' 已从版本 {current} 恢复到版本 {target['version']} 的内容（新版本 {new_version}）")
+        return {
+            "success": True,
+            "workflow": workflow_name,
+            "restored_version": target["version"],
+            "version": new_version,
+            "message": f"工作流 '{workflow_name}' 已恢复到版本 {target['version']} 的内容，当前版本为 {new_version}"
+        }
+    
+    def get_load_state(self) -> Tuple[bool, Dict[str, Any]]:
+        """初始加载进度，用于就绪检查"""
+        return self.ready, {
+            "workflows_loaded": len(self.loaded_workflows),
+            "workflows_total": self._load_total,
+        }
     
     def get_workflow_status(self) -> Dict:
         """获取所有工作流状态"""
+        entries = workflow_registry.list_entries()
         return {
-            "total_loaded": len(self.loaded_workflows),
+            "total_loaded": len(entries),
             "workflows": {
-                name: {
-                    "metadata": info["metadata"],
-                    "loaded_at": info["loaded_at"].strftime("%Y-%m-%d %H:%M:%S") if isinstance(info["loaded_at"], datetime) else str(info["loaded_at"])
+                entry["name"]: {
+                    "metadata": entry["metadata"],
+                    "version": entry["version"],
+                    "loaded_at": entry["loaded_at"]
                 }
-                for name, info in self.loaded_workflows.items()
+                for entry in entries
             }
         }
     
-    def reload_all_workflows(self) -> Dict:
-        """手动重新加载所有工作流"""
-        logger.info("开始手动重新加载所有工作流")
+    def sync_workflows(self, force: bool = False) -> Dict:
+        """增量同步工作流目录
         
-        # 清除所有已加载的工作流
-        for workflow_name in list(self.loaded_workflows.keys()):
+        只重新解析内容哈希变化的文件并原地替换对应工具，文件被删除的工作流移除其工具，
+        解析失败时保留已注册的旧版本。force 为 True 时重新解析所有文件。
+        """
+        return self._apply_sync(self._prepare_sync(force))
+    
+    async def sync_workflows_async(self, force: bool = False) -> Dict:
+        """在服务运行时增量同步，读取与解析在线程中执行，工具注册在事件循环中进行"""
+        plan = await asyncio.to_thread(self._prepare_sync, force)
+        return self._apply_sync(plan)
+    
+    def _prepare_sync(self, force: bool = False) -> _SyncPlan:
+        """扫描工作流目录，读取并解析内容变化的文件，不修改工具注册"""
+        results = {
+            "added": [],
+            "updated": [],
+            "removed": [],
+            "unchanged": [],
+            "failed": []
+        }
+        self.workflows_dir.mkdir(parents=True, exist_ok=True)
+        
+        loaded_by_path = {info.get("path"): name for name, info in list(self.loaded_workflows.items())}
+        present = set()
+        changed = []
+        for json_file in sorted(self.workflows_dir.glob("*.json")):
+            path = str(json_file.resolve())
+            present.add(path)
+            name = loaded_by_path.get(path)
+            try:
+                content, content_hash = _read_workflow(json_file)
+            except OSError:
+                # 文件在扫描期间被删除，交给下一次同步处理
+                continue
+            if name and not force and content_hash == self.loaded_workflows.get(name, {}).get("content_hash"):
+                results["unchanged"].append(name)
+                continue
+            
             try:
-                mcp.remove_tool(workflow_name)
-            except:
-                pass  # 忽略移除失败的情况
+                metadata = self.parse_workflow_metadata(json_file, None, content, content_hash)
+                error = f"无法解析工作流元数据: {json_file}"
+            except Exception as e:
+                metadata = None
+                error = f"加载工作流失败: {str(e)}"
+            if not metadata:
+                logger.error(f"加载工作流失败 {json_file.name}: {error}")
+                results["failed"].append({
+                    "file": json_file.name,
+                    "error": error
+                })
+                continue
+            changed.append((json_file, name, WorkflowVersion(content_hash, content, metadata)))
+        return _SyncPlan(results, changed, loaded_by_path, present)
+    
+    def _apply_sync(self, plan: _SyncPlan) -> Dict:
+        """按准备结果注册变化的工作流、移除文件已不存在的工作流"""
+        results = plan.results
+        for json_file, name, version in plan.changed:
+            result = self._load_parsed_workflow(json_file, version)
+            if not result["success"]:
+                results["failed"].append({
+                    "file": json_file.name,
+                    "error": result["error"]
+                })
+                continue
+            results["updated" if name else "added"].append(result["workflow"])
+        
+        # 移除文件已不存在的工作流
+        workflows_dir = str(self.workflows_dir.resolve())
+        for path, name in plan.loaded_by_path.items():
+            if path and path not in plan.present and os.path.dirname(path) == workflows_dir and name in self.loaded_workflows:
+                try:
+                    mcp.remove_tool(name)
+                except Exception as e:
+                    logger.warning(f"移除工具失败 {name}: {e}")
+                del self.loaded_workflows[name]
+                workflow_registry.unregister(name)
+                results["removed"].append(name)
         
-        self.loaded_workflows.clear()
+        changed = len(results["added"]) + len(results["updated"]) + len(results["removed"])
+        if changed:
+            self.collect_versions()
+        if changed or results["failed"]:
+            logger.info(
+                f"工作流同步完成: 新增 {results['added']}，更新 {results['updated']}，"
+                f"移除 {results['removed']}，失败 {len(results['failed'])}"
+            )
+        return results
+    
+    def reload_all_workflows(self) -> Dict:
+        """手动重新加载所有工作流，逐个原地替换工具注册，重新加载期间工具始终可用"""
+        logger.info("开始手动重新加载所有工作流")
         
-        # 重新加载所有工作流
-        results = self.load_all_workflows()
+        results = self.sync_workflows(force=True)
+        loaded = results["added"] + results["updated"]
         
-        logger.info(f"手动重新加载完成: 成功 {len(results['success'])}，失败 {len(results['failed'])}")
+        logger.info(f"手动重新加载完成: 成功 {len(loaded)}，失败 {len(results['failed'])}，移除 {len(results['removed'])}")
         
         return {
             "success": True,
-            "message": f"重新加载完成: 成功 {len(results['success'])}，失败 {len(results['failed'])}",
-            "results": results
+            "message": f"重新加载完成: 成功 {len(loaded)}，失败 {len(results['failed'])}，移除 {len(results['removed'])}",
+            "results": {
+                "success": loaded,
+                "failed": results["failed"],
+                "removed": results["removed"]
+            }
         }
     
 
 
 
 
-# 创建工作流管理器实例
+# 创建工作流管理器实例，工作流在服务启动后由 main.serve 在后台加载
 workflow_manager = WorkflowManager()
 
-# 初始加载所有工作流
-load_results = workflow_manager.load_all_workflows()
-logger.info(f"初始工作流加载结果: {load_results}")
-
 # 导出模块级别的变量和实例
 __all__ = ['workflow_manager', 'WorkflowManager', 'CUSTOM_WORKFLOW_DIR'] 
\ No newline at end of file
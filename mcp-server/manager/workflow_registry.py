@@ -0,0 +1,163 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+"""
+工作流注册表
+
+已加载工作流的索引（名称、内容哈希、参数、输出、描述、所有者、版本、加载时间）持久化到SQLite，
+查询工具直接返回保存的 JSON，无需重建 pydantic 模型；服务重启后在工作流加载完成前即可查询。
+每个工作流最近 WORKFLOW_VERSION_HISTORY 个版本的内容哈希记录在 workflow_versions 表中，用于回滚。
+"""
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from comfyui.workflow_parser import WorkflowMetadata
+from manager.workflow_cache import WORKFLOW_DB_PATH
+from manager.workflow_versions import WORKFLOW_VERSION_HISTORY
+
+
+class WorkflowRegistry:
+    """工作流注册表，内容哈希变化时版本号加一"""
+
+    def __init__(self, db_path: str = WORKFLOW_DB_PATH):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._init_db()
+
+    def _init_db(self):
+        with self._lock, self._conn:
+            # 启动时逐个注册工作流，WAL 模式下每次提交无需等待同步到磁盘
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS workflows (
+                    name TEXT PRIMARY KEY,
+                    content_hash TEXT,
+                    version INTEGER NOT NULL,
+                    description TEXT,
+                    params TEXT NOT NULL,
+                    outputs TEXT NOT NULL,
+                    metadata TEXT NOT NULL,
+                    owner TEXT,
+                    loaded_at REAL NOT NULL
+                )
+            """)
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS workflow_versions (
+                    name TEXT NOT NULL,
+                    version INTEGER NOT NULL,
+                    content_hash TEXT,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (name, version)
+                )
+            """)
+
+    def register(self, metadata: WorkflowMetadata, content_hash: Optional[str] = None, owner: Optional[str] = None) -> int:
+        """记录已加载的工作流，返回版本号；未指定所有者时保留原有的所有者"""
+        name = metadata.title
+        with self._lock, self._conn:
+            row = self._conn.execute("SELECT content_hash, version, owner FROM workflows WHERE name = ?", (name,)).fetchone()
+            version = 1
+            if row is not None:
+                version = row["version"] if content_hash and row["content_hash"] == content_hash else row["version"] + 1
+                owner = owner or row["owner"]
+            now = time.time()
+            self._conn.execute(
+                "INSERT OR IGNORE INTO workflow_versions VALUES (?, ?, ?, ?)",
+                (name, version, content_hash, now),
+            )
+            self._conn.execute(
+                "DELETE FROM workflow_versions WHERE name = ? AND version <= ?",
+                (name, version - WORKFLOW_VERSION_HISTORY),
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO workflows VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    name,
+                    content_hash,
+                    version,
+                    metadata.description,
+                    json.dumps({param_name: param.model_dump() for param_name, param in metadata.params.items()}, ensure_ascii=False),
+                    json.dumps([mapping.output_var for mapping in metadata.mapping_info.output_mappings], ensure_ascii=False),
+                    metadata.model_dump_json(),
+                    owner,
+                    now,
+                ),
+            )
+        return version
+
+    def unregister(self, name: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM workflows WHERE name = ?", (name,))
+            self._conn.execute("DELETE FROM workflow_versions WHERE name = ?", (name,))
+
+    def retain(self, names: Iterable[str]) -> List[str]:
+        """删除不在 names 中的记录，返回被删除的名称"""
+        names = set(names)
+        with self._lock, self._conn:
+            stale = [row["name"] for row in self._conn.execute("SELECT name FROM workflows").fetchall() if row["name"] not in names]
+            self._conn.executemany("DELETE FROM workflows WHERE name = ?", [(name,) for name in stale])
+            self._conn.execute("DELETE FROM workflow_versions WHERE name NOT IN (SELECT name FROM workflows)")
+        return stale
+
+    def get_versions(self, name: str) -> List[Dict[str, Any]]:
+        """工作流保留的历史版本，按版本号从新到旧排列"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT version, content_hash, created_at FROM workflow_versions WHERE name = ? ORDER BY version DESC",
+                (name,),
+            ).fetchall()
+        return [
+            {
+                "version": row["version"],
+                "content_hash": row["content_hash"],
+                "created_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(row["created_at"])),
+            }
+            for row in rows
+        ]
+
+    def referenced_hashes(self) -> Set[str]:
+        """所有保留的历史版本的内容哈希"""
+        with self._lock:
+            rows = self._conn.execute("SELECT DISTINCT content_hash FROM workflow_versions WHERE content_hash IS NOT NULL").fetchall()
+        return {row["content_hash"] for row in rows}
+
+    def list_names(self) -> List[str]:
+        with self._lock:
+            return [row["name"] for row in self._conn.execute("SELECT name FROM workflows ORDER BY name").fetchall()]
+
+    def get(self, name: str) -> Optional[Dict[str, Any]]:
+        """查询单个工作流，metadata 为解析后的 JSON"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM workflows WHERE name = ?", (name,)).fetchone()
+        return self._row_to_dict(row) if row is not None else None
+
+    def list_entries(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM workflows ORDER BY name").fetchall()
+        return [self._row_to_dict(row) for row in rows]
+
+    def _row_to_dict(self, row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "name": row["name"],
+            "content_hash": row["content_hash"],
+            "version": row["version"],
+            "description": row["description"],
+            "params": json.loads(row["params"]),
+            "outputs": json.loads(row["outputs"]),
+            "metadata": json.loads(row["metadata"]),
+            "owner": row["owner"],
+            "loaded_at": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(row["loaded_at"])),
+        }
+
+
+workflow_registry = WorkflowRegistry()
+
+__all__ = ['workflow_registry', 'WorkflowRegistry']
@@ -0,0 +1,172 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+"""
+由工作流元数据直接构建的MCP工具
+
+参数的 JSON Schema 与校验规则在加载时根据 WorkflowMetadata.params 一次性生成，
+所有工作流共用 WorkflowTool.run 执行，加载时无需生成和编译函数代码，调用时只校验传入的参数。
+每个工具绑定一个不可变的工作流版本，更新工作流时注册新的工具对象替换旧工具。
+WorkflowTool 依赖 fastmcp 2.9 的 Tool.run 接口（返回内容列表），pyproject.toml 中限定了 fastmcp 的版本范围。
+"""
+
+import inspect
+from typing import Any, Dict, List, NamedTuple, Tuple
+
+from fastmcp.exceptions import ToolError
+from fastmcp.server.dependencies import get_context
+from fastmcp.tools.tool import Tool
+from mcp.types import TextContent
+from pydantic import PrivateAttr, TypeAdapter, ValidationError
+
+from core import logger
+from comfyui.facade import execute_template
+from comfyui.workflow_parser import WorkflowMetadata
+from manager.workflow_versions import WorkflowVersion
+
+USE_CACHE_DESCRIPTION = "Reuse the result of an identical previous call. Set to false only when the user explicitly asks to regenerate"
+
+# 工作流参数类型到 JSON Schema 类型与校验器的映射，校验规则与 pydantic 对函数参数的校验一致
+_JSON_SCHEMA_TYPES = {"str": "string", "int": "integer", "float": "number", "bool": "boolean"}
+_TYPE_ADAPTERS = {"str": TypeAdapter(str), "int": TypeAdapter(int), "float": TypeAdapter(float), "bool": TypeAdapter(bool)}
+
+
+class ParamSpec(NamedTuple):
+    """单个参数的校验规则"""
+    name: str
+    adapter: TypeAdapter
+    required: bool
+    default: Any
+
+
+def _schema_title(name: str) -> str:
+    return name.replace("_", " ").title()
+
+
+def build_param_specs(metadata: WorkflowMetadata) -> Tuple[ParamSpec, ...]:
+    return tuple(
+        ParamSpec(
+            name=param_name,
+            adapter=_TYPE_ADAPTERS.get(param.type, _TYPE_ADAPTERS["str"]),
+            required=param.default is None,
+            default=param.default,
+        )
+        for param_name, param in metadata.params.items()
+    )
+
+
+def build_parameters_schema(metadata: WorkflowMetadata) -> Dict[str, Any]:
+    """生成工具参数的 JSON Schema，必需参数在前，可选参数在后，最后是结果缓存开关"""
+    properties = {}
+    required = []
+    optional = {}
+    for param_name, param in metadata.params.items():
+        prop = {
+            "description": param.description or "",
+            "title": _schema_title(param_name),
+            "type": _JSON_SCHEMA_TYPES.get(param.type, "string"),
+        }
+        if param.default is None:
+            properties[param_name] = prop
+            required.append(param_name)
+        else:
+            optional[param_name] = {"default": param.default, **prop}
+    properties.update(optional)
+    properties["use_cache"] = {
+        "default": True,
+        "description": USE_CACHE_DESCRIPTION,
+        "title": "Use Cache",
+        "type": "boolean",
+    }
+    schema = {"properties": properties}
+    if required:
+        schema["required"] = required
+    schema["type"] = "object"
+    return schema
+
+
+class WorkflowTool(Tool):
+    """执行工作流的MCP工具"""
+
+    _version: WorkflowVersion = PrivateAttr()
+    _param_specs: Tuple[ParamSpec, ...] = PrivateAttr(default=())
+    _known_args: frozenset = PrivateAttr(default=frozenset())
+
+    @classmethod
+    def from_version(cls, version: WorkflowVersion) -> "WorkflowTool":
+        metadata = version.metadata
+        tool = cls(
+            name=metadata.title,
+            description=inspect.cleandoc(metadata.description) if metadata.description else None,
+            parameters=build_parameters_schema(metadata),
+        )
+        tool._version = version
+        tool._param_specs = build_param_specs(metadata)
+        tool._known_args = frozenset(spec.name for spec in tool._param_specs) | {"use_cache"}
+        return tool
+
+    @property
+    def version(self) -> WorkflowVersion:
+        return self._version
+
+    def bind_arguments(self, arguments: Dict[str, Any]) -> Tuple[Dict[str, Any], bool]:
+        """校验调用参数并补全默认值，返回 (工作流参数, 是否使用结果缓存)"""
+        errors: List[str] = []
+        unexpected = arguments.keys() - self._known_args
+        if unexpected:
+            errors.append(f"unexpected arguments {sorted(unexpected)}")
+
+        params = {}
+        for spec in self._param_specs:
+            if spec.name not in arguments:
+                if spec.required:
+                    errors.append(f"{spec.name}: field required")
+                else:
+                    params[spec.name] = spec.default
+                continue
+            try:
+                params[spec.name] = spec.adapter.validate_python(arguments[spec.name])
+            except ValidationError as e:
+                errors.append(f"{spec.name}: {e.errors()[0]['msg']}")
+
+        use_cache = True
+        if "use_cache" in arguments:
+            try:
+                use_cache = _TYPE_ADAPTERS["bool"].validate_python(arguments["use_cache"])
+            except ValidationError as e:
+                errors.append(f"use_cache: {e.errors()[0]['msg']}")
+
+        if errors:
+            raise ToolError(f"Invalid arguments for tool '{self.name}': " + "; ".join(errors))
+        return params, use_cache
+
+    async def run(self, arguments: Dict[str, Any]) -> List[TextContent]:
+        params, use_cache = self.bind_arguments(arguments)
+        return [TextContent(type="text", text=await self._execute(self._version, params, use_cache))]
+
+    async def _execute(self, version: WorkflowVersion, params: Dict[str, Any], use_cache: bool) -> str:
+        """使用调用开始时的版本执行，期间工作流被更新也不影响本次调用"""
+        try:
+            # 在MCP请求之外调用时没有请求上下文
+            try:
+                ctx = get_context()
+            except RuntimeError:
+                ctx = None
+
+            result = await execute_template(version.metadata, version.template, params, ctx, use_cache, version.content_hash)
+
+            # Convert the result to a format friendly to LLM
+            if result.status == "completed":
+                return result.to_llm_result()
+            elif result.status in ("rejected", "deferred"):
+                # ComfyUI is too busy: the message carries the ETA and what to do next
+                return str(result.msg)
+            else:
+                return "Workflow execution failed: " + str(result.msg or result.status)
+
+        except Exception as e:
+            logger.error(f"Workflow execution failed {self.name!r}: {e}", exc_info=True)
+            return "Workflow execution exception: " + str(e)
+
+
+__all__ = ['WorkflowTool', 'USE_CACHE_DESCRIPTION', 'build_parameters_schema', 'build_param_specs']
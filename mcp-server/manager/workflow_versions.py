@@ -0,0 +1,142 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+"""
+不可变的工作流版本
+
+每次加载得到一个以内容哈希标识的 WorkflowVersion，持有文件内容、元数据以及按需编译的模板。
+工具在调用开始时取得当前版本的引用并在整个执行过程中使用它，不再读取工作流文件；
+更新工作流时替换工具持有的版本（原子操作），执行中的调用不受影响。
+
+每个版本的内容另存为 WORKFLOW_VERSIONS_DIR/<内容哈希>.json 快照用于回滚，
+注册表中保留的历史版本、仍被执行引用的版本以及未完成的后台任务使用的版本之外的快照会被清理。
+"""
+
+import os
+import json
+import threading
+import weakref
+from typing import Callable, Iterable, List, Optional
+
+from core import logger
+from utils.os_util import get_data_path
+from comfyui.workflow_parser import WorkflowMetadata
+from comfyui.workflow_template import WorkflowTemplate
+
+WORKFLOW_VERSIONS_DIR = os.getenv("WORKFLOW_VERSIONS_DIR") or get_data_path("workflow_versions")
+# 每个工作流保留的历史版本数（含当前版本），用于回滚
+WORKFLOW_VERSION_HISTORY = max(int(os.getenv("WORKFLOW_VERSION_HISTORY", "5")), 1)
+
+
+def write_file_atomic(path: str, content: bytes):
+    """先写入同目录下的临时文件再替换，读取方只会看到完整的旧内容或新内容"""
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+class WorkflowVersion:
+    """工作流的一个不可变版本"""
+
+    def __init__(self, content_hash: str, content: bytes, metadata: WorkflowMetadata, version: int = 0):
+        self.content_hash = content_hash
+        self.content = content
+        self.metadata = metadata
+        # 注册表中的版本号
+        self.version = version
+        self._template: Optional[WorkflowTemplate] = None
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return self.metadata.title
+
+    @property
+    def template(self) -> WorkflowTemplate:
+        """首次执行时编译模板，启动时加载大量工作流无需预先编译"""
+        if self._template is None:
+            with self._lock:
+                if self._template is None:
+                    self._template = WorkflowTemplate(json.loads(self.content), self.metadata)
+        return self._template
+
+
+class WorkflowVersionStore:
+    """工作流版本快照存储"""
+
+    def __init__(self, versions_dir: str = WORKFLOW_VERSIONS_DIR):
+        self.versions_dir = versions_dir
+        os.makedirs(versions_dir, exist_ok=True)
+        # 仍被工具或执行中的调用引用的版本
+        self._live: "weakref.WeakSet[WorkflowVersion]" = weakref.WeakSet()
+        # 进程重启后仍需保留的快照来源，如未完成的后台任务
+        self._reference_sources: List[Callable[[], Iterable[str]]] = []
+        self._lock = threading.Lock()
+
+    def snapshot_path(self, content_hash: str) -> str:
+        return os.path.join(self.versions_dir, f"{content_hash}.json")
+
+    def add(self, version: WorkflowVersion):
+        """记录版本并保存快照，内容相同的快照只保存一次"""
+        with self._lock:
+            self._live.add(version)
+        path = self.snapshot_path(version.content_hash)
+        if not os.path.exists(path):
+            try:
+                write_file_atomic(path, version.content)
+            except OSError as e:
+                logger.warning(f"保存工作流版本快照失败 {version.name}: {e}")
+
+    def read(self, content_hash: str) -> Optional[bytes]:
+        try:
+            with open(self.snapshot_path(content_hash), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def add_reference_source(self, source: Callable[[], Iterable[str]]):
+        """注册返回内容哈希的引用来源，清理快照时保留这些哈希"""
+        self._reference_sources.append(source)
+
+    def collect(self, keep: Iterable[str]) -> List[str]:
+        """删除既不在 keep 中、也不再被引用的快照，返回被删除的内容哈希"""
+        keep = set(keep)
+        for source in self._reference_sources:
+            try:
+                keep.update(source())
+            except Exception as e:
+                # 无法确定哪些快照仍被引用时不清理
+                logger.warning(f"查询工作流版本引用失败，跳过快照清理: {e}")
+                return []
+        with self._lock:
+            keep |= {version.content_hash for version in self._live}
+        removed = []
+        try:
+            entries = os.listdir(self.versions_dir)
+        except OSError as e:
+            logger.warning(f"扫描工作流版本目录失败: {e}")
+            return removed
+        for entry in entries:
+            content_hash, ext = os.path.splitext(entry)
+            if ext != ".json" or content_hash in keep:
+                continue
+            try:
+                os.remove(os.path.join(self.versions_dir, entry))
+                removed.append(content_hash)
+            except OSError as e:
+                logger.warning(f"删除工作流版本快照失败 {entry}: {e}")
+        if removed:
+            logger.info(f"已清理 {len(removed)} 个不再使用的工作流版本快照")
+        return removed
+
+
+version_store = WorkflowVersionStore()
+
+__all__ = ['version_store', 'WorkflowVersion', 'WorkflowVersionStore', 'write_file_atomic', 'WORKFLOW_VERSION_HISTORY']
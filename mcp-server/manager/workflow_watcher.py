@@ -0,0 +1,146 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+"""
+工作流目录热更新
+
+监听 CUSTOM_WORKFLOW_DIR 中 JSON 文件的变化，事件合并（debounce）后增量同步：
+只重新解析内容变化的文件、原地替换工具注册，并向客户端发送 tools/list_changed。
+安装 watchdog 时使用 inotify 等系统通知 (uv sync --extra watch)，否则定时轮询文件的修改时间与大小。
+"""
+
+import os
+import asyncio
+from typing import Dict, Optional, Tuple
+
+from core import logger
+from manager.workflow_manager import workflow_manager, WorkflowManager
+from utils.session_util import notify_tool_list_changed
+
+WORKFLOW_WATCH_ENABLED = os.getenv("WORKFLOW_WATCH_ENABLED", "true").lower() == "true"
+# 最后一个事件之后等待多少秒再同步，编辑器保存、批量复制时会产生一连串事件
+WORKFLOW_WATCH_DEBOUNCE = float(os.getenv("WORKFLOW_WATCH_DEBOUNCE", "1.0"))
+# 未安装 watchdog 时的轮询间隔
+WORKFLOW_WATCH_POLL_INTERVAL = float(os.getenv("WORKFLOW_WATCH_POLL_INTERVAL", "5"))
+
+# 会改变文件内容的事件类型
+WRITE_EVENT_TYPES = {"created", "modified", "deleted", "moved", "closed"}
+
+
+class WorkflowWatcher:
+    """工作流目录监听器"""
+
+    def __init__(self, manager: WorkflowManager, debounce: float = WORKFLOW_WATCH_DEBOUNCE, poll_interval: float = WORKFLOW_WATCH_POLL_INTERVAL):
+        self.manager = manager
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._changed: Optional[asyncio.Event] = None
+        self._observer = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """在当前事件循环中启动监听"""
+        if self._task is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._changed = asyncio.Event()
+        self.manager.workflows_dir.mkdir(parents=True, exist_ok=True)
+        self._observer = self._start_observer()
+        if self._observer is not None:
+            self._task = asyncio.create_task(self._watch_events())
+            logger.info(f"工作流热更新已开启: {self.manager.workflows_dir}")
+        else:
+            self._task = asyncio.create_task(self._watch_polling(self._snapshot()))
+            logger.info(f"工作流热更新已开启（轮询 {self.poll_interval}s，安装 watchdog 可改为文件系统通知）: {self.manager.workflows_dir}")
+        # 补上启动加载之后、开始监听之前发生的变化
+        await self.sync()
+
+    def stop(self):
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer = None
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def _start_observer(self):
+        try:
+            from watchdog.events import FileSystemEventHandler
+            from watchdog.observers import Observer
+        except ImportError:
+            return None
+
+        watcher = self
+
+        class WorkflowEventHandler(FileSystemEventHandler):
+            def on_any_event(self, event):
+                # 在 watchdog 线程中回调，只唤醒事件循环；
+                # 忽略 opened / closed_no_write，否则同步时读取文件会再次触发同步
+                if event.is_directory or event.event_type not in WRITE_EVENT_TYPES:
+                    return
+                paths = (event.src_path, getattr(event, "dest_path", "") or "")
+                if any(str(path).endswith(".json") for path in paths):
+                    watcher._loop.call_soon_threadsafe(watcher._changed.set)
+
+        observer = Observer()
+        observer.schedule(WorkflowEventHandler(), str(self.manager.workflows_dir), recursive=False)
+        observer.daemon = True
+        try:
+            observer.start()
+        except OSError as e:
+            # 如 inotify 实例数达到上限
+            logger.warning(f"启动文件监听失败，改为轮询: {e}")
+            return None
+        return observer
+
+    async def _watch_events(self):
+        while True:
+            await self._changed.wait()
+            # 直到 debounce 时间内没有新事件才同步
+            while True:
+                self._changed.clear()
+                try:
+                    await asyncio.wait_for(self._changed.wait(), self.debounce)
+                except asyncio.TimeoutError:
+                    break
+            await self.sync()
+
+    async def _watch_polling(self, snapshot: Dict[str, Tuple[int, int]]):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            current = self._snapshot()
+            if current == snapshot:
+                continue
+            # 等待写入完成
+            await asyncio.sleep(self.debounce)
+            snapshot = self._snapshot()
+            await self.sync()
+
+    def _snapshot(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        try:
+            with os.scandir(self.manager.workflows_dir) as entries:
+                for entry in entries:
+                    if entry.name.endswith(".json") and entry.is_file():
+                        stat = entry.stat()
+                        snapshot[entry.name] = (stat.st_mtime_ns, stat.st_size)
+        except OSError as e:
+            logger.warning(f"扫描工作流目录失败: {e}")
+        return snapshot
+
+    async def sync(self) -> Dict:
+        """增量同步并在工具列表变化时通知客户端，读取与解析不阻塞事件循环"""
+        try:
+            results = await self.manager.sync_workflows_async()
+        except Exception as e:
+            logger.error(f"工作流热更新失败: {e}", exc_info=True)
+            return {}
+        if results["added"] or results["updated"] or results["removed"]:
+            await notify_tool_list_changed()
+        return results
+
+
+workflow_watcher = WorkflowWatcher(workflow_manager)
+
+__all__ = ['workflow_watcher', 'WorkflowWatcher', 'WORKFLOW_WATCH_ENABLED']
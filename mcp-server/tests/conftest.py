@@ -0,0 +1,136 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+"""
+mcp-server 测试配置
+
+导入 core 之前把配置文件与所有数据目录指向临时目录，不读写仓库中的 config.yml 与 data 目录；
+需要 ComfyUI 的测试使用 benchmarks/fake_comfyui.py 中的模拟服务
+"""
+
+import os
+import sys
+import json
+import shutil
+import socket
+import tempfile
+from pathlib import Path
+from typing import Any, Dict
+
+import pytest
+import yaml
+
+SERVER_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(SERVER_DIR / "benchmarks"))
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+TEST_DIR = tempfile.mkdtemp(prefix="pixelle-mcp-test-")
+COMFYUI_PORT = _free_port()
+COMFYUI_URL = f"http://127.0.0.1:{COMFYUI_PORT}"
+
+_config_path = os.path.join(TEST_DIR, "config.yml")
+with open(_config_path, "w", encoding="utf-8") as f:
+    yaml.safe_dump({
+        "server": {
+            "comfyui_base_url": COMFYUI_URL,
+            "comfyui_executor_type": "http",
+            # 文本工作流不产生结果文件，不会访问 mcp-base
+            "mcp_base_url": "http://127.0.0.1:1",
+            "custom_workflow_dir": os.path.join(TEST_DIR, "custom_workflows"),
+            "workflow_db_path": os.path.join(TEST_DIR, "workflows.db"),
+            "workflow_versions_dir": os.path.join(TEST_DIR, "workflow_versions"),
+            "job_db_path": os.path.join(TEST_DIR, "jobs.db"),
+            "workflow_watch_enabled": False,
+            "otel_enabled": False,
+        }
+    }, f)
+os.environ["PIXELLE_CONFIG"] = _config_path
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+
+def text_workflow(prompt: str = "hello", description: str = "Echo the prompt") -> Dict[str, Any]:
+    """最小的文本工作流：字符串参数 prompt、整数参数 count，输出 text"""
+    return {
+        "1": {
+            "inputs": {"value": prompt},
+            "class_type": "PrimitiveStringMultiline",
+            "_meta": {"title": "$prompt.value:The prompt"},
+        },
+        "2": {
+            "inputs": {"value": 1},
+            "class_type": "PrimitiveInt",
+            "_meta": {"title": "$count.value:How many"},
+        },
+        "3": {
+            "inputs": {"anything": ["1", 0], "count": ["2", 0]},
+            "class_type": "easy showAnything",
+            "_meta": {"title": "$output.text"},
+        },
+        "4": {
+            "inputs": {"value": description},
+            "class_type": "PrimitiveStringMultiline",
+            "_meta": {"title": "MCP"},
+        },
+    }
+
+
+@pytest.fixture
+def make_workflow():
+    return text_workflow
+
+
+@pytest.fixture
+def write_workflow(tmp_path):
+    """把工作流写入 tmp_path/<name>.json 并返回路径"""
+    def write(name: str, workflow: Dict[str, Any], directory: Path = tmp_path) -> Path:
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{name}.json"
+        path.write_text(json.dumps(workflow), encoding="utf-8")
+        return path
+    return write
+
+
+@pytest.fixture
+def load_workflow(write_workflow):
+    """在全局工作流管理器中加载 text_workflow(prompt)，再次调用即更新，测试结束后卸载"""
+    from manager.workflow_manager import workflow_manager
+    names = set()
+
+    def load(name: str, prompt: str = "hello"):
+        result = workflow_manager.load_workflow(write_workflow(name, text_workflow(prompt)))
+        assert result["success"], result
+        names.add(name)
+        return workflow_manager.get_version(name)
+
+    yield load
+    for name in names:
+        workflow_manager.unload_workflow(name)
+
+
+@pytest.fixture
+async def fake_comfyui():
+    """在配置的端口上启动模拟 ComfyUI"""
+    from fake_comfyui import FakeComfyUI, SimulatorConfig
+    simulator = FakeComfyUI(SimulatorConfig(default_delay=0.05))
+    await simulator.start("127.0.0.1", COMFYUI_PORT)
+    try:
+        yield simulator
+    finally:
+        await simulator.stop()
+
+
+@pytest.fixture(autouse=True)
+def _clear_result_cache():
+    from comfyui.result_cache import result_cache
+    result_cache.clear()
+    yield
+    result_cache.clear()
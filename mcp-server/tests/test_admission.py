@@ -0,0 +1,127 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+import asyncio
+
+import pytest
+
+from comfyui import admission as admission_module
+from comfyui.admission import AdmissionController, AdmissionRejected, admission
+from comfyui.facade import default_client
+from comfyui.scheduler import ScheduleRequest, request_context
+from comfyui.workflow_parser import WorkflowParser
+from comfyui.workflow_template import WorkflowTemplate
+
+
+class QueueStub:
+    """只提供准入控制用到的 base_url 与 get_queue_status 的执行器"""
+
+    def __init__(self, depth: int = 0):
+        self.base_url = "http://comfyui-admission-test"
+        self.depth = depth
+
+    async def get_queue_status(self):
+        return {"running": [], "pending": [f"p{i}" for i in range(self.depth)]}
+
+
+@pytest.fixture
+def enabled(monkeypatch):
+    monkeypatch.setattr(admission_module, "COMFYUI_ADMISSION_ENABLED", True)
+    monkeypatch.setattr(admission_module, "ADMISSION_SLO", {"normal": 900.0})
+
+
+async def test_disabled_by_default_admits_everything():
+    controller = AdmissionController()
+    assert await controller.admit(QueueStub(depth=1000), ScheduleRequest(workflow_name="wf")) is None
+
+
+async def test_idle_backend_is_always_admitted(enabled):
+    controller = AdmissionController()
+    controller.record_duration("wf", 2000)
+    eta = await controller.admit(QueueStub(), ScheduleRequest(workflow_name="wf"))
+    assert eta == 2000
+
+
+async def test_backlog_beyond_slo_is_rejected_with_eta(enabled):
+    controller = AdmissionController()
+    controller.record_duration("wf", 100)
+    with pytest.raises(AdmissionRejected) as rejected:
+        await controller.admit(QueueStub(depth=20), ScheduleRequest(workflow_name="wf"))
+    assert rejected.value.eta == pytest.approx(2100)
+    assert rejected.value.slo == 900
+    assert "submit_job" in str(rejected.value)
+
+
+async def test_background_requests_only_respect_max_backlog(enabled, monkeypatch):
+    controller = AdmissionController()
+    controller.record_duration("wf", 100)
+    request = ScheduleRequest(workflow_name="wf", background=True)
+    assert await controller.admit(QueueStub(depth=20), request) == pytest.approx(2100)
+
+    monkeypatch.setattr(admission_module, "COMFYUI_ADMISSION_MAX_BACKLOG", 1000.0)
+    with pytest.raises(AdmissionRejected):
+        await controller.admit(QueueStub(depth=20), request)
+
+
+async def test_defer_hands_the_call_to_the_handler(monkeypatch):
+    controller = AdmissionController()
+    deferred = []
+
+    async def handler(request, params):
+        deferred.append((request.workflow_name, params))
+        return "job-1"
+
+    controller.set_defer_handler(handler)
+    request = ScheduleRequest(workflow_name="wf")
+    assert await controller.defer(request, {"prompt": "x"}) == "job-1"
+    assert deferred == [("wf", {"prompt": "x"})]
+
+    # 后台任务被拒绝时不再转为新的后台任务
+    assert await controller.defer(ScheduleRequest(workflow_name="wf", background=True), {}) is None
+
+    monkeypatch.setattr(admission_module, "COMFYUI_ADMISSION_ACTION", "reject")
+    assert await controller.defer(request, {}) is None
+    assert len(deferred) == 1
+
+
+async def test_failing_defer_handler_falls_back_to_reject():
+    controller = AdmissionController()
+
+    async def handler(request, params):
+        raise ValueError("workflow not loaded")
+
+    controller.set_defer_handler(handler)
+    assert await controller.defer(ScheduleRequest(workflow_name="wf"), {}) is None
+
+
+async def test_coalesced_calls_are_deferred_once(monkeypatch, make_workflow):
+    workflow = make_workflow()
+    metadata = WorkflowParser().parse_workflow(workflow, "coalesce_reject_test")
+    template = WorkflowTemplate(workflow, metadata)
+    admitted = []
+    deferred = []
+
+    async def reject(executor, request):
+        admitted.append(request.workflow_name)
+        await asyncio.sleep(0.05)
+        raise AdmissionRejected(3600, 900, "busy")
+
+    async def handler(request, params):
+        deferred.append(params)
+        return f"job-{len(deferred)}"
+
+    monkeypatch.setattr(admission, "admit", reject)
+    monkeypatch.setattr(admission, "_defer_handler", handler)
+    monkeypatch.setattr(admission_module, "COMFYUI_ADMISSION_ACTION", "defer")
+
+    executor = default_client._get_executor()
+    with request_context("coalesce_reject_test"):
+        results = await asyncio.gather(
+            executor.execute_template(metadata, template, {"prompt": "same"}),
+            executor.execute_template(metadata, template, {"prompt": "same"}),
+        )
+
+    assert len(admitted) == 1
+    assert len(deferred) == 1
+    assert [result.status for result in results] == ["deferred", "deferred"]
+    assert all("job-1" in result.msg for result in results)
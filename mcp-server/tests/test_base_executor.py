@@ -0,0 +1,37 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+import time
+
+import pytest
+
+from comfyui.http_executor import HttpExecutor
+
+
+def test_phases_use_the_local_clock_when_comfyui_clock_is_skewed(monkeypatch):
+    executor = HttpExecutor("http://comfyui-phase-test")
+    recorded = []
+    monkeypatch.setattr(executor, "_record_phases", lambda *args: recorded.append(args))
+
+    submitted_at = time.time() - 10
+    # ComfyUI 的时钟比本地慢一小时，执行用时 4 秒
+    remote_start = (submitted_at - 3600 + 5) * 1000
+    status = {"messages": [
+        ["execution_start", {"timestamp": remote_start}],
+        ["execution_success", {"timestamp": remote_start + 4000}],
+    ]}
+    executor._record_phases_from_status("prompt", submitted_at, status)
+
+    _, submitted, started_at, finished_at = recorded[0]
+    assert submitted == submitted_at
+    assert finished_at - started_at == pytest.approx(4)
+    assert started_at - submitted_at == pytest.approx(6, abs=0.5)
+
+
+def test_phases_without_timestamps_are_recorded_as_execution(monkeypatch):
+    executor = HttpExecutor("http://comfyui-phase-test")
+    recorded = []
+    monkeypatch.setattr(executor, "_record_phases", lambda *args: recorded.append(args))
+
+    executor._record_phases_from_status("prompt", time.time() - 1, None)
+    assert recorded[0][2] is None
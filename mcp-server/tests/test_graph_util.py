@@ -0,0 +1,75 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+from comfyui.graph_util import analyze_graph, canonical_graph_hash, is_deterministic
+from comfyui.workflow_parser import WorkflowParser
+from comfyui.workflow_template import WorkflowTemplate
+
+
+def node(class_type: str, title: str = "", **inputs):
+    return {"inputs": inputs, "class_type": class_type, "_meta": {"title": title}}
+
+
+def image_workflow():
+    return {
+        "1": node("CheckpointLoaderSimple", ckpt_name="model.safetensors"),
+        "2": node("CLIPTextEncode", "$prompt.text!:The prompt", clip=["1", 1], text=""),
+        "3": node("KSampler", model=["1", 0], positive=["2", 0], seed=42),
+        "4": node("VAEDecode", samples=["3", 0], vae=["1", 2]),
+        "5": node("SaveImage", "$output.image", images=["4", 0]),
+        # 未声明为输出的预览节点及只为它服务的上游节点
+        "6": node("ImageScale", image=["4", 0]),
+        "7": node("PreviewImage", images=["6", 0]),
+        # 文本结果可能作为输出，PreviewAny 不视为预览节点
+        "8": node("PreviewAny", source=["2", 0]),
+        "9": node("PrimitiveStringMultiline", "MCP", value="Generate an image"),
+    }
+
+
+def test_unused_preview_branch_is_detected():
+    analysis = analyze_graph(image_workflow(), ["5"], ["2"], ["9"])
+    assert analysis.output_node_ids == ["5", "8"]
+    assert sorted(analysis.unused_node_ids) == ["6", "7", "9"]
+
+
+def test_parameterized_nodes_are_kept():
+    workflow = image_workflow()
+    workflow["10"] = node("PrimitiveInt", "$steps.value:Steps", value=20)
+    # 被参数修改的节点即使不影响输出也保留
+    workflow["11"] = node("PreviewImage", images=["10", 0])
+    analysis = analyze_graph(workflow, ["5"], ["2", "10"], ["9"])
+    assert "10" not in analysis.unused_node_ids
+    assert "11" in analysis.unused_node_ids
+
+
+def test_without_declared_outputs_nothing_is_pruned():
+    analysis = analyze_graph(image_workflow(), [], ["2"], ["9"])
+    assert analysis.output_node_ids is None
+    assert analysis.unused_node_ids == []
+
+
+def test_template_drops_unused_nodes():
+    workflow = image_workflow()
+    metadata = WorkflowParser().parse_workflow(workflow, "prune_test")
+    assert metadata.mapping_info.output_node_ids == ["5", "8"]
+
+    graph = WorkflowTemplate(workflow, metadata).instantiate()
+    assert sorted(graph) == ["1", "2", "3", "4", "5", "8"]
+    # 被参数化的节点复制，修改不影响模板
+    graph["2"]["inputs"]["text"] = "a cat"
+    assert workflow["2"]["inputs"]["text"] == ""
+
+
+def test_canonical_hash_ignores_meta_and_uploaded_file_names():
+    first = {"1": node("LoadImage", "$image.image!", image="upload_1f3a.png")}
+    second = {"1": node("LoadImage", "renamed", image="upload_9c2d.png")}
+    assert canonical_graph_hash(first, {"upload_1f3a.png": "digest"}) == canonical_graph_hash(second, {"upload_9c2d.png": "digest"})
+    assert canonical_graph_hash(first, {"upload_1f3a.png": "digest"}) != canonical_graph_hash(second, {"upload_9c2d.png": "other"})
+    assert canonical_graph_hash(first) != canonical_graph_hash(second)
+
+
+def test_random_seed_makes_workflow_nondeterministic():
+    workflow = image_workflow()
+    assert is_deterministic(workflow)
+    workflow["3"]["inputs"]["seed"] = -1
+    assert not is_deterministic(workflow)
@@ -0,0 +1,185 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+import asyncio
+import json
+import sqlite3
+import time
+
+import aiohttp
+import pytest
+
+from comfyui.facade import default_client
+from comfyui.scheduler import ScheduleRequest
+from manager.job_manager import Job, JobManager, job_manager
+from manager.workflow_manager import workflow_manager
+from tools.job_tool import submit_job
+
+WORKFLOW_NAME = "job_test"
+
+
+@pytest.fixture
+def jobs_db(tmp_path):
+    return str(tmp_path / "jobs.db")
+
+
+@pytest.fixture
+def loaded(load_workflow):
+    """加载测试工作流，loaded(prompt) 更新其内容"""
+    load_workflow(WORKFLOW_NAME, "v1")
+    return lambda prompt: load_workflow(WORKFLOW_NAME, prompt)
+
+
+async def wait_until_finished(manager: JobManager, job_id: str, timeout: float = 15) -> Job:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = manager.get_job(job_id)
+        if job.is_finished:
+            return job
+        await asyncio.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not finish: {manager.get_job(job_id)}")
+
+
+def submitted_prompt(fake_comfyui, prompt_id: str):
+    return fake_comfyui.history[prompt_id]["prompt"][2]
+
+
+async def test_job_runs_and_is_persisted(fake_comfyui, loaded, jobs_db):
+    manager = JobManager(jobs_db)
+    job = manager.submit(WORKFLOW_NAME, {"prompt": "a cat"})
+    assert job.content_hash == workflow_manager.get_version(WORKFLOW_NAME).content_hash
+
+    job = await wait_until_finished(manager, job.job_id)
+    assert job.status == "completed"
+    assert job.result.texts
+    assert submitted_prompt(fake_comfyui, job.prompt_id)["1"]["inputs"]["value"] == "a cat"
+
+    stored = JobManager(jobs_db).get_job(job.job_id)
+    assert stored.status == "completed"
+    assert stored.prompt_id == job.prompt_id
+    assert stored.content_hash == job.content_hash
+    assert stored.result == job.result
+
+
+async def test_submit_job_stores_validated_params(fake_comfyui, loaded):
+    result = json.loads(await submit_job.fn(workflow_name=WORKFLOW_NAME, params={"count": "many"}, ctx=None))
+    assert result["success"] is False
+    assert "count:" in result["error"]
+
+    result = json.loads(await submit_job.fn(workflow_name=WORKFLOW_NAME, params={"count": "3"}, ctx=None))
+    assert result["success"] is True
+    job = await wait_until_finished(job_manager, result["job_id"])
+    assert job.params == {"prompt": "v1", "count": 3}
+    assert job.status == "completed"
+    assert fake_comfyui.stats["prompts"] == 1
+
+
+async def test_job_keeps_its_version_when_the_workflow_changes(fake_comfyui, loaded, jobs_db):
+    fake_comfyui.config.default_delay = 0.3
+    manager = JobManager(jobs_db)
+    job = manager.submit(WORKFLOW_NAME, {})
+    loaded("v2")
+
+    job = await wait_until_finished(manager, job.job_id)
+    assert job.status == "completed"
+    assert submitted_prompt(fake_comfyui, job.prompt_id)["1"]["inputs"]["value"] == "v1"
+
+
+async def test_pending_job_resumes_on_its_submitted_version(fake_comfyui, loaded, jobs_db):
+    old_hash = workflow_manager.get_version(WORKFLOW_NAME).content_hash
+    loaded("v2")
+    # 重启前未提交到ComfyUI的任务
+    JobManager(jobs_db)._save(Job(job_id="pending-job", workflow_name=WORKFLOW_NAME, content_hash=old_hash))
+
+    manager = JobManager(jobs_db)
+    assert manager.referenced_hashes() == [old_hash]
+    await manager.resume_jobs()
+    job = await wait_until_finished(manager, "pending-job")
+    assert job.status == "completed"
+    assert submitted_prompt(fake_comfyui, job.prompt_id)["1"]["inputs"]["value"] == "v1"
+    assert manager.referenced_hashes() == []
+
+
+async def test_queued_job_is_taken_over_without_resubmitting(fake_comfyui, loaded, jobs_db):
+    version = workflow_manager.get_version(WORKFLOW_NAME)
+    base_url = default_client._get_executor().base_url
+    async with aiohttp.ClientSession() as session:
+        async with session.post(f"{base_url}/prompt", json={"prompt": dict(version.template.instantiate())}) as response:
+            prompt_id = (await response.json())["prompt_id"]
+    # 重启前已提交到ComfyUI的任务
+    JobManager(jobs_db)._save(Job(
+        job_id="queued-job",
+        workflow_name=WORKFLOW_NAME,
+        status="queued",
+        prompt_id=prompt_id,
+        base_url=base_url,
+        content_hash=version.content_hash,
+    ))
+
+    manager = JobManager(jobs_db)
+    await manager.resume_jobs()
+    job = await wait_until_finished(manager, "queued-job")
+    assert job.status == "completed"
+    assert job.result.texts
+    assert fake_comfyui.stats["prompts"] == 1
+
+
+async def test_job_with_missing_snapshot_fails(loaded, jobs_db):
+    JobManager(jobs_db)._save(Job(job_id="lost-job", workflow_name=WORKFLOW_NAME, content_hash="0" * 64))
+    manager = JobManager(jobs_db)
+    await manager.resume_jobs()
+    job = await wait_until_finished(manager, "lost-job")
+    assert job.status == "error"
+
+
+async def test_cancel_removes_the_prompt_from_comfyui(fake_comfyui, loaded, jobs_db):
+    fake_comfyui.config.default_delay = 5
+    manager = JobManager(jobs_db)
+    job = manager.submit(WORKFLOW_NAME, {})
+    deadline = time.time() + 5
+    while manager.get_job(job.job_id).prompt_id is None and time.time() < deadline:
+        await asyncio.sleep(0.05)
+    prompt_id = manager.get_job(job.job_id).prompt_id
+    assert prompt_id
+
+    job = await manager.cancel(job.job_id)
+    assert job.status == "cancelled"
+    assert manager.get_job(job.job_id).status == "cancelled"
+    assert fake_comfyui.stats.get("interrupts", 0) + fake_comfyui.stats.get("deleted", 0) == 1
+    # 中断在节点执行的间隙生效
+    deadline = time.time() + 5
+    while time.time() < deadline:
+        queue = await default_client._get_executor().get_queue_status()
+        if prompt_id not in queue["pending"] + queue["running"]:
+            break
+        await asyncio.sleep(0.05)
+    else:
+        raise AssertionError(f"prompt {prompt_id} is still in the ComfyUI queue")
+
+
+async def test_deferred_call_runs_the_calling_version(fake_comfyui, loaded, jobs_db):
+    calling = workflow_manager.get_version(WORKFLOW_NAME)
+    loaded("v2")
+    manager = JobManager(jobs_db)
+    request = ScheduleRequest(workflow_name=WORKFLOW_NAME, tenant="user", content_hash=calling.content_hash)
+    job_id = await manager.defer(request, {})
+
+    job = await wait_until_finished(manager, job_id)
+    assert job.content_hash == calling.content_hash
+    assert submitted_prompt(fake_comfyui, job.prompt_id)["1"]["inputs"]["value"] == "v1"
+
+
+def test_old_database_gains_the_content_hash_column(jobs_db):
+    with sqlite3.connect(jobs_db) as conn:
+        conn.execute("""
+            CREATE TABLE jobs (
+                job_id TEXT PRIMARY KEY, workflow_name TEXT NOT NULL, params TEXT NOT NULL, status TEXT NOT NULL,
+                prompt_id TEXT, base_url TEXT, result TEXT, msg TEXT, created_at REAL NOT NULL, updated_at REAL NOT NULL
+            )
+        """)
+        conn.execute("INSERT INTO jobs VALUES ('old-job', 'wf', '{}', 'completed', NULL, NULL, NULL, NULL, 0, 0)")
+
+    manager = JobManager(jobs_db)
+    assert manager.get_job("old-job").content_hash is None
+    manager._save(Job(job_id="new-job", workflow_name="wf", status="completed", content_hash="abc"))
+    assert manager.get_job("new-job").content_hash == "abc"
@@ -0,0 +1,57 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+from comfyui import result_cache as result_cache_module
+from comfyui.models import ExecuteResult
+from comfyui.result_cache import ResultCache
+
+
+def completed(text: str) -> ExecuteResult:
+    return ExecuteResult(status="completed", prompt_id=text, duration=3.0, texts=[text])
+
+
+def test_hit_returns_a_copy_marked_as_cached():
+    cache = ResultCache(ttl=60, max_entries=10)
+    cache.put("a", completed("a"))
+
+    hit = cache.get("a")
+    assert hit.texts == ["a"]
+    assert hit.cached is True
+    assert hit.duration == 0.0
+
+    hit.texts.append("changed")
+    assert cache.get("a").texts == ["a"]
+
+
+def test_evicts_least_recently_used_entry():
+    cache = ResultCache(ttl=60, max_entries=2)
+    cache.put("a", completed("a"))
+    cache.put("b", completed("b"))
+    cache.get("a")
+    cache.put("c", completed("c"))
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+    assert cache.get("c") is not None
+
+
+def test_expired_entry_is_dropped(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(result_cache_module.time, "time", lambda: now[0])
+    cache = ResultCache(ttl=60, max_entries=10)
+    cache.put("a", completed("a"))
+
+    now[0] += 59
+    assert cache.get("a") is not None
+    now[0] += 2
+    assert cache.get("a") is None
+    assert len(cache) == 0
+
+
+def test_only_completed_results_are_cached():
+    cache = ResultCache(ttl=60, max_entries=10)
+    for status in ("error", "timeout", "rejected", "deferred"):
+        cache.put(status, ExecuteResult(status=status))
+        assert cache.get(status) is None
+    assert len(cache) == 0
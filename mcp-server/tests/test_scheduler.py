@@ -0,0 +1,105 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+import asyncio
+
+import pytest
+
+from comfyui import scheduler as scheduler_module
+from comfyui.scheduler import BackendScheduler, Scheduler, request_context
+
+BASE_URL = "http://comfyui"
+
+
+def capped_scheduler(max_concurrent: int = 1) -> Scheduler:
+    scheduler = Scheduler()
+    scheduler._backends[BASE_URL] = BackendScheduler(BASE_URL, max_concurrent=max_concurrent)
+    return scheduler
+
+
+async def run_in_slot(scheduler: Scheduler, order: list, label: str, workflow_name: str = "wf", tenant: str = "default", hold: float = 0.01):
+    with request_context(workflow_name, tenant=tenant, request_id=label):
+        async with scheduler.slot(BASE_URL):
+            order.append(label)
+            await asyncio.sleep(hold)
+
+
+async def start_all(*coroutines) -> list:
+    """按顺序启动，保证按启动顺序进入调度队列"""
+    tasks = []
+    for coroutine in coroutines:
+        tasks.append(asyncio.create_task(coroutine))
+        await asyncio.sleep(0)
+    return tasks
+
+
+async def test_tenants_share_the_backend_fairly():
+    scheduler = capped_scheduler()
+    order = []
+    tasks = await start_all(
+        run_in_slot(scheduler, order, "a1", tenant="a"),
+        run_in_slot(scheduler, order, "a2", tenant="a"),
+        run_in_slot(scheduler, order, "a3", tenant="a"),
+        run_in_slot(scheduler, order, "b1", tenant="b"),
+    )
+    await asyncio.gather(*tasks)
+    assert order == ["a1", "b1", "a2", "a3"]
+
+
+async def test_higher_priority_is_dispatched_first(monkeypatch):
+    monkeypatch.setattr(scheduler_module, "WORKFLOW_PRIORITIES", [("t2i_", "high"), ("t2v_", "low")])
+    scheduler = capped_scheduler()
+    order = []
+    tasks = await start_all(
+        run_in_slot(scheduler, order, "running", workflow_name="t2i_first"),
+        run_in_slot(scheduler, order, "low", workflow_name="t2v_video"),
+        run_in_slot(scheduler, order, "high", workflow_name="t2i_image"),
+    )
+    await asyncio.sleep(0)
+    assert scheduler.get_position("high") == 1
+    assert scheduler.get_position("low") == 2
+    await asyncio.gather(*tasks)
+    assert order == ["running", "high", "low"]
+
+
+async def test_slot_is_released_when_the_body_fails():
+    scheduler = capped_scheduler()
+
+    with pytest.raises(RuntimeError):
+        async with scheduler.slot(BASE_URL):
+            raise RuntimeError("submit failed")
+
+    assert scheduler.get_status()[BASE_URL]["running"] == 0
+    order = []
+    await run_in_slot(scheduler, order, "next")
+    assert order == ["next"]
+
+
+async def test_cancelled_waiter_leaves_the_queue():
+    scheduler = capped_scheduler()
+    order = []
+    holder, waiter = await start_all(
+        run_in_slot(scheduler, order, "holder", hold=0.2),
+        run_in_slot(scheduler, order, "waiter"),
+    )
+    await asyncio.sleep(0)
+    assert scheduler.get_status()[BASE_URL]["waiting"] == 1
+
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert scheduler.get_status()[BASE_URL]["waiting"] == 0
+    assert scheduler.get_position("waiter") is None
+
+    await holder
+    assert order == ["holder"]
+    assert scheduler.get_status()[BASE_URL]["running"] == 0
+
+
+async def test_uncapped_backend_never_queues():
+    scheduler = capped_scheduler(max_concurrent=0)
+    order = []
+    tasks = await start_all(*(run_in_slot(scheduler, order, str(i), hold=0.05) for i in range(5)))
+    await asyncio.sleep(0)
+    assert scheduler.get_status()[BASE_URL] == {"running": 5, "waiting": 0, "max_concurrent": 0}
+    await asyncio.gather(*tasks)
@@ -0,0 +1,121 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+import asyncio
+
+import pytest
+
+from comfyui.models import ExecuteResult
+from comfyui.single_flight import SingleFlight
+
+
+class Execution:
+    """可控的执行函数：入队后等待 release 再返回结果"""
+
+    def __init__(self):
+        self.calls = 0
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+        self.cancelled = False
+
+    async def __call__(self, on_queued, on_progress):
+        self.calls += 1
+        await on_queued("prompt-1", "http://comfyui")
+        await on_progress(50.0, "half way", None)
+        self.started.set()
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return ExecuteResult(status="completed", prompt_id="prompt-1", texts=["done"])
+
+
+async def test_identical_runs_share_one_execution():
+    flights = SingleFlight()
+    execution = Execution()
+    first = asyncio.create_task(flights.run("key", execution))
+    await execution.started.wait()
+    second = asyncio.create_task(flights.run("key", execution))
+    await asyncio.sleep(0)
+    assert len(flights) == 1
+
+    execution.release.set()
+    first_result, second_result = await asyncio.gather(first, second)
+
+    assert execution.calls == 1
+    assert first_result.texts == second_result.texts == ["done"]
+    assert first_result is not second_result
+    assert len(flights) == 0
+
+
+async def test_late_waiter_gets_queued_and_progress_replayed():
+    flights = SingleFlight()
+    execution = Execution()
+    first = asyncio.create_task(flights.run("key", execution))
+    await execution.started.wait()
+
+    events = []
+
+    async def on_queued(prompt_id, base_url):
+        events.append(("queued", prompt_id))
+
+    async def on_progress(percent, message, preview_url=None):
+        events.append(("progress", percent))
+
+    second = asyncio.create_task(flights.run("key", execution, on_queued, on_progress))
+    await asyncio.sleep(0)
+    assert events == [("queued", "prompt-1"), ("progress", 50.0)]
+
+    execution.release.set()
+    await asyncio.gather(first, second)
+
+
+async def test_failing_waiter_callback_does_not_affect_others():
+    flights = SingleFlight()
+    execution = Execution()
+    received = []
+
+    async def broken(*args):
+        raise RuntimeError("session closed")
+
+    async def working(prompt_id, base_url):
+        received.append(prompt_id)
+
+    first = asyncio.create_task(flights.run("key", execution, on_queued=broken))
+    second = asyncio.create_task(flights.run("key", execution, on_queued=working))
+    await execution.started.wait()
+    execution.release.set()
+    first_result, second_result = await asyncio.gather(first, second)
+
+    assert first_result.status == second_result.status == "completed"
+    assert received == ["prompt-1"]
+
+
+async def test_execution_continues_until_last_waiter_cancels():
+    flights = SingleFlight()
+    execution = Execution()
+    first = asyncio.create_task(flights.run("key", execution))
+    second = asyncio.create_task(flights.run("key", execution))
+    await execution.started.wait()
+
+    first.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    await asyncio.sleep(0)
+    assert not execution.cancelled
+    assert len(flights) == 1
+
+    second.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await second
+    await asyncio.sleep(0)
+    assert execution.cancelled
+    assert len(flights) == 0
+
+    # 全部取消后相同的提交重新发起执行
+    retry = Execution()
+    retry.release.set()
+    result = await flights.run("key", retry)
+    assert result.status == "completed"
+    assert retry.calls == 1
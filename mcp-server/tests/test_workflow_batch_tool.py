@@ -0,0 +1,60 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+import json
+
+from comfyui.facade import default_client
+from tools.workflow_batch_tool import batch_execute_workflow_tool
+
+WORKFLOW_NAME = "batch_test"
+
+
+async def run_batch(params_list, use_cache=True):
+    return await batch_execute_workflow_tool.fn(
+        workflow_name=WORKFLOW_NAME,
+        params_list=params_list,
+        concurrency=0,
+        use_cache=use_cache,
+        ctx=None,
+    )
+
+
+async def test_invalid_items_are_reported_before_submission(fake_comfyui, load_workflow):
+    load_workflow(WORKFLOW_NAME)
+    result = json.loads(await run_batch([{"prompt": "ok"}, {"count": "many"}, {"promt": "typo"}, {"use_cache": False}]))
+
+    assert result["success"] is False
+    assert [item["index"] for item in result["invalid_items"]] == [1, 2, 3]
+    assert "count:" in result["invalid_items"][0]["error"]
+    assert "promt" in result["invalid_items"][1]["error"]
+    assert fake_comfyui.stats.get("prompts", 0) == 0
+
+
+async def test_items_are_coerced_and_defaults_filled(fake_comfyui, load_workflow):
+    load_workflow(WORKFLOW_NAME)
+    result = await run_batch([{"prompt": "a", "count": "2"}, {}])
+
+    assert fake_comfyui.stats["prompts"] == 2
+    submitted = sorted(
+        (item["prompt"][2]["1"]["inputs"]["value"], item["prompt"][2]["2"]["inputs"]["value"])
+        for item in fake_comfyui.history.values()
+    )
+    assert submitted == [("a", 2), ("hello", 1)]
+    assert result.startswith("Batch finished: 2/2 succeeded")
+
+
+async def test_item_exception_becomes_an_error_result(fake_comfyui, load_workflow, monkeypatch):
+    load_workflow(WORKFLOW_NAME)
+    executor = default_client._get_executor()
+    execute_template = executor.execute_template
+
+    async def flaky(metadata, template, params, **kwargs):
+        if params["prompt"] == "boom":
+            raise RuntimeError("boom")
+        return await execute_template(metadata, template, params, **kwargs)
+
+    monkeypatch.setattr(executor, "execute_template", flaky)
+    result = await run_batch([{"prompt": "a"}, {"prompt": "boom"}, {"prompt": "c"}])
+
+    assert result.startswith("Batch finished: 2/3 succeeded")
+    assert fake_comfyui.stats["prompts"] == 2
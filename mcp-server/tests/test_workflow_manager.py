@@ -0,0 +1,176 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+import json
+import sqlite3
+import threading
+
+import pytest
+
+from manager import workflow_cache as workflow_cache_module
+from manager.workflow_cache import WorkflowParseCache
+from manager.workflow_manager import WorkflowManager
+from manager.workflow_registry import workflow_registry
+from manager.workflow_watcher import WorkflowWatcher
+from manager.workflow_versions import version_store
+
+
+@pytest.fixture
+def manager(tmp_path):
+    """工作流目录为临时目录的管理器，注册表与版本快照使用测试配置中的共享数据库"""
+    manager = WorkflowManager(str(tmp_path / "workflows"))
+    manager.workflows_dir.mkdir()
+    yield manager
+    for name in list(manager.loaded_workflows):
+        manager.unload_workflow(name)
+
+
+def test_sync_adds_updates_and_removes(manager, make_workflow, write_workflow):
+    write_workflow("sync_a", make_workflow("a"), manager.workflows_dir)
+    write_workflow("sync_b", make_workflow("b"), manager.workflows_dir)
+    results = manager.sync_workflows()
+    assert sorted(results["added"]) == ["sync_a", "sync_b"]
+    assert workflow_registry.get("sync_a")["version"] == 1
+
+    write_workflow("sync_a", make_workflow("a2"), manager.workflows_dir)
+    (manager.workflows_dir / "sync_b.json").unlink()
+    results = manager.sync_workflows()
+    assert results["updated"] == ["sync_a"]
+    assert results["removed"] == ["sync_b"]
+    assert set(manager.loaded_workflows) == {"sync_a"}
+    assert workflow_registry.get("sync_a")["version"] == 2
+    assert workflow_registry.get("sync_b") is None
+
+    results = manager.sync_workflows()
+    assert results["unchanged"] == ["sync_a"]
+
+
+async def test_watcher_parses_off_the_event_loop(manager, make_workflow, write_workflow, monkeypatch):
+    import core
+    threads = {}
+    parse = manager.parse_workflow_metadata
+    add_tool = core.mcp.add_tool
+
+    def record_parse(*args, **kwargs):
+        threads["parse"] = threading.current_thread()
+        return parse(*args, **kwargs)
+
+    def record_add_tool(tool):
+        threads["add_tool"] = threading.current_thread()
+        return add_tool(tool)
+
+    monkeypatch.setattr(manager, "parse_workflow_metadata", record_parse)
+    monkeypatch.setattr(core.mcp, "add_tool", record_add_tool)
+    write_workflow("watch_a", make_workflow("a"), manager.workflows_dir)
+
+    results = await WorkflowWatcher(manager).sync()
+    assert results["added"] == ["watch_a"]
+    assert threads["parse"] is not threading.main_thread()
+    assert threads["add_tool"] is threading.main_thread()
+
+
+def test_broken_update_keeps_the_loaded_version(manager, make_workflow, write_workflow):
+    write_workflow("sync_broken", make_workflow("ok"), manager.workflows_dir)
+    manager.sync_workflows()
+    version = manager.get_version("sync_broken")
+
+    (manager.workflows_dir / "sync_broken.json").write_text("{not json", encoding="utf-8")
+    results = manager.sync_workflows()
+    assert [failure["file"] for failure in results["failed"]] == ["sync_broken.json"]
+    assert manager.get_version("sync_broken") is version
+
+
+def test_update_replaces_the_tool_but_not_running_versions(manager, make_workflow, write_workflow):
+    path = write_workflow("pin_test", make_workflow("v1"), manager.workflows_dir)
+    manager.load_workflow(path)
+    pinned = manager.get_version("pin_test")
+    tool = manager.loaded_workflows["pin_test"]["tool"]
+
+    write_workflow("pin_test", make_workflow("v2"), manager.workflows_dir)
+    manager.load_workflow(path)
+    current = manager.get_version("pin_test")
+
+    assert current is not pinned
+    assert current.version == pinned.version + 1
+    assert tool.version is pinned
+    assert json.loads(pinned.content)["1"]["inputs"]["value"] == "v1"
+    assert pinned.template.workflow_data["1"]["inputs"]["value"] == "v1"
+    # 执行中的旧版本的快照不会被清理
+    assert pinned.content_hash not in manager.collect_versions()
+    assert version_store.read(pinned.content_hash) == pinned.content
+
+
+def test_load_version_restores_a_snapshot(manager, make_workflow, write_workflow):
+    path = write_workflow("snapshot_test", make_workflow("v1"), manager.workflows_dir)
+    manager.load_workflow(path)
+    old_hash = manager.get_version("snapshot_test").content_hash
+    write_workflow("snapshot_test", make_workflow("v2"), manager.workflows_dir)
+    manager.load_workflow(path)
+
+    current = manager.get_version("snapshot_test")
+    assert manager.load_version("snapshot_test", current.content_hash) is current
+    restored = manager.load_version("snapshot_test", old_hash)
+    assert restored.content_hash == old_hash
+    assert restored.metadata.params["prompt"].default == "v1"
+    assert manager.load_version("snapshot_test", "0" * 64) is None
+
+
+def test_rollback_registers_the_old_content_as_a_new_version(manager, make_workflow, write_workflow):
+    path = write_workflow("rollback_test", make_workflow("v1"), manager.workflows_dir)
+    manager.load_workflow(path)
+    first = manager.get_version("rollback_test")
+    write_workflow("rollback_test", make_workflow("v2"), manager.workflows_dir)
+    manager.load_workflow(path)
+
+    result = manager.rollback_workflow("rollback_test")
+    assert result["success"], result
+    assert result["restored_version"] == first.version
+    current = manager.get_version("rollback_test")
+    assert current.content_hash == first.content_hash
+    assert current.version == first.version + 2
+    assert path.read_bytes() == first.content
+    assert [entry["version"] for entry in workflow_registry.get_versions("rollback_test")] == [3, 2, 1]
+
+    result = manager.rollback_workflow("rollback_test", version=99)
+    assert not result["success"]
+
+
+def test_reference_sources_keep_snapshots(manager, make_workflow, write_workflow):
+    path = write_workflow("reference_test", make_workflow("v1"), manager.workflows_dir)
+    manager.load_workflow(path)
+    old_hash = manager.get_version("reference_test").content_hash
+
+    # 卸载后注册表中已没有该版本，仍被引用时保留快照
+    version_store.add_reference_source(lambda: [old_hash])
+    try:
+        manager.unload_workflow("reference_test")
+        assert version_store.read(old_hash) is not None
+    finally:
+        version_store._reference_sources.pop()
+    manager.collect_versions()
+    assert version_store.read(old_hash) is None
+
+
+def test_parse_cache_is_keyed_on_node_settings(tmp_path, monkeypatch, make_workflow):
+    from comfyui.workflow_parser import WorkflowParser
+    db_path = str(tmp_path / "cache.db")
+    metadata = WorkflowParser().parse_workflow(make_workflow(), "cache_test")
+    cache = WorkflowParseCache(db_path)
+    cache.put("hash", metadata)
+    assert cache.get("hash", "cache_test") == metadata
+
+    monkeypatch.setattr(workflow_cache_module, "WORKFLOW_PRUNE_UNUSED_NODES", False)
+    assert WorkflowParseCache(db_path).get("hash", "cache_test") is None
+    monkeypatch.undo()
+
+    monkeypatch.setattr(workflow_cache_module, "PREVIEW_NODE_TYPES", {"PreviewImage", "MyPreview"})
+    assert WorkflowParseCache(db_path).get("hash", "cache_test") is None
+
+
+def test_parse_cache_migrates_old_databases(tmp_path):
+    db_path = str(tmp_path / "old.db")
+    with sqlite3.connect(db_path) as conn:
+        conn.execute("CREATE TABLE parse_cache (content_hash TEXT PRIMARY KEY, version INTEGER NOT NULL, metadata TEXT NOT NULL, created_at REAL NOT NULL)")
+        conn.execute("INSERT INTO parse_cache VALUES ('hash', ?, '{}', 0)", (workflow_cache_module.PARSE_CACHE_VERSION,))
+    cache = WorkflowParseCache(db_path)
+    assert cache.get("hash", "old") is None
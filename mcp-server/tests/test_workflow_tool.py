@@ -0,0 +1,89 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+import hashlib
+import json
+
+import pytest
+from fastmcp.exceptions import ToolError
+
+from comfyui import base_executor
+from comfyui.result_cache import result_cache
+from comfyui.workflow_parser import WorkflowParser
+from manager.workflow_tool import WorkflowTool
+from manager.workflow_versions import WorkflowVersion
+
+
+@pytest.fixture
+def tool(make_workflow):
+    content = json.dumps(make_workflow()).encode("utf-8")
+    metadata = WorkflowParser().parse_workflow(json.loads(content), "tool_test")
+    return WorkflowTool.from_version(WorkflowVersion(hashlib.sha256(content).hexdigest(), content, metadata))
+
+
+def test_schema_is_built_from_metadata(tool):
+    assert tool.name == "tool_test"
+    assert tool.description == "Echo the prompt"
+    assert tool.parameters == {
+        "properties": {
+            "prompt": {"default": "hello", "description": "The prompt", "title": "Prompt", "type": "string"},
+            "count": {"default": 1, "description": "How many", "title": "Count", "type": "integer"},
+            "use_cache": {
+                "default": True,
+                "description": tool.parameters["properties"]["use_cache"]["description"],
+                "title": "Use Cache",
+                "type": "boolean",
+            },
+        },
+        "type": "object",
+    }
+
+
+def test_required_params_come_first():
+    workflow = {
+        "1": {"inputs": {"value": 1}, "class_type": "PrimitiveInt", "_meta": {"title": "$count.value:How many"}},
+        "2": {"inputs": {"image": ""}, "class_type": "LoadImage", "_meta": {"title": "$image.image!:The image"}},
+    }
+    content = json.dumps(workflow).encode("utf-8")
+    metadata = WorkflowParser().parse_workflow(workflow, "required_test")
+    tool = WorkflowTool.from_version(WorkflowVersion("hash", content, metadata))
+    assert list(tool.parameters["properties"]) == ["image", "count", "use_cache"]
+    assert tool.parameters["required"] == ["image"]
+
+
+def test_arguments_are_validated_and_defaults_filled(tool):
+    assert tool.bind_arguments({}) == ({"prompt": "hello", "count": 1}, True)
+    assert tool.bind_arguments({"count": "3", "use_cache": False}) == ({"prompt": "hello", "count": 3}, False)
+
+
+def test_invalid_arguments_are_reported_together(tool):
+    with pytest.raises(ToolError) as error:
+        tool.bind_arguments({"count": "many", "colour": "red"})
+    message = str(error.value)
+    assert "unexpected arguments ['colour']" in message
+    assert "count:" in message
+
+
+async def test_run_executes_the_bound_version(tool, fake_comfyui, monkeypatch):
+    # 结果缓存默认关闭，这里开启以验证 use_cache
+    monkeypatch.setattr(base_executor, "RESULT_CACHE_ENABLED", True)
+    content = await tool.run({"prompt": "a cat"})
+    assert content[0].type == "text"
+    assert content[0].text.startswith("Generated successfully")
+    assert fake_comfyui.stats["prompts"] == 1
+    submitted = next(iter(fake_comfyui.history.values()))["prompt"][2]
+    assert submitted["1"]["inputs"]["value"] == "a cat"
+
+    # 相同的调用命中结果缓存，不再提交
+    await tool.run({"prompt": "a cat"})
+    assert fake_comfyui.stats["prompts"] == 1
+    assert len(result_cache) == 1
+    await tool.run({"prompt": "a cat", "use_cache": False})
+    assert fake_comfyui.stats["prompts"] == 2
+
+
+async def test_results_are_not_cached_by_default(tool, fake_comfyui):
+    await tool.run({"prompt": "a cat"})
+    await tool.run({"prompt": "a cat"})
+    assert fake_comfyui.stats["prompts"] == 2
+    assert len(result_cache) == 0
@@ -0,0 +1,164 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+import json
+import time
+import asyncio
+from typing import Any, Dict
+from pydantic import Field
+from fastmcp import Context
+from fastmcp.exceptions import ToolError
+from core import mcp, logger
+from manager.workflow_manager import workflow_manager
+from manager.job_manager import job_manager, Job
+from comfyui.scheduler import get_tenant
+from comfyui.admission import AdmissionRejected
+
+# get_job_status 单次最长等待时间（秒）
+MAX_WAIT_SECONDS = 600
+
+
+def error(msg: str):
+    return json.dumps({"success": False, "error": msg})
+
+
+async def _job_status(job: Job) -> Dict[str, Any]:
+    status = job.status
+    queue_position = await job_manager.get_queue_position(job)
+    if status == "queued" and not queue_position:
+        # 已离开ComfyUI等待队列：正在执行或正在转存结果
+        status = "running"
+    schedule_position = job_manager.get_schedule_position(job)
+    data = {
+        "job_id": job.job_id,
+        "workflow_name": job.workflow_name,
+        "status": status,
+        "prompt_id": job.prompt_id,
+        "elapsed": round((job.updated_at if job.is_finished else time.time()) - job.created_at, 1),
+    }
+    if queue_position:
+        data["queue_position"] = queue_position
+    elif schedule_position:
+        # 尚未提交到ComfyUI，在服务端调度队列中等待
+        data["queue_position"] = schedule_position
+        data["queue"] = "scheduler"
+    progress = job_manager.get_progress(job.job_id)
+    if progress and status == "running":
+        data["progress"] = round(progress[0], 1)
+        data["progress_message"] = progress[1]
+    if job.msg:
+        data["msg"] = job.msg
+    return data
+
+
+def _describe(status: Dict[str, Any]) -> str:
+    if status.get("queue_position"):
+        return f"{status['status']}, queue position {status['queue_position']}"
+    if "progress" in status:
+        return f"{status['status']} {status['progress']}%, {status['progress_message']}"
+    return status["status"]
+
+
+@mcp.tool(name="submit_job")
+async def submit_job(
+    workflow_name: str = Field(description="The name of the workflow tool to run, see list_workflows_tool"),
+    params: Dict[str, Any] = Field(default_factory=dict, description="Parameters of the workflow tool, using the same parameter names"),
+    ctx: Context = None,
+):
+    """
+    Submit a workflow for background execution and return a job_id immediately.
+
+    Use this for long-running workflows such as video generation, then check progress with
+    get_job_status and fetch the output with get_job_result.
+    """
+    entry = workflow_manager.loaded_workflows.get(workflow_name)
+    if entry is None:
+        return error(f"Workflow '{workflow_name}' not found or not loaded")
+    # 按工具的参数规则校验并补全默认值，任务保存校验后的参数，并在校验所用的版本上执行
+    tool = entry["tool"]
+    if "use_cache" in (params or {}):
+        return error("use_cache is not supported for background jobs")
+    try:
+        params, _ = tool.bind_arguments(params or {})
+    except ToolError as e:
+        return error(str(e))
+
+    tenant = get_tenant(ctx)
+    try:
+        eta = await job_manager.admit(workflow_name, tenant)
+    except AdmissionRejected as e:
+        return json.dumps({"success": False, "error": str(e), "eta_seconds": round(e.eta)})
+
+    try:
+        job = job_manager.submit(workflow_name, params, tenant=tenant, version=tool.version)
+        data = {"success": True, "job_id": job.job_id, "status": job.status}
+        if eta is not None:
+            data["eta_seconds"] = round(eta)
+        return json.dumps(data)
+    except Exception as e:
+        logger.error(f"Failed to submit job for {workflow_name}: {e}", exc_info=True)
+        return error(f"Failed to submit job: {str(e)}")
+
+
+@mcp.tool(name="get_job_status")
+async def get_job_status(
+    job_id: str = Field(description="The job_id returned by submit_job"),
+    wait_seconds: int = Field(default=0, description="Wait up to this many seconds for the job to finish, sending progress notifications meanwhile. 0 returns immediately"),
+    ctx: Context = None,
+):
+    """
+    Get the status of a background job: pending, queued, running, completed, error, timeout or cancelled.
+    """
+    job = job_manager.get_job(job_id)
+    if job is None:
+        return error(f"Job '{job_id}' not found")
+
+    deadline = time.time() + min(max(wait_seconds, 0), MAX_WAIT_SECONDS)
+    status = await _job_status(job)
+    last_message = None
+    while not job.is_finished and time.time() < deadline:
+        message = _describe(status)
+        if ctx is not None and message != last_message:
+            await ctx.report_progress(status["elapsed"], None, message)
+            last_message = message
+        await asyncio.sleep(1.0)
+        job = job_manager.get_job(job_id)
+        status = await _job_status(job)
+
+    return json.dumps(status, ensure_ascii=False)
+
+
+@mcp.tool(name="get_job_result")
+async def get_job_result(
+    job_id: str = Field(description="The job_id returned by submit_job"),
+):
+    """
+    Get the output of a finished background job.
+    """
+    job = job_manager.get_job(job_id)
+    if job is None:
+        return error(f"Job '{job_id}' not found")
+
+    if not job.is_finished:
+        status = await _job_status(job)
+        return f"Job is not finished yet, status: {_describe(status)}"
+    if job.result is not None:
+        return job.result.to_llm_result()
+    return f"Job {job.status}: {job.msg or ''}"
+
+
+@mcp.tool(name="cancel_job")
+async def cancel_job(
+    job_id: str = Field(description="The job_id returned by submit_job"),
+):
+    """
+    Cancel a background job, removing it from the ComfyUI queue or interrupting it if already running.
+    """
+    job = job_manager.get_job(job_id)
+    if job is None:
+        return error(f"Job '{job_id}' not found")
+    if job.is_finished:
+        return json.dumps({"success": False, "job_id": job_id, "status": job.status, "error": "Job already finished"})
+
+    job = await job_manager.cancel(job_id)
+    return json.dumps({"success": True, "job_id": job_id, "status": job.status})
@@ -0,0 +1,81 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+import json
+import os
+from typing import Any, Dict, List
+from pydantic import Field
+from fastmcp import Context
+from fastmcp.exceptions import ToolError
+from core import mcp, logger
+from manager.workflow_manager import workflow_manager, USE_CACHE_DESCRIPTION
+from comfyui.facade import execute_template_batch
+from comfyui.models import ExecuteResult
+
+# 单次批量执行允许的最大参数组数
+MAX_BATCH_SIZE = int(os.getenv("COMFYUI_MAX_BATCH_SIZE", "500"))
+
+
+@mcp.tool(name="batch_execute_workflow_tool")
+async def batch_execute_workflow_tool(
+    workflow_name: str = Field(description="The name of the workflow tool to run, see list_workflows_tool"),
+    params_list: List[Dict[str, Any]] = Field(description="One parameter object per execution, using the same parameter names as the workflow tool"),
+    concurrency: int = Field(default=0, description="Maximum number of executions submitted to ComfyUI at the same time, 0 uses the server default"),
+    use_cache: bool = Field(default=True, description=USE_CACHE_DESCRIPTION),
+    ctx: Context = None,
+):
+    """
+    Run the same workflow many times with different parameters, e.g. prompt or seed variants.
+
+    Items are executed concurrently; each result is streamed back as a progress notification as soon
+    as it finishes, and the combined results are returned in the same order as params_list.
+    """
+    def error(msg: str):
+        return json.dumps({"success": False, "error": msg})
+
+    # 整个批量执行使用调用开始时的工具及其工作流版本
+    entry = workflow_manager.loaded_workflows.get(workflow_name)
+    if entry is None:
+        return error(f"Workflow '{workflow_name}' not found or not loaded")
+    tool = entry["tool"]
+    version = tool.version
+    if not params_list:
+        return error("params_list must contain at least one parameter object")
+    if len(params_list) > MAX_BATCH_SIZE:
+        return error(f"Too many items in params_list: {len(params_list)} > {MAX_BATCH_SIZE}")
+
+    # 提交前按工具的参数规则校验所有参数组，任何一组无效时都不提交
+    validated = []
+    invalid = []
+    for index, params in enumerate(params_list):
+        if "use_cache" in (params or {}):
+            invalid.append({"index": index, "error": "use_cache applies to the whole batch, set it next to params_list"})
+            continue
+        try:
+            validated.append(tool.bind_arguments(params or {})[0])
+        except ToolError as e:
+            invalid.append({"index": index, "error": str(e)})
+    if invalid:
+        return json.dumps({"success": False, "error": "Invalid items in params_list, nothing was executed", "invalid_items": invalid}, ensure_ascii=False)
+
+    total = len(params_list)
+
+    async def on_result(index: int, result: ExecuteResult, completed: int):
+        if ctx is not None:
+            await ctx.report_progress(completed, total, f"[{index}] {result.to_llm_result()}")
+
+    try:
+        batch_result = await execute_template_batch(
+            version.metadata,
+            version.template,
+            validated,
+            concurrency=concurrency or None,
+            ctx=ctx,
+            on_result=on_result,
+            use_cache=use_cache,
+            content_hash=version.content_hash,
+        )
+        return batch_result.to_llm_result()
+    except Exception as e:
+        logger.error(f"Batch execution failed for {workflow_name}: {e}", exc_info=True)
+        return "Batch execution exception: " + str(e)
@@ -5,17 +5,22 @@ import json
 import keyword
 import re
 import os
+from fastmcp import Context
 from pydantic import Field
 from core import mcp, logger
+from comfyui.scheduler import get_tenant
 from manager.workflow_manager import workflow_manager, CUSTOM_WORKFLOW_DIR
+from manager.workflow_registry import workflow_registry
 from utils.file_util import download_files
 from utils.file_uploader import upload
+from utils.session_util import notify_tool_list_changed
 
 
 @mcp.tool(name="save_workflow_tool")
 async def save_workflow_tool(
     workflow_url: str = Field(description="The workflow to save, must be a URL"),
     uploaded_filename: str = Field(description="Use the name of the uploaded file or a name specified by the user. Must be in English and without a file extension."),
+    ctx: Context = None,
 ):
     """
     Add or update a workflow to MCP tools.
@@ -38,7 +43,10 @@ async def save_workflow_tool(
             )
 
         with download_files(workflow_url) as temp_workflow_path:
-            return workflow_manager.load_workflow(temp_workflow_path, tool_name=uploaded_filename)
+            result = workflow_manager.load_workflow(temp_workflow_path, tool_name=uploaded_filename, owner=get_tenant(ctx))
+        if result["success"]:
+            await notify_tool_list_changed()
+        return result
             
     except Exception as e:
         logger.error(f"Failed to save workflow: {e}")
@@ -49,7 +57,9 @@ async def reload_workflows_tool():
     """
     Reload all MCP tools that were generated by workflows.
     """
-    return workflow_manager.reload_all_workflows()
+    result = workflow_manager.reload_all_workflows()
+    await notify_tool_list_changed()
+    return result
         
 @mcp.tool(name="list_workflows_tool")
 async def list_workflows_tool():
@@ -61,9 +71,7 @@ async def list_workflows_tool():
     - List all MCP tools
     - How many tools are there
     """
-    workflow_names = list(workflow_manager.loaded_workflows.keys())
-    workflow_names.sort()
-    return workflow_names
+    return workflow_registry.list_names()
 
 @mcp.tool(name="get_workflow_tool_detail")
 async def get_workflow_tool_detail(
@@ -81,12 +89,10 @@ async def get_workflow_tool_detail(
         return json.dumps({"success": False, "error": msg})
     
     try:
-        # Check if workflow exists
-        if workflow_name not in workflow_manager.loaded_workflows:
-            return error(f"Workflow '{workflow_name}' not found or not loaded")
-        
         # Get workflow info
-        workflow_info = workflow_manager.loaded_workflows[workflow_name]
+        workflow_info = workflow_registry.get(workflow_name)
+        if workflow_info is None:
+            return error(f"Workflow '{workflow_name}' not found or not loaded")
         
         # Get workflow file path
         workflow_file_path = os.path.join(CUSTOM_WORKFLOW_DIR, f"{workflow_name}.json")
@@ -108,7 +114,10 @@ async def get_workflow_tool_detail(
             "workflow_name": workflow_name,
             "workflow_file_url": workflow_file_url,
             "metadata": workflow_info["metadata"],
-            "loaded_at": workflow_info["loaded_at"].strftime("%Y-%m-%d %H:%M:%S") if hasattr(workflow_info["loaded_at"], 'strftime') else str(workflow_info["loaded_at"]),
+            "version": workflow_info["version"],
+            "versions": workflow_registry.get_versions(workflow_name),
+            "owner": workflow_info["owner"],
+            "loaded_at": workflow_info["loaded_at"],
         }
         
         logger.info(f"Successfully retrieved workflow details for: {workflow_name}")
@@ -125,4 +134,20 @@ async def remove_workflow_tool(
     """
     Remove an MCP tool that was generated by a workflow.
     """
-    return workflow_manager.unload_workflow(workflow_name)
+    result = workflow_manager.unload_workflow(workflow_name)
+    if result["success"]:
+        await notify_tool_list_changed()
+    return result
+
+@mcp.tool(name="rollback_workflow_tool")
+async def rollback_workflow_tool(
+    workflow_name: str = Field(description="The name of the workflow to roll back"),
+    version: int = Field(default=0, description="The version to restore, as listed by get_workflow_tool_detail. 0 restores the previous version"),
+):
+    """
+    Restore an MCP tool generated by a workflow to an earlier version of the workflow.
+    """
+    result = workflow_manager.rollback_workflow(workflow_name, version)
+    if result["success"]:
+        await notify_tool_list_changed()
+    return result
@@ -3,6 +3,7 @@
 
 import requests
 import tempfile
+import time
 import os
 import mimetypes
 from contextlib import contextmanager
@@ -163,4 +164,27 @@ def cleanup_temp_files(file_paths: Union[str, List[str]]) -> None:
                 os.unlink(file_path)
                 logger.debug(f"已清理临时文件: {file_path}")
             except Exception as e:
-                logger.warning(f"清理临时文件失败 {file_path}: {str(e)}") 
\ No newline at end of file
+                logger.warning(f"清理临时文件失败 {file_path}: {str(e)}") 
+
+def cleanup_stale_temp_files(max_age: float = 3600) -> int:
+    """
+    清理临时目录中的过期文件，如执行被取消或服务异常退出时遗留的下载文件
+    
+    Args:
+        max_age: 文件最后修改后保留的秒数
+        
+    Returns:
+        清理的文件数量
+    """
+    now = time.time()
+    stale_files = []
+    for entry in os.scandir(TEMP_DIR):
+        try:
+            if entry.is_file() and now - entry.stat().st_mtime > max_age:
+                stale_files.append(entry.path)
+        except OSError:
+            continue
+    cleanup_temp_files(stale_files)
+    if stale_files:
+        logger.info(f"已清理过期临时文件: {len(stale_files)} 个")
+    return len(stale_files)
@@ -0,0 +1,54 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+"""
+存活与就绪检查
+
+/health/live 只要进程能处理请求就返回 200；/health/ready 在所有就绪检查通过后才返回 200，
+启动期间工作流仍在后台注册时返回 503，内置工具此时已可调用。
+"""
+
+from typing import Any, Callable, Dict, List, Tuple
+
+from core import logger
+
+# 就绪检查返回 (是否就绪, 详细信息)
+ReadinessCheck = Callable[[], Tuple[bool, Dict[str, Any]]]
+
+_readiness_checks: List[Tuple[str, ReadinessCheck]] = []
+
+
+def add_readiness_check(name: str, check: ReadinessCheck) -> None:
+    _readiness_checks.append((name, check))
+
+
+def get_readiness() -> Tuple[bool, Dict[str, Any]]:
+    ready = True
+    checks = {}
+    for name, check in _readiness_checks:
+        try:
+            check_ready, detail = check()
+        except Exception as e:
+            logger.warning(f"就绪检查失败 {name}: {e}")
+            check_ready, detail = False, {"error": str(e)}
+        ready = ready and check_ready
+        checks[name] = {"ready": check_ready, **detail}
+    return ready, checks
+
+
+def setup_health(mcp) -> None:
+    """注册 /health/live 与 /health/ready 路由"""
+    from starlette.requests import Request
+    from starlette.responses import JSONResponse
+
+    @mcp.custom_route("/health/live", methods=["GET"], include_in_schema=False)
+    async def live(request: Request) -> JSONResponse:
+        return JSONResponse({"status": "alive"})
+
+    @mcp.custom_route("/health/ready", methods=["GET"], include_in_schema=False)
+    async def ready(request: Request) -> JSONResponse:
+        is_ready, checks = get_readiness()
+        return JSONResponse(
+            {"status": "ready" if is_ready else "starting", "checks": checks},
+            status_code=200 if is_ready else 503,
+        )
@@ -0,0 +1,36 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+"""
+JSON 编解码
+安装 orjson 时使用 orjson (uv sync --extra fast-json)，否则退化为标准库 json；
+两种实现都输出紧凑格式、不转义非ASCII字符
+"""
+
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_BACKEND = "orjson" if orjson is not None else "json"
+
+
+def dumps(obj: Any) -> str:
+    """序列化为紧凑的JSON字符串"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+        except TypeError:
+            # orjson 不支持的类型（如超过64位的整数），交给标准库处理
+            pass
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """解析JSON字符串或字节"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
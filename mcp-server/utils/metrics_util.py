@@ -0,0 +1,120 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+"""
+Prometheus 指标
+未开启或未安装 prometheus_client 时所有指标退化为空操作，/metrics 返回 404
+"""
+
+import os
+import time
+from typing import Any, Awaitable, Callable, List
+
+from core import logger
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+try:
+    import prometheus_client
+except ImportError:
+    prometheus_client = None
+    if METRICS_ENABLED:
+        logger.info("未安装 prometheus_client，/metrics 不可用 (uv sync --extra metrics)")
+
+
+class _NoopMetric:
+    """未开启指标时使用的空指标"""
+
+    def labels(self, *args, **kwargs) -> "_NoopMetric":
+        return self
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+    def dec(self, amount: float = 1) -> None:
+        pass
+
+    def set(self, value: float) -> None:
+        pass
+
+    def observe(self, amount: float) -> None:
+        pass
+
+
+def is_enabled() -> bool:
+    return METRICS_ENABLED and prometheus_client is not None
+
+
+def _metric(kind: str, name: str, documentation: str, labelnames: List[str], **kwargs) -> Any:
+    if not is_enabled():
+        return _NoopMetric()
+    return getattr(prometheus_client, kind)(name, documentation, labelnames, **kwargs)
+
+
+# 延迟分桶覆盖从毫秒级工具调用到小时级视频生成
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+
+TOOL_CALLS = _metric("Counter", "pixelle_tool_calls_total", "MCP tool calls", ["tool", "status"])
+TOOL_CALL_DURATION = _metric("Histogram", "pixelle_tool_call_duration_seconds", "MCP tool call latency", ["tool"], buckets=LATENCY_BUCKETS)
+WORKFLOW_IN_FLIGHT = _metric("Gauge", "pixelle_workflow_executions_in_flight", "Workflow executions in progress", ["workflow"])
+WORKFLOW_DURATION = _metric("Histogram", "pixelle_workflow_execution_duration_seconds", "Workflow execution latency", ["workflow", "status"], buckets=LATENCY_BUCKETS)
+WORKFLOW_PHASE_DURATION = _metric("Histogram", "pixelle_workflow_phase_duration_seconds", "Workflow execution latency by phase", ["phase"], buckets=LATENCY_BUCKETS)
+COMFYUI_QUEUE_DEPTH = _metric("Gauge", "pixelle_comfyui_queue_depth", "ComfyUI queue depth", ["backend", "state"])
+TRANSFER_BYTES = _metric("Counter", "pixelle_transfer_bytes_total", "Bytes transferred between ComfyUI and mcp-base", ["direction"])
+CACHE_REQUESTS = _metric("Counter", "pixelle_cache_requests_total", "Cache lookups", ["cache", "result"])
+SCHEDULER_WAITING = _metric("Gauge", "pixelle_scheduler_waiting", "Executions waiting in the scheduler", ["backend", "priority"])
+SCHEDULER_RUNNING = _metric("Gauge", "pixelle_scheduler_running", "Executions dispatched to ComfyUI by the scheduler", ["backend"])
+
+
+def observe_phase(phase: str, start_time: float, end_time: float = None) -> None:
+    """记录一个执行阶段的耗时（秒级时间戳）"""
+    if start_time is None:
+        return
+    end_time = time.time() if end_time is None else end_time
+    WORKFLOW_PHASE_DURATION.labels(phase=phase).observe(max(end_time - start_time, 0))
+
+
+def record_cache(cache: str, hit: bool) -> None:
+    CACHE_REQUESTS.labels(cache=cache, result="hit" if hit else "miss").inc()
+
+
+# 抓取 /metrics 前执行的刷新钩子，用于按需拉取队列深度等外部状态
+_collect_hooks: List[Callable[[], Awaitable[None]]] = []
+
+
+def add_collect_hook(hook: Callable[[], Awaitable[None]]) -> None:
+    _collect_hooks.append(hook)
+
+
+def setup_metrics(mcp) -> None:
+    """注册工具调用统计中间件与 /metrics 路由"""
+    if not is_enabled():
+        return
+
+    from fastmcp.server.middleware import Middleware
+    from starlette.requests import Request
+    from starlette.responses import Response
+
+    class ToolMetricsMiddleware(Middleware):
+        async def on_call_tool(self, context, call_next):
+            tool_name = getattr(context.message, "name", "unknown")
+            start_time = time.perf_counter()
+            status = "error"
+            try:
+                result = await call_next(context)
+                status = "success"
+                return result
+            finally:
+                TOOL_CALLS.labels(tool=tool_name, status=status).inc()
+                TOOL_CALL_DURATION.labels(tool=tool_name).observe(time.perf_counter() - start_time)
+
+    mcp.add_middleware(ToolMetricsMiddleware())
+
+    @mcp.custom_route("/metrics", methods=["GET"], include_in_schema=False)
+    async def metrics(request: Request) -> Response:
+        for hook in _collect_hooks:
+            try:
+                await hook()
+            except Exception as e:
+                logger.debug(f"刷新指标失败: {e}")
+        return Response(prometheus_client.generate_latest(), media_type=prometheus_client.CONTENT_TYPE_LATEST)
@@ -0,0 +1,60 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+"""
+MCP 会话跟踪与工具列表变更通知
+
+fastmcp 只在请求上下文中提供会话，工作流热更新发生在请求之外，
+因此在客户端列出或调用工具时记录其会话，工具变化后向所有存活的会话广播 notifications/tools/list_changed。
+"""
+
+import weakref
+
+from core import logger
+
+_sessions: "weakref.WeakSet" = weakref.WeakSet()
+
+
+def setup_session_tracking(mcp) -> None:
+    """注册会话跟踪中间件，并在初始化时声明 tools.listChanged 能力"""
+    from fastmcp.server.middleware import Middleware
+    from mcp.server.lowlevel import NotificationOptions
+
+    class SessionTrackingMiddleware(Middleware):
+        async def on_request(self, context, call_next):
+            ctx = context.fastmcp_context
+            if ctx is not None:
+                try:
+                    _sessions.add(ctx.session)
+                except (ValueError, AttributeError):
+                    # 不在请求上下文中
+                    pass
+            return await call_next(context)
+
+    mcp.add_middleware(SessionTrackingMiddleware())
+
+    # SSE 传输创建初始化参数时未开启 tools_changed，客户端据此决定是否处理变更通知
+    server = mcp._mcp_server
+    create_initialization_options = server.create_initialization_options
+
+    def create_initialization_options_with_tools_changed(notification_options=None, experimental_capabilities=None):
+        if notification_options is None:
+            notification_options = NotificationOptions(tools_changed=True)
+        return create_initialization_options(notification_options, experimental_capabilities)
+
+    server.create_initialization_options = create_initialization_options_with_tools_changed
+
+
+async def notify_tool_list_changed() -> int:
+    """向所有已知会话发送工具列表变更通知，返回成功通知的会话数，已断开的会话会被移除"""
+    notified = 0
+    for session in list(_sessions):
+        try:
+            await session.send_tool_list_changed()
+            notified += 1
+        except Exception as e:
+            logger.debug(f"发送工具列表变更通知失败，移除会话: {e}")
+            _sessions.discard(session)
+    if notified:
+        logger.info(f"已通知 {notified} 个会话工具列表变更")
+    return notified
@@ -0,0 +1,136 @@
+# Copyright (C) 2025 AIDC-AI
+# This project is licensed under the MIT License (SPDX-License-identifier: MIT).
+
+"""
+OpenTelemetry 链路追踪工具
+未开启或未安装 opentelemetry 时所有接口退化为空操作
+"""
+
+import os
+from contextlib import contextmanager
+from typing import Any, Dict, Generator, Optional
+
+from core import logger
+from utils.os_util import get_data_path
+
+OTEL_ENABLED = os.getenv("OTEL_ENABLED", "false").lower() == "true"
+OTEL_SERVICE_NAME = os.getenv("OTEL_SERVICE_NAME", "pixelle-mcp-server")
+# 导出方式: otlp / console / file
+OTEL_EXPORTER = os.getenv("OTEL_EXPORTER", "otlp").lower()
+OTEL_EXPORTER_OTLP_ENDPOINT = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT", "http://localhost:4318")
+OTEL_EXPORTER_FILE = os.getenv("OTEL_EXPORTER_FILE") or get_data_path("traces.jsonl")
+
+
+class _NoopSpan:
+    """未开启追踪时使用的空 span"""
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        pass
+
+    def add_event(self, name: str, attributes: Optional[Dict[str, Any]] = None) -> None:
+        pass
+
+    def record_exception(self, exception: BaseException) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def _init_tracer():
+    """根据配置初始化 tracer，未开启或缺少依赖时返回 None"""
+    if not OTEL_ENABLED:
+        return None
+
+    try:
+        from opentelemetry import trace
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    except ImportError:
+        logger.warning("OTEL_ENABLED=true 但未安装 opentelemetry，链路追踪已禁用 (uv sync --extra otel)")
+        return None
+
+    provider = TracerProvider(resource=Resource.create({"service.name": OTEL_SERVICE_NAME}))
+    if OTEL_EXPORTER == "console":
+        exporter = ConsoleSpanExporter()
+    elif OTEL_EXPORTER == "file":
+        os.makedirs(os.path.dirname(OTEL_EXPORTER_FILE), exist_ok=True)
+        exporter = ConsoleSpanExporter(
+            out=open(OTEL_EXPORTER_FILE, "a", encoding="utf-8"),
+            formatter=lambda span: span.to_json(indent=None) + os.linesep,
+        )
+    else:
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        exporter = OTLPSpanExporter(endpoint=f"{OTEL_EXPORTER_OTLP_ENDPOINT.rstrip('/')}/v1/traces")
+
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    logger.info(f"链路追踪已开启: exporter={OTEL_EXPORTER}, service={OTEL_SERVICE_NAME}")
+    return trace.get_tracer("pixelle.mcp-server")
+
+
+_tracer = _init_tracer()
+
+
+def is_enabled() -> bool:
+    return _tracer is not None
+
+
+def _extract_context(carrier: Optional[Dict[str, str]]):
+    if not carrier:
+        return None
+    from opentelemetry.propagate import extract
+    return extract(carrier)
+
+
+@contextmanager
+def start_span(name: str, attributes: Optional[Dict[str, Any]] = None, carrier: Optional[Dict[str, str]] = None) -> Generator[Any, None, None]:
+    """
+    创建并激活一个 span，子协程中创建的 span 会自动挂在其下
+
+    Args:
+        name: span 名称
+        attributes: span 属性
+        carrier: 上游传递的 W3C trace context（如 {"traceparent": ...}）
+    """
+    if _tracer is None:
+        yield NOOP_SPAN
+        return
+
+    with _tracer.start_as_current_span(name, context=_extract_context(carrier), attributes=_clean_attributes(attributes)) as span:
+        yield span
+
+
+def record_span(name: str, start_time: float, end_time: float, attributes: Optional[Dict[str, Any]] = None) -> None:
+    """按已知起止时间（秒级时间戳）补录一个 span，用于 ComfyUI 排队/执行等外部阶段"""
+    if _tracer is None or start_time is None or end_time is None:
+        return
+    span = _tracer.start_span(name, attributes=_clean_attributes(attributes), start_time=int(start_time * 1e9))
+    span.end(end_time=int(max(end_time, start_time) * 1e9))
+
+
+def get_carrier_from_ctx(ctx: Any) -> Optional[Dict[str, str]]:
+    """从 MCP 请求的 _meta 中取出客户端传递的 trace context"""
+    if _tracer is None or ctx is None:
+        return None
+    try:
+        meta = ctx.request_context.meta
+    except Exception:
+        return None
+    extra = getattr(meta, "model_extra", None) or {}
+    carrier = {k: v for k, v in extra.items() if k in ("traceparent", "tracestate") and isinstance(v, str)}
+    return carrier or None
+
+
+def _clean_attributes(attributes: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """过滤掉 OpenTelemetry 不支持的属性值"""
+    if not attributes:
+        return None
+    return {k: v for k, v in attributes.items() if isinstance(v, (str, bool, int, float))}